@@ -0,0 +1,41 @@
+"""user_updated_at_server_clock
+
+Revision ID: 2d8f5b63a0e9
+Revises: 9c4e2a71f5d8
+Create Date: 2026-10-19 19:24:08.613570
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d8f5b63a0e9'
+down_revision: Union[str, None] = '9c4e2a71f5d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The former values were written in UTC by the application
+    op.alter_column(
+        'users',
+        'updated_at',
+        type_=sa.DateTime(timezone=True),
+        existing_type=sa.DateTime(),
+        postgresql_using="updated_at AT TIME ZONE 'UTC'",
+        server_default=sa.text('now()'),
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        'users',
+        'updated_at',
+        type_=sa.DateTime(),
+        existing_type=sa.DateTime(timezone=True),
+        postgresql_using="updated_at AT TIME ZONE 'UTC'",
+        server_default=None,
+    )
@@ -0,0 +1,38 @@
+"""user_search_trigram_indexes
+
+Revision ID: 3176ad147faa
+Revises: c3aa79286a62
+Create Date: 2026-10-19 09:12:44.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3176ad147faa'
+down_revision: Union[str, None] = 'c3aa79286a62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRGM_COLUMNS = ('username', 'email', 'first_name', 'last_name')
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in TRGM_COLUMNS:
+        op.create_index(
+            f'ix_users_{column}_trgm',
+            'users',
+            [column],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+
+def downgrade() -> None:
+    for column in reversed(TRGM_COLUMNS):
+        op.drop_index(f'ix_users_{column}_trgm', table_name='users')
@@ -0,0 +1,33 @@
+"""tile_sync_columns
+
+Revision ID: 4f6e1b8a2d57
+Revises: 7a3c95e1d604
+Create Date: 2026-10-19 16:02:47.318254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f6e1b8a2d57'
+down_revision: Union[str, None] = '7a3c95e1d604'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tiles', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('tiles', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('tiles', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+    # The delta sync reads the tiles of a user changed since a time
+    op.create_index('ix_tiles_user_id_updated_at', 'tiles', ['user_id', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tiles_user_id_updated_at', table_name='tiles')
+    op.drop_column('tiles', 'updated_at')
+    op.drop_column('tiles', 'version')
+    op.drop_column('tiles', 'deleted_at')
@@ -0,0 +1,37 @@
+"""published_profiles
+
+Revision ID: 7a3c95e1d604
+Revises: d21f6a93c8e4
+Create Date: 2026-10-19 15:08:52.903417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3c95e1d604'
+down_revision: Union[str, None] = 'd21f6a93c8e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The profiles of the existing users are published by the `profiles.check_drift` job
+    op.create_table('published_profiles',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('username', sa.String(length=32), nullable=False),
+    sa.Column('document', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index(op.f('ix_published_profiles_username'), 'published_profiles', ['username'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_published_profiles_username'), table_name='published_profiles')
+    op.drop_table('published_profiles')
@@ -0,0 +1,30 @@
+"""user_prefix_search_indexes
+
+Revision ID: 9c4e2a71f5d8
+Revises: e5a0c7f3b216
+Create Date: 2026-10-19 19:02:31.905114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4e2a71f5d8'
+down_revision: Union[str, None] = 'e5a0c7f3b216'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PREFIX_COLUMNS = ('username', 'email')
+
+
+def upgrade() -> None:
+    for column in PREFIX_COLUMNS:
+        op.create_index(f'ix_users_{column}_c', 'users', [sa.text(f'{column} COLLATE "C"')], unique=False)
+
+
+def downgrade() -> None:
+    for column in reversed(PREFIX_COLUMNS):
+        op.drop_index(f'ix_users_{column}_c', table_name='users')
@@ -0,0 +1,38 @@
+"""tile_platform
+
+Revision ID: b83f2c6d91e5
+Revises: 4f6e1b8a2d57
+Create Date: 2026-10-19 17:24:11.906342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b83f2c6d91e5'
+down_revision: Union[str, None] = '4f6e1b8a2d57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+tile_platform = postgresql.ENUM(
+    'FACEBOOK', 'INSTAGRAM', 'WHATSAPP', 'TELEGRAM', 'TWITTER', 'PINTEREST', 'YOUTUBE', 'REDDIT', 'SKYPE',
+    'VIBER', 'SIGNAL', 'SNAPCHAT', 'TIKTOK', 'LINKEDIN', 'WECHAT', 'WEBSITE',
+    name='tileplatformenum'
+)
+
+
+def upgrade() -> None:
+    tile_platform.create(op.get_bind())
+    op.add_column('tiles', sa.Column('platform', tile_platform, nullable=True))
+    op.create_index(op.f('ix_tiles_platform'), 'tiles', ['platform'], unique=False)
+    # The existing tiles are classified by the `tiles.classify` job
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_tiles_platform'), table_name='tiles')
+    op.drop_column('tiles', 'platform')
+    tile_platform.drop(op.get_bind())
@@ -0,0 +1,29 @@
+"""user_soft_delete
+
+Revision ID: d21f6a93c8e4
+Revises: 5b9d27e4f0c3
+Create Date: 2026-10-19 13:41:05.672019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd21f6a93c8e4'
+down_revision: Union[str, None] = '5b9d27e4f0c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+    # The tiles of a user are loaded with every profile and purged in batches by user
+    op.create_index(op.f('ix_tiles_user_id'), 'tiles', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_tiles_user_id'), table_name='tiles')
+    op.drop_column('users', 'deleted_at')
@@ -0,0 +1,35 @@
+"""tile_link_checks
+
+Revision ID: e5a0c7f3b216
+Revises: b83f2c6d91e5
+Create Date: 2026-10-19 18:10:52.447120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a0c7f3b216'
+down_revision: Union[str, None] = 'b83f2c6d91e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+tile_link_status = postgresql.ENUM('OK', 'BROKEN', 'ERROR', 'UNREACHABLE', name='tilelinkstatusenum')
+
+
+def upgrade() -> None:
+    tile_link_status.create(op.get_bind())
+    op.add_column('tiles', sa.Column('link_status', tile_link_status, nullable=True))
+    op.add_column('tiles', sa.Column('link_status_code', sa.SmallInteger(), nullable=True))
+    op.add_column('tiles', sa.Column('link_checked_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('tiles', 'link_checked_at')
+    op.drop_column('tiles', 'link_status_code')
+    op.drop_column('tiles', 'link_status')
+    tile_link_status.drop(op.get_bind())
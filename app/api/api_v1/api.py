@@ -1,4 +1,4 @@
-from app.api.api_v1.routers import users, profiles, login, register
+from app.api.api_v1.routers import users, profiles, login, register, metrics, jobs, qr_codes
 from fastapi import APIRouter
 
 
@@ -8,3 +8,6 @@ router.include_router(users.router)
 router.include_router(profiles.router)
 router.include_router(login.router)
 router.include_router(register.router)
+router.include_router(metrics.router)
+router.include_router(jobs.router)
+router.include_router(qr_codes.router)
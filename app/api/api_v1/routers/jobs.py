@@ -0,0 +1,53 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, schemas
+from app.api import deps
+from app.jobs import job_runner
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+    dependencies=[Depends(deps.require_admin)]
+)
+
+
+@router.post(
+    path="",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=schemas.Job
+)
+async def create_job(
+    job_in: schemas.JobCreate,
+    db: AsyncSession = Depends(deps.get_async_db)
+) -> Any:
+    """
+    Enqueue a background job
+    """
+    job = job_runner.enqueue(db, job_in.type, job_in.payload, run_at=job_in.run_at)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+@router.get(
+    path="/{job_id}",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.Job
+)
+async def read_job(
+    job_id: int,
+    db: AsyncSession = Depends(deps.get_async_db)
+) -> Any:
+    """
+    Retrieve the status and the result of a background job
+    """
+    job = await db.get(models.Job, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="The job with this ID does not exist"
+        )
+    return job
@@ -0,0 +1,169 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, status
+
+from app.api import deps
+from app.core.config import settings
+from app.core.idempotency import idempotency_stats
+from app.core.invalidation import invalidation_bus
+from app.core.jobs import job_runner
+from app.core.link_checker import link_checker
+from app.core.load_shedding import load_monitor
+from app.core.local_cache import local_caches
+from app.core.loop_diagnostics import loop_diagnostics
+from app.core.outbox import outbox_dispatcher
+from app.core.profile_feed import profile_feed
+from app.core.rate_limit import rate_limited
+from app.core.readiness import readiness
+from app.core.singleflight import single_flight
+from app.db.session import get_async_engine
+from app.db.statement_cache import statement_cache
+from app.utils.qr_codes import qr_code_renderer
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+    dependencies=[Depends(deps.require_admin)]
+)
+
+
+@router.get(
+    path="/statement-cache",
+    status_code=status.HTTP_200_OK
+)
+async def read_statement_cache_metrics() -> Any:
+    """
+    Hit ratio of the CRUD statement cache and size of the SQLAlchemy compiled cache
+    """
+    compiled_cache = get_async_engine().sync_engine._compiled_cache
+    return {
+        "statements": statement_cache.stats(),
+        "compiled_cache_size": len(compiled_cache) if compiled_cache is not None else 0,
+    }
+
+
+@router.get(
+    path="/single-flight",
+    status_code=status.HTTP_200_OK
+)
+async def read_single_flight_metrics() -> Any:
+    """
+    Number of coalesced lookups and lookups currently in flight
+    """
+    return single_flight.stats()
+
+
+@router.get(
+    path="/load",
+    status_code=status.HTTP_200_OK
+)
+async def read_load_metrics() -> Any:
+    """
+    Event-loop lag, database pool wait and the number of shed and rate limited requests
+    """
+    return {**load_monitor.stats(), "rate_limited": dict(rate_limited)}
+
+
+@router.get(
+    path="/loop",
+    status_code=status.HTTP_200_OK
+)
+async def read_loop_metrics() -> Any:
+    """
+    Per-route event-loop lag histograms and the stacks of recent blocking calls.
+    Collected only when LOOP_DIAGNOSTICS_ENABLED is set.
+    """
+    return {"enabled": settings.LOOP_DIAGNOSTICS_ENABLED, **loop_diagnostics.stats()}
+
+
+@router.get(
+    path="/readiness",
+    status_code=status.HTTP_200_OK
+)
+async def read_readiness_metrics() -> Any:
+    """
+    Last results of the readiness checks with their errors and the database pool usage
+    """
+    return {"ready": readiness.ready, "checks": readiness.results}
+
+
+@router.get(
+    path="/caches",
+    status_code=status.HTTP_200_OK
+)
+async def read_cache_metrics() -> Any:
+    """
+    Hit ratio of the local caches and the events of the invalidation bus
+    """
+    return {
+        "caches": {name: cache.stats() for name, cache in local_caches.items()},
+        "invalidation": invalidation_bus.stats(),
+    }
+
+
+@router.get(
+    path="/outbox",
+    status_code=status.HTTP_200_OK
+)
+async def read_outbox_metrics() -> Any:
+    """
+    Outbox events processed, retried and failed for good by this worker, per topic
+    """
+    return outbox_dispatcher.stats()
+
+
+@router.get(
+    path="/jobs",
+    status_code=status.HTTP_200_OK
+)
+async def read_job_metrics() -> Any:
+    """
+    Running jobs and the jobs succeeded, retried and failed for good by this worker, per type
+    """
+    return job_runner.stats()
+
+
+@router.get(
+    path="/profile-feed",
+    status_code=status.HTTP_200_OK
+)
+async def read_profile_feed_metrics() -> Any:
+    """
+    Live profile subscribers of the worker, profile reads and the documents delivered,
+    skipped by slow subscribers and the subscriptions rejected over the limits
+    """
+    return profile_feed.stats()
+
+
+@router.get(
+    path="/qr-codes",
+    status_code=status.HTTP_200_OK
+)
+async def read_qr_code_metrics() -> Any:
+    """
+    QR codes served from the cache, rendered, and rendered in batches
+    """
+    return qr_code_renderer.stats()
+
+
+@router.get(
+    path="/link-checker",
+    status_code=status.HTTP_200_OK
+)
+async def read_link_checker_metrics() -> Any:
+    """
+    Tile links checked by outcome, pauses yielding to the requests and the result cache
+    """
+    return link_checker.stats()
+
+
+@router.get(
+    path="/idempotency",
+    status_code=status.HTTP_200_OK
+)
+async def read_idempotency_metrics() -> Any:
+    """
+    Requests with an Idempotency-Key executed, replayed, waiting for a duplicate in flight,
+    and rejected for a reused key or a duplicate still in flight
+    """
+    return dict(idempotency_stats)
@@ -1,7 +1,12 @@
+import asyncio
+import json
 import time
-from typing import Any
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
 
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Response, WebSocket
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.encoders import jsonable_encoder
 from pydantic import UUID4
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -9,7 +14,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app import crud, schemas, models
 from app.api import deps
 from app.constants import UserRoleEnum
+from app.core.config import settings
+from app.core.local_cache import profile_cache
+from app.core.profile_feed import ProfileFeedFull, ProfileSubscriber, profile_feed
+from app.core.singleflight import single_flight
+from app.db.session import async_session
 from app.schemas.base import ResponseWithPagination
+from app.schemas.serializers import changes_serializer, profile_serializer
+from app.utils.pagination import decode_cursor, encode_cursor
 
 router = APIRouter(
     prefix="/profiles",
@@ -18,6 +30,56 @@ router = APIRouter(
 )
 
 
+@router.get(
+    path="/changes",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.ResponseProfileChanges
+)
+async def read_current_user_profile_changes(
+    since: Optional[str] = None,
+    current_user: models.User = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(deps.get_async_db)
+) -> Any:
+    """
+    Retrieve the changes of the current user profile since the previous sync.
+    `since` is the `next_since` of the previous response. The user is returned only when it
+    changed, with the tiles created or updated since and the ids of the tiles deleted since.
+    Without `since`, or when it is older than the deleted tiles are kept, the whole profile is
+    returned with `reset`: the client replaces its copy.
+    """
+    after = None
+    if since:
+        after = _parse_since(since)
+        if after < datetime.now(timezone.utc) - timedelta(days=settings.TILE_TOMBSTONE_RETENTION_DAYS):
+            after = None
+    # The horizon is taken before reading, a change committed meanwhile is sent again next time
+    horizon = await crud.tile.sync_horizon(db)
+    tiles = await crud.tile.get_changes(db, user_id=current_user.id, since=after)
+    await db.refresh(current_user)
+    user_changed = after is None or current_user.updated_at >= after
+    content = changes_serializer.dump_json(
+        current_user if user_changed else None,
+        tiles,
+        next_since=encode_cursor(horizon.isoformat()),
+        reset=after is None,
+    )
+    return Response(content=content, media_type="application/json")
+
+
+def _parse_since(since: str) -> datetime:
+    (value,) = decode_cursor(since, size=1)
+    try:
+        after = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        after = None
+    if after is None or after.tzinfo is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sync cursor"
+        )
+    return after
+
+
 @router.get(
     path="/{username}",
     status_code=status.HTTP_200_OK,
@@ -25,18 +87,218 @@ router = APIRouter(
 )
 async def read_profile(
     username: str,
-    db: AsyncSession = Depends(deps.get_async_db)
+    fields: Optional[tuple[str, ...]] = Depends(deps.sparse_fields(profile_serializer))
+) -> Any:
+    """
+    Retrieve the public profile of the user.
+    The profile is published as JSON on every change of the user, a miss reads it with one
+    indexed lookup. Profiles are cached per worker until the user changes, concurrent misses
+    for the same username share one query.
+    With `fields` only the given fields are read and returned, the tiles are not loaded unless requested.
+    """
+    key = username if fields is None else (username, fields)
+    content = profile_cache.get(key)
+    if content is None:
+        if fields is None:
+            content = await single_flight.do(("profile", username), lambda: _render_profile(username))
+        else:
+            content = await single_flight.do(("profile", key), lambda: _render_profile_fields(username, fields))
+    if content is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="The user not found"
+        )
+    return Response(content=content, media_type="application/json")
+
+
+async def _render_profile_fields(username: str, fields: tuple[str, ...]) -> Optional[bytes]:
+    generation = profile_cache.generation
+    async with async_session() as db:
+        db_user = await crud.user.get_by_username(
+            db, username=username, including=[models.Tile] if "tiles" in fields else None, columns=fields
+        )
+        if db_user is None:
+            return None
+        content = profile_serializer.only(fields).dump_json(db_user)
+    profile_cache.set((username, fields), content, tags=(db_user.id,), generation=generation)
+    return content
+
+
+async def _render_profile(username: str) -> Optional[bytes]:
+    generation = profile_cache.generation
+    async with async_session() as db:
+        published = await crud.published_profile.get_by_username(db, username=username)
+        if published is not None:
+            user_id, content = published.user_id, published.document.encode()
+        else:
+            # Not published yet, e.g. before the drift check filled in the existing users
+            db_user = await crud.user.get_by_username(db, username=username, including=[models.Tile])
+            if db_user is None:
+                return None
+            user_id, content = db_user.id, profile_serializer.dump_json(db_user)
+    profile_cache.set(username, content, tags=(user_id,), generation=generation)
+    return content
+
+
+@router.websocket("/{username}/live")
+async def follow_profile_websocket(websocket: WebSocket, username: str) -> None:
+    """
+    Follow the public profile of the user: its document is sent as a JSON text message,
+    then every new version of it. The connection is closed with 4404 when the user is not
+    found, 4410 when the profile is deleted and 1013 while the worker is at its subscriber limit.
+    """
+    await websocket.accept()
+    try:
+        subscription = await profile_feed.subscribe(username)
+    except ProfileFeedFull:
+        await websocket.close(code=1013, reason="Too many subscribers")
+        return
+    if subscription is None:
+        await websocket.close(code=4404, reason="The user not found")
+        return
+
+    subscriber, document = subscription
+    disconnected = asyncio.create_task(_unsubscribe_on_disconnect(websocket, subscriber))
+    try:
+        while document is not None:
+            await websocket.send_text(document.decode())
+            document = await subscriber.next()
+        if subscriber.reason == "deleted":
+            await websocket.close(code=4410, reason="The profile was deleted")
+        elif subscriber.reason == "closed":
+            await websocket.close(code=1012, reason="Service restart")
+    finally:
+        profile_feed.unsubscribe(subscriber)
+        disconnected.cancel()
+
+
+async def _unsubscribe_on_disconnect(websocket: WebSocket, subscriber: ProfileSubscriber) -> None:
+    # Messages from the client are ignored, the subscription only ends on disconnect
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+    profile_feed.unsubscribe(subscriber)
+
+
+@router.get(
+    path="/{username}/events",
+    status_code=status.HTTP_200_OK
+)
+async def follow_profile_events(
+    username: str
 ) -> Any:
     """
-    Retrieve all users
+    Follow the public profile of the user as server-sent events: a `profile` event carries the
+    document, then every new version of it, `deleted` ends the stream when the profile is deleted.
+    Streams end after PROFILE_FEED_MAX_LIFETIME seconds, `EventSource` reconnects on its own.
     """
-    db_user = await crud.user.get_by_username(db, username=username, including=[models.Tile])
-    if db_user is None:
+    try:
+        subscription = await profile_feed.subscribe(username)
+    except ProfileFeedFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many subscribers"
+        )
+    if subscription is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="The user not found"
         )
-    return db_user
+    return StreamingResponse(
+        _profile_events(*subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # The stream may be cancelled before it starts when the client is already gone
+        background=BackgroundTask(_end_subscription, subscription[0]),
+    )
+
+
+async def _end_subscription(subscriber: ProfileSubscriber) -> None:
+    profile_feed.unsubscribe(subscriber)
+
+
+async def _profile_events(subscriber: ProfileSubscriber, document: bytes):
+    deadline = time.monotonic() + settings.PROFILE_FEED_MAX_LIFETIME
+    try:
+        while document is not None:
+            # The documents are single-line JSON, one `data` field each
+            yield b"event: profile\ndata: " + document + b"\n\n"
+            document = None
+            while document is None and subscriber.reason is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    document = await asyncio.wait_for(subscriber.next(), min(settings.PROFILE_FEED_KEEPALIVE, remaining))
+                except asyncio.TimeoutError:
+                    # Keeps the proxies from closing an idle stream
+                    yield b": keepalive\n\n"
+        if subscriber.reason == "deleted":
+            yield b"event: deleted\ndata: null\n\n"
+    finally:
+        profile_feed.unsubscribe(subscriber)
+
+
+@router.post(
+    path="/batch",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.ResponseProfileBatch
+)
+async def read_profiles_batch(
+    batch_in: schemas.ProfileBatchRequest
+) -> Any:
+    """
+    Retrieve the public profiles of several users by username and id at once.
+    Profiles cached by username are served from the profile cache, all the others are read
+    with one query. Users not found are `null`.
+    """
+    usernames = list(dict.fromkeys(batch_in.usernames))
+    ids = list(dict.fromkeys(batch_in.ids))
+    by_username = {}
+    for username in usernames:
+        content = profile_cache.get(username)
+        if content is not None:
+            by_username[username] = content
+
+    by_id = {}
+    missing = [username for username in usernames if username not in by_username]
+    if missing or ids:
+        for username, (user_id, content) in (await _load_profiles(missing, ids)).items():
+            by_username[username] = content
+            by_id[user_id] = content
+
+    content = b"".join((
+        b'{"usernames":', _json_object((username, by_username.get(username)) for username in usernames),
+        b',"ids":', _json_object((str(user_id), by_id.get(user_id)) for user_id in ids),
+        b"}",
+    ))
+    return Response(content=content, media_type="application/json")
+
+
+async def _load_profiles(usernames: List[str], ids: List[UUID4]) -> Dict[str, tuple[UUID4, bytes]]:
+    """The serialized profiles matching the usernames or ids by username, with their user id"""
+    generation = profile_cache.generation
+    profiles = {}
+    async with async_session() as db:
+        for row in await crud.published_profile.get_many(db, usernames=usernames, user_ids=ids):
+            profiles[row.username] = (row.user_id, row.document.encode())
+        # Users not published yet, e.g. before the drift check filled in the existing users
+        found_ids = {user_id for user_id, _ in profiles.values()}
+        pending_usernames = [username for username in usernames if username not in profiles]
+        pending_ids = [user_id for user_id in ids if user_id not in found_ids]
+        if pending_usernames or pending_ids:
+            db_users = await crud.user.get_many(
+                db, usernames=pending_usernames, ids=pending_ids, including=[models.Tile]
+            )
+            for db_user in db_users:
+                profiles[db_user.username] = (db_user.id, profile_serializer.dump_json(db_user))
+    for username, (user_id, content) in profiles.items():
+        profile_cache.set(username, content, tags=(user_id,), generation=generation)
+    return profiles
+
+
+def _json_object(entries: Iterable[tuple[str, Optional[bytes]]]) -> bytes:
+    # The profiles are already JSON, they are spliced in without parsing them again
+    return b"{" + b",".join(json.dumps(key).encode() + b":" + (value or b"null") for key, value in entries) + b"}"
 
 
 @router.get(
@@ -45,14 +307,19 @@ async def read_profile(
     response_model=schemas.ResponseProfile
 )
 async def read_current_user_profile(
+    fields: Optional[tuple[str, ...]] = Depends(deps.sparse_fields(profile_serializer)),
     current_user: models.User = Depends(deps.get_current_user),
     db: AsyncSession = Depends(deps.get_async_db)
 ) -> Any:
     """
-    Retrieve current user profile
+    Retrieve current user profile.
+    With `fields` only the given fields are returned, without `tiles` no query is needed.
     """
-    profile = await crud.user.get(db, id=current_user.id, including=[models.Tile])
-    return profile
+    if fields is not None and "tiles" not in fields:
+        return Response(content=profile_serializer.only(fields).dump_json(current_user), media_type="application/json")
+    profile = await crud.user.get_coalesced(db, id=current_user.id, including=[models.Tile])
+    serializer = profile_serializer if fields is None else profile_serializer.only(fields)
+    return Response(content=serializer.dump_json(profile), media_type="application/json")
 
 
 @router.post(
@@ -0,0 +1,137 @@
+from typing import Any, AsyncIterator, List
+from urllib.parse import quote
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import UUID4
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, schemas
+from app.api import deps
+from app.constants import QRCodeFormatEnum
+from app.core.config import settings
+from app.utils.qr_codes import (
+    MEDIA_TYPES, QRCodeItem, profile_url, qr_code_renderer, short_link_url, stream_zip
+)
+
+router = APIRouter(
+    prefix="/qr-codes",
+    tags=["qr-codes"],
+)
+
+
+@router.get(
+    path="/profiles/{username}",
+    status_code=status.HTTP_200_OK,
+    response_class=FileResponse
+)
+async def read_profile_qr_code(
+    username: str,
+    request: Request,
+    format: QRCodeFormatEnum = QRCodeFormatEnum.PNG,
+    size: int = settings.QR_CODE_DEFAULT_SIZE,
+    db: AsyncSession = Depends(deps.get_async_db)
+) -> Any:
+    """
+    QR code pointing at the public profile of the user
+    """
+    _check_size(size)
+    db_user = await crud.user.get_by_username(db, username=username, columns=("username",))
+    if db_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="The user not found"
+        )
+    return await _qr_code_response(request, profile_url(db_user.username), format, size)
+
+
+@router.get(
+    path="/tiles/{tile_id}",
+    status_code=status.HTTP_200_OK,
+    response_class=FileResponse
+)
+async def read_tile_qr_code(
+    tile_id: UUID4,
+    request: Request,
+    format: QRCodeFormatEnum = QRCodeFormatEnum.PNG,
+    size: int = settings.QR_CODE_DEFAULT_SIZE,
+    db: AsyncSession = Depends(deps.get_async_db)
+) -> Any:
+    """
+    QR code pointing at the short link of the tile
+    """
+    _check_size(size)
+    short_ids = await crud.tile.get_short_ids(db, ids=[tile_id])
+    if tile_id not in short_ids:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="The tile not found"
+        )
+    return await _qr_code_response(request, short_link_url(short_ids[tile_id]), format, size)
+
+
+def _check_size(size: int) -> None:
+    if size not in settings.QR_CODE_SIZES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"The size must be one of {', '.join(map(str, settings.QR_CODE_SIZES))}"
+        )
+
+
+async def _qr_code_response(request: Request, data: str, format: QRCodeFormatEnum, size: int) -> Response:
+    key, path = await qr_code_renderer.get(data, format, size)
+    # The file is addressed by its content, its key is a strong validator
+    headers = {"ETag": f'"{key}"', "Cache-Control": "public, max-age=3600"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(path, media_type=MEDIA_TYPES[format], headers=headers)
+
+
+@router.post(
+    path="/batch",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    dependencies=[Depends(deps.require_admin)]
+)
+async def read_qr_codes_batch(
+    batch_in: schemas.QRCodeBatchRequest,
+    db: AsyncSession = Depends(deps.get_async_db)
+) -> Any:
+    """
+    ZIP archive of the QR codes of the given users and tiles, e.g. for a print order:
+    `profiles/<username>.<format>`, usernames percent-encoded, and `tiles/<tile_id>.<format>`.
+    The users and tiles not found are listed in `missing.txt`. The archive is streamed while
+    the QR codes are rendered.
+    """
+    usernames = list(dict.fromkeys(batch_in.usernames))
+    tile_ids = list(dict.fromkeys(batch_in.tile_ids))
+    found = {db_user.username for db_user in await crud.user.get_many(db, usernames=usernames, ids=[])} if usernames else set()
+    short_ids = await crud.tile.get_short_ids(db, ids=tile_ids) if tile_ids else {}
+
+    extension = batch_in.format.value
+    names: List[str] = []
+    items: List[QRCodeItem] = []
+    for username in usernames:
+        if username in found:
+            names.append(f"profiles/{quote(username, safe='')}.{extension}")
+            items.append((profile_url(username), batch_in.format, batch_in.size))
+    for tile_id in tile_ids:
+        if tile_id in short_ids:
+            names.append(f"tiles/{tile_id}.{extension}")
+            items.append((short_link_url(short_ids[tile_id]), batch_in.format, batch_in.size))
+    missing = [username for username in usernames if username not in found]
+    missing += [str(tile_id) for tile_id in tile_ids if tile_id not in short_ids]
+
+    async def entries() -> AsyncIterator[tuple[str, bytes]]:
+        index = 0
+        async for content in qr_code_renderer.render_many(items):
+            yield names[index], content
+            index += 1
+        if missing:
+            yield "missing.txt", "\n".join(missing).encode() + b"\n"
+
+    return StreamingResponse(
+        stream_zip(entries()),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="qr-codes.zip"'},
+    )
@@ -32,13 +32,13 @@ async def register_user(
     """
     Create new user.
     """
-    if await crud.user.get_by_email(db, email=user_in.email):
+    if await crud.user.get_by_email(db, email=user_in.email, include_deleted=True):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="The user with this email already exists in the system"
         )
 
-    if await crud.user.get_by_username(db, username=user_in.username):
+    if await crud.user.get_by_username(db, username=user_in.username, include_deleted=True):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Username already exists in the system"
@@ -1,18 +1,21 @@
 import time
-from typing import Any
+from typing import Any, Optional
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, status, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, status, HTTPException, Query, Response, UploadFile
 from fastapi.encoders import jsonable_encoder
 from pydantic import UUID4
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, schemas, models
 from app.api import deps
-from app.constants import UserRoleEnum
+from app.constants import UserRoleEnum, UserSearchModeEnum
 from app.core.security import verify_password
 from app.schemas.base import ResponseWithPagination
+from app.schemas.serializers import user_simple_page_serializer, user_simple_serializer
 from app.static_files import PATH_STATIC_FILES
 from app.utils.func import UserPictureManager as user_picture_manager
+from app.utils.pagination import decode_cursor, encode_cursor
 
 router = APIRouter(
     prefix="/users",
@@ -29,15 +32,50 @@ router = APIRouter(
 async def read_users(
     page: int = 1,
     page_size: int = 20,
+    q: Optional[str] = Query(None, min_length=1, max_length=128),
+    mode: UserSearchModeEnum = UserSearchModeEnum.SEARCH,
+    cursor: Optional[str] = None,
+    fields: Optional[tuple[str, ...]] = Depends(deps.sparse_fields(user_simple_serializer)),
     db: AsyncSession = Depends(deps.get_async_db)
 ) -> Any:
     """
-    Retrieve all users
+    Retrieve all users, or search them by username, email or name when `q` is given.
+    Search results are ranked and paginated with `cursor` instead of `page`.
+    With `fields` only the given fields are read and returned.
     """
+    columns = fields or ()
+    page_serializer = user_simple_page_serializer.only(fields) if fields else user_simple_page_serializer
+    if q is not None:
+        after = None
+        if cursor:
+            cursor_mode, key, user_id = decode_cursor(cursor, size=3)
+            # SEARCH pages by rank, the other modes by username
+            key_types = (int, float) if mode == UserSearchModeEnum.SEARCH else (str,)
+            try:
+                if cursor_mode != mode.value or not isinstance(key, key_types) or isinstance(key, bool):
+                    raise ValueError(cursor_mode)
+                after = (key, UUID(user_id))
+            except (TypeError, ValueError, AttributeError):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid pagination cursor"
+                )
+        db_users, next_after = await crud.user.search(
+            db, query=q, mode=mode, limit=page_size, after=after, columns=columns
+        )
+        next_cursor = encode_cursor(mode.value, *next_after) if next_after else None
+        return Response(
+            content=page_serializer.dump_json(db_users, next_cursor=next_cursor),
+            media_type="application/json"
+        )
+
     offset = (page - 1) * page_size
-    db_users, total_count = await crud.user.get_multi(db, offset=offset, limit=page_size)
+    db_users, total_count = await crud.user.get_multi(db, offset=offset, limit=page_size, columns=columns)
     total_pages = 1 + total_count//page_size
-    return {"items": db_users, "total_count": total_count, "total_pages": total_pages}
+    return Response(
+        content=page_serializer.dump_json(db_users, total_count=total_count, total_pages=total_pages),
+        media_type="application/json"
+    )
 
 
 @router.get(
@@ -75,12 +113,12 @@ async def create_user(
     Create a new user
     """
 
-    if await crud.user.get_by_email(db, email=user_in.email):
+    if await crud.user.get_by_email(db, email=user_in.email, include_deleted=True):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="The user with this email already exists in the system"
         )
-    if await crud.user.get_by_username(db, username=user_in.username):
+    if await crud.user.get_by_username(db, username=user_in.username, include_deleted=True):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Username already exists in the system"
@@ -106,22 +144,20 @@ async def update_user(
     """
     Update the current user
     """
-    if (
-        user_in.email is not None
-        and crud.user.get_by_email(db, email=user_in.email)
-    ):
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="The email is already used"
-        )
-    if (
-        user_in.username is not None
-        and crud.user.get_by_username(db, username=user_in.username)
-    ):
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="The username is already used"
-        )
+    if user_in.email is not None:
+        db_user_with_email = await crud.user.get_by_email(db, email=user_in.email, include_deleted=True)
+        if db_user_with_email and db_user_with_email.id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="The email is already used"
+            )
+    if user_in.username is not None:
+        db_user_with_username = await crud.user.get_by_username(db, username=user_in.username, include_deleted=True)
+        if db_user_with_username and db_user_with_username.id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="The username is already used"
+            )
     return await crud.user.update(db, db_obj=current_user, obj_in=user_in)
 
 
@@ -147,22 +183,20 @@ async def update_user_by_id(
             detail="The user with this ID no exists on the system"
         )
 
-    if (
-        user_in.email is not None
-        and crud.user.get_by_email(db, email=user_in.email)
-    ):
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="The email is already used"
-        )
-    if (
-        user_in.username is not None
-        and crud.user.get_by_username(db, username=user_in.username)
-    ):
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="The username is already used"
-        )
+    if user_in.email is not None:
+        db_user_with_email = await crud.user.get_by_email(db, email=user_in.email, include_deleted=True)
+        if db_user_with_email and db_user_with_email.id != db_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="The email is already used"
+            )
+    if user_in.username is not None:
+        db_user_with_username = await crud.user.get_by_username(db, username=user_in.username, include_deleted=True)
+        if db_user_with_username and db_user_with_username.id != db_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="The username is already used"
+            )
     return await crud.user.update(db, db_obj=db_user, obj_in=user_in)
 
 
@@ -176,7 +210,7 @@ async def delete_user(
     db: AsyncSession = Depends(deps.get_async_db)
 ) -> Any:
     """
-    Delete the user
+    Delete the user, its tiles and pictures are purged in the background
     """
     db_user = await crud.user.get(db, id=user_id)
 
@@ -186,12 +220,6 @@ async def delete_user(
             detail="The user with this ID no exists on the system"
         )
 
-    if db_user.picture:
-        has_deleted = await user_picture_manager.delete_user_picture(user_id=user_id)
-
-        if not has_deleted:
-            raise HTTPException(status_code=500, detail="Failed to delete user picture")
-
     await crud.user.remove(db, db_obj=db_user)
 
     return {"message": "User has been deleted"}
@@ -405,7 +433,6 @@ async def delete_picture_for_current_user(
         has_deleted = await user_picture_manager.delete_user_picture(
             user_id=current_user.id
         )
-        await crud.user.delete_picture()
 
         if not has_deleted:
             raise HTTPException(status_code=500, detail="Failed to delete user picture")
@@ -1,12 +1,13 @@
 import logging
-from typing import Generator, Optional
+from typing import Callable, Generator, Optional
 
 from app import crud, models, schemas
 from app.constants import UserRoleEnum
 from app.core.config import settings
-from app.db.session import AsyncSessionLocal
+from app.db.session import async_session
+from app.schemas.serializers import OrmSerializer
 from pydantic import ValidationError
-from fastapi import Depends, HTTPException, status, Cookie
+from fastapi import Depends, HTTPException, Query, status, Cookie
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -20,7 +21,8 @@ logger = logging.getLogger(__name__)
 
 
 async def get_async_db() -> AsyncSession:
-    async with AsyncSessionLocal() as session:
+    async with async_session() as session:
+        # The connection is checked out by the first query, its wait is recorded by the load monitor
         async with session.begin():
             yield session
 
@@ -52,7 +54,7 @@ async def get_current_user(
             detail="Could not validate credentials"
         )
 
-    user = await crud.user.get_by_username(db, username=token_data.sub)
+    user = await crud.user.get_by_username_coalesced(db, username=token_data.sub)
 
     if not user:
         raise credentials_exception
@@ -94,7 +96,7 @@ async def get_current_user_or_none(
             detail="Could not validate credentials"
         )
 
-    user = await crud.user.get_by_username(db, username=token_data.sub)
+    user = await crud.user.get_by_username_coalesced(db, username=token_data.sub)
     print("Authenticated")
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
@@ -118,3 +120,19 @@ def disabled_endpoint():
         status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
         detail="Endpoint temporarily disabled"
     )
+
+
+def sparse_fields(serializer: OrmSerializer) -> Callable[[Optional[str]], Optional[tuple[str, ...]]]:
+    """Dependency parsing the `fields=` parameter of a response serialized by `serializer`,
+    `None` when every field is requested.
+    """
+    def parse(
+        fields: Optional[str] = Query(None, description="Fields to return, separated by commas")
+    ) -> Optional[tuple[str, ...]]:
+        if fields is None:
+            return None
+        try:
+            return serializer.parse_fields(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return parse
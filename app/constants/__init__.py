@@ -1,3 +1,9 @@
 from .user_role import UserRoleEnum
+from .user_search_mode import UserSearchModeEnum
+from .ssh_tunnel_state import SSHTunnelStateEnum
+from .outbox_topic import OutboxTopicEnum
+from .job import JobStatusEnum, JobTypeEnum
 from .tile_platform import TilePlatformEnum
-from .tile_type import TileTypeEnum
\ No newline at end of file
+from .tile_type import TileTypeEnum
+from .qr_code import QRCodeFormatEnum
+from .tile_link_status import TileLinkStatusEnum
\ No newline at end of file
@@ -0,0 +1,27 @@
+from enum import Enum
+
+
+class JobTypeEnum(str, Enum):
+    """
+    Deferred jobs run by the background job runner
+    """
+
+    CLEANUP_ORPHANED_PICTURES = "pictures.cleanup_orphaned"
+    IMPORT_TILES = "tiles.import"
+    PURGE_USER = "users.purge"
+    PURGE_TILE_TOMBSTONES = "tiles.purge_tombstones"
+    CLASSIFY_TILES = "tiles.classify"
+    CHECK_TILE_LINKS = "tiles.check_links"
+    CHECK_PROFILE_DRIFT = "profiles.check_drift"
+    PUBLISH_PROFILE_SNAPSHOTS = "profiles.publish_snapshots"
+
+
+class JobStatusEnum(str, Enum):
+    """
+    Lifecycle of a background job
+    """
+
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
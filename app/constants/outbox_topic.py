@@ -0,0 +1,10 @@
+from enum import Enum
+
+
+class OutboxTopicEnum(str, Enum):
+    """
+    Side effects processed by the outbox dispatcher after the commit
+    """
+
+    USER_PICTURES_DELETE = "user.pictures.delete"
+    PROFILE_SNAPSHOT_PUBLISH = "profile.snapshot.publish"
@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class QRCodeFormatEnum(str, Enum):
+    PNG = "png"
+    SVG = "svg"
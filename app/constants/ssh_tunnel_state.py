@@ -0,0 +1,11 @@
+from enum import Enum
+
+
+class SSHTunnelStateEnum(str, Enum):
+    """
+    States of the SSH tunnel to the database as seen by a worker
+    """
+
+    DOWN = "DOWN"
+    CONNECTING = "CONNECTING"
+    UP = "UP"
@@ -0,0 +1,15 @@
+from enum import Enum
+
+
+class TileLinkStatusEnum(str, Enum):
+    """
+    Outcome of the last health check of a tile url
+    """
+
+    OK = "OK"
+    # 404 or 410, the page is gone
+    BROKEN = "BROKEN"
+    # Any other error status, or too many redirects
+    ERROR = "ERROR"
+    # No response: DNS, connection or timeout error
+    UNREACHABLE = "UNREACHABLE"
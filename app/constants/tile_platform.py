@@ -18,6 +18,6 @@ class TilePlatformEnum(Enum):
     SIGNAL = PlatformData("Signal", "signal://")
     SNAPCHAT = PlatformData("Snapchat", "snapchat://")
     TIKTOK = PlatformData("TikTok", "tiktok://")
-    LINKEDIN = "linkedin"
-    WECHAT = "wechat"
+    LINKEDIN = PlatformData("LinkedIn", "https://www.linkedin.com")
+    WECHAT = PlatformData("WeChat", "weixin://")
     WEBSITE = "website"
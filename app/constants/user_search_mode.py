@@ -0,0 +1,11 @@
+from enum import Enum
+
+
+class UserSearchModeEnum(str, Enum):
+    """
+    Matching strategies of the user search
+    """
+
+    EXACT = "EXACT"
+    PREFIX = "PREFIX"
+    SEARCH = "SEARCH"
@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import PostgresDsn, field_validator
 from pydantic_core.core_schema import FieldValidationInfo
@@ -28,6 +28,10 @@ class Settings(BaseSettings):
     SSH_PASSWORD: Optional[str] = None
     REMOTE_DB_HOST: Optional[str] = None
     REMOTE_DB_PORT: Optional[int] = None
+    SSH_TUNNEL_KEEPALIVE: float = 15
+    SSH_TUNNEL_PROBE_INTERVAL: float = 5
+    SSH_TUNNEL_PROBE_TIMEOUT: float = 3
+    SSH_TUNNEL_BACKOFF_MAX: float = 30
 
     DB_HOST: str
     DB_PORT: int
@@ -35,11 +39,110 @@ class Settings(BaseSettings):
     DB_PASSWORD: str
     DB_NAME: str
 
+    # Pool of every worker, `app.server` sizes it so all workers, their LISTEN connection of the
+    # invalidation bus included, stay under DB_MAX_CONNECTIONS
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_MAX_CONNECTIONS: int = 100
+    DB_RESERVED_CONNECTIONS: int = 10
+
     DOMAIN: str
 
     SQLALCHEMY_DATABASE_URI: Optional[PostgresDsn] = None
     ASYNC_SQLALCHEMY_DATABASE_URI: Optional[PostgresDsn] = None
 
+    STATEMENT_CACHE_SIZE: int = 512
+    SQLALCHEMY_QUERY_CACHE_SIZE: int = 1200
+    ASYNCPG_PREPARED_STATEMENT_CACHE_SIZE: int = 500
+
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REDIS_URL: Optional[str] = None
+
+    # Responses to requests with an `Idempotency-Key`, replayed to their retries, see `app.core.idempotency`
+    IDEMPOTENCY_ENABLED: bool = True
+    # Shares the responses between workers, each worker keeps its own otherwise
+    IDEMPOTENCY_REDIS_URL: Optional[str] = None
+    IDEMPOTENCY_TTL: float = 86400
+    IDEMPOTENCY_STORE_SIZE: int = 10_000
+    IDEMPOTENCY_MAX_RESPONSE_BYTES: int = 1_048_576
+    IDEMPOTENCY_LOCK_SECONDS: float = 60
+    IDEMPOTENCY_WAIT_TIMEOUT: float = 30
+
+    LOAD_SHEDDING_ENABLED: bool = True
+    LOAD_SHEDDING_MAX_LOOP_LAG_MS: int = 250
+    LOAD_SHEDDING_MAX_POOL_WAIT_MS: int = 1000
+    LOAD_SHEDDING_RETRY_AFTER: int = 1
+
+    LOOP_DIAGNOSTICS_ENABLED: bool = False
+    LOOP_DIAGNOSTICS_THRESHOLD_MS: int = 100
+
+    READINESS_CACHE_SECONDS: float = 2
+    READINESS_CHECK_TIMEOUT: float = 1
+    WARMUP_CONNECTIONS: int = 2
+    WARMUP_TIMEOUT: float = 30
+
+    # `postgres` shares invalidations between workers with LISTEN/NOTIFY, `memory` keeps them in the process
+    INVALIDATION_BACKEND: str = "postgres"
+    INVALIDATION_CHANNEL: str = "cache_invalidation"
+    PROFILE_CACHE_SIZE: int = 10_000
+    PROFILE_CACHE_TTL: float = 60
+    PROFILE_BATCH_MAX_SIZE: int = 100
+    # Older delta syncs get the whole profile again, their tombstones may be purged
+    TILE_TOMBSTONE_RETENTION_DAYS: int = 30
+
+    # Live profile updates over WebSocket and SSE, see `app.core.profile_feed`
+    PROFILE_FEED_MAX_SUBSCRIBERS: int = 10_000
+    PROFILE_FEED_MAX_PER_PROFILE: int = 1_000
+    PROFILE_FEED_KEEPALIVE: float = 15
+    # SSE streams end after this many seconds, the clients reconnect, possibly to another worker
+    PROFILE_FEED_MAX_LIFETIME: float = 3600
+
+    # Write every published profile to the static store, see `app.utils.profile_snapshots`
+    PROFILE_SNAPSHOTS_ENABLED: bool = False
+    PROFILE_SNAPSHOTS_HTML: bool = False
+    PROFILE_SNAPSHOTS_CONCURRENCY: int = 16
+
+    # `{domain}` is DOMAIN, the usernames and short ids are percent-encoded
+    QR_CODE_PROFILE_URL: str = "{domain}/{username}"
+    QR_CODE_SHORT_LINK_URL: str = "{domain}/s/{short_id}"
+    QR_CODE_SIZES: List[int] = [128, 256, 512, 1024]
+    QR_CODE_DEFAULT_SIZE: int = 256
+    QR_CODE_PROCESS_WORKERS: int = 2
+    QR_CODE_BATCH_MAX_SIZE: int = 10_000
+    QR_CODE_BATCH_CHUNK_SIZE: int = 64
+
+    # Health checks of the tile urls, see `app.core.link_checker`
+    LINK_CHECK_CONCURRENCY: int = 10
+    LINK_CHECK_PER_HOST: int = 2
+    LINK_CHECK_TIMEOUT: float = 10
+    LINK_CHECK_MAX_REDIRECTS: int = 5
+    LINK_CHECK_INTERVAL_HOURS: float = 24
+    LINK_CHECK_BATCH_SIZE: int = 200
+    LINK_CHECK_CACHE_SIZE: int = 10_000
+    LINK_CHECK_CACHE_TTL: float = 3600
+    LINK_CHECK_MAX_LOOP_LAG_MS: int = 20
+    LINK_CHECK_MAX_POOL_WAIT_MS: int = 10
+    LINK_CHECK_PAUSE: float = 1
+    LINK_CHECK_USER_AGENT: str = "YooCard-LinkChecker/1.0"
+    # Only to check links against a local stub server
+    LINK_CHECK_ALLOW_PRIVATE: bool = False
+
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL: float = 1
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_LEASE_SECONDS: float = 60
+
+    JOBS_ENABLED: bool = True
+    JOBS_POLL_INTERVAL: float = 1
+    JOBS_LEASE_SECONDS: float = 60
+    JOBS_THREAD_WORKERS: int = 4
+    JOBS_PROCESS_WORKERS: int = 2
+    JOBS_RETENTION_HOURS: float = 24
+    JOBS_SHUTDOWN_TIMEOUT: float = 10
+    USER_PURGE_BATCH_SIZE: int = 500
+    TILE_CLASSIFY_BATCH_SIZE: int = 500
+
     @field_validator("SQLALCHEMY_DATABASE_URI")
     def assemble_db_connection(
         cls, v: Optional[str], values: FieldValidationInfo
@@ -0,0 +1,294 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Pattern
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.rate_limit import PICTURE_PATH, username_from_token
+
+logger = logging.getLogger(__name__)
+
+# Requests per outcome: executed, replayed, waited, mismatched, conflicted
+idempotency_stats: Counter = Counter()
+
+IDEMPOTENT_ROUTES: tuple[tuple[frozenset[str], Pattern[str]], ...] = (
+    (frozenset({"POST", "PATCH"}), re.compile(rf"^{re.escape(settings.API_V1_STR)}/users$")),
+    (frozenset({"POST", "PATCH"}), PICTURE_PATH),
+    (frozenset({"POST"}), re.compile(rf"^{re.escape(settings.API_V1_STR)}/register$")),
+)
+
+MAX_KEY_LENGTH = 255
+
+# Transient refusals, e.g. by the rate limiter, the retries of the request must run
+TRANSIENT_STATUSES = frozenset({408, 425, 429})
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    fingerprint: str
+    status: int
+    headers: List[tuple[bytes, bytes]]
+    body: bytes
+
+    def dumps(self) -> bytes:
+        return json.dumps({
+            "fingerprint": self.fingerprint,
+            "status": self.status,
+            "headers": [[name.decode("latin-1"), value.decode("latin-1")] for name, value in self.headers],
+            "body": base64.b64encode(self.body).decode(),
+        }).encode()
+
+    @classmethod
+    def loads(cls, raw: bytes) -> "StoredResponse":
+        data = json.loads(raw)
+        return cls(
+            fingerprint=data["fingerprint"],
+            status=data["status"],
+            headers=[(name.encode("latin-1"), value.encode("latin-1")) for name, value in data["headers"]],
+            body=base64.b64decode(data["body"]),
+        )
+
+
+class InMemoryIdempotencyBackend:
+    """Responses kept by the worker process.
+       The number of responses is bounded, the oldest ones are evicted first.
+    """
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._responses: "OrderedDict[str, tuple[float, StoredResponse]]" = OrderedDict()
+        self._locks: Dict[str, float] = {}
+
+    async def get(self, key: str) -> Optional[StoredResponse]:
+        entry = self._responses.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._responses[key]
+            return None
+        return entry[1]
+
+    async def reserve(self, key: str, ttl: float) -> bool:
+        now = time.monotonic()
+        if self._locks.get(key, 0.0) > now:
+            return False
+        self._locks[key] = now + ttl
+        return True
+
+    async def save(self, key: str, response: StoredResponse, ttl: float) -> None:
+        self._locks.pop(key, None)
+        self._responses.pop(key, None)
+        self._responses[key] = (time.monotonic() + ttl, response)
+        while len(self._responses) > self.max_entries:
+            self._responses.popitem(last=False)
+
+    async def release(self, key: str) -> None:
+        self._locks.pop(key, None)
+
+
+class RedisIdempotencyBackend:
+    """Responses shared by all workers, kept in any server speaking the Redis protocol.
+       A request is reserved with `SET NX` and a TTL, so the reservation of a worker that died expires.
+    """
+
+    def __init__(self, client, prefix: str = "idempotency:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisIdempotencyBackend":
+        import redis.asyncio as redis
+
+        return cls(redis.from_url(url))
+
+    async def get(self, key: str) -> Optional[StoredResponse]:
+        raw = await self.client.get(self.prefix + key)
+        return StoredResponse.loads(raw) if raw is not None else None
+
+    async def reserve(self, key: str, ttl: float) -> bool:
+        return bool(await self.client.set(f"{self.prefix}lock:{key}", b"1", nx=True, px=int(ttl * 1000)))
+
+    async def save(self, key: str, response: StoredResponse, ttl: float) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(self.prefix + key, response.dumps(), px=int(ttl * 1000))
+            pipe.delete(f"{self.prefix}lock:{key}")
+            await pipe.execute()
+
+    async def release(self, key: str) -> None:
+        await self.client.delete(f"{self.prefix}lock:{key}")
+
+
+def get_idempotency_backend():
+    if settings.IDEMPOTENCY_REDIS_URL:
+        return RedisIdempotencyBackend.from_url(settings.IDEMPOTENCY_REDIS_URL)
+    return InMemoryIdempotencyBackend(settings.IDEMPOTENCY_STORE_SIZE)
+
+
+class IdempotencyMiddleware:
+    """Execute the requests to `routes` with the same `Idempotency-Key` once.
+
+    The first response is stored with a fingerprint of the request and replayed, with
+    `Idempotent-Replayed: true`, to the retries with the same key, caller, route and body;
+    a key reused for another body gets 422. A duplicate arriving while the first request
+    runs waits for its response, for up to `IDEMPOTENCY_WAIT_TIMEOUT` seconds before a 409.
+    Server errors and transient refusals (408, 425, 429) are not stored, the retries of such
+    a request run again.
+    When the backend is unavailable requests run as if they had no key.
+    """
+
+    def __init__(self, app: ASGIApp, backend=None, routes=IDEMPOTENT_ROUTES):
+        self.app = app
+        self.backend = backend or get_idempotency_backend()
+        self.routes = routes
+        self._in_flight: Dict[str, tuple[str, asyncio.Future]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._match(scope):
+            return await self.app(scope, receive, send)
+        request = Request(scope)
+        key = request.headers.get("idempotency-key")
+        if key is None:
+            return await self.app(scope, receive, send)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            response = JSONResponse({"detail": "Invalid Idempotency-Key"}, status_code=400)
+            return await response(scope, receive, send)
+
+        body = await _read_body(receive)
+        if body is None:
+            return
+        receive = _replay_body(body, receive)
+        fingerprint = hashlib.sha256(scope["query_string"] + b"\0" + body).hexdigest()
+        username = username_from_token(request.cookies.get("access_token"))
+        key = f"{username or ''}:{scope['method']}:{scope['path']}:{key}"
+
+        try:
+            stored = await self._acquire(key, fingerprint)
+        except Exception:
+            logger.warning("Idempotency backend unavailable", exc_info=True)
+            return await self.app(scope, receive, send)
+        if isinstance(stored, JSONResponse):
+            return await stored(scope, receive, send)
+        if stored is not None:
+            if stored.fingerprint != fingerprint:
+                idempotency_stats["mismatched"] += 1
+                response = JSONResponse({"detail": "Idempotency-Key reused with another request"}, status_code=422)
+                return await response(scope, receive, send)
+            idempotency_stats["replayed"] += 1
+            return await _send_stored(stored, send)
+
+        idempotency_stats["executed"] += 1
+        await self._execute(key, fingerprint, scope, receive, send)
+
+    def _match(self, scope: Scope) -> bool:
+        return any(scope["method"] in methods and path.match(scope["path"]) for methods, path in self.routes)
+
+    async def _acquire(self, key: str, fingerprint: str):
+        """The stored response, an error response, or None once the request is reserved for this caller"""
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+        while True:
+            stored = await self.backend.get(key)
+            if stored is not None:
+                return stored
+            in_flight = self._in_flight.get(key)
+            if in_flight is None and await self.backend.reserve(key, settings.IDEMPOTENCY_LOCK_SECONDS):
+                self._in_flight[key] = (fingerprint, asyncio.get_running_loop().create_future())
+                return None
+            if in_flight is not None and in_flight[0] != fingerprint:
+                idempotency_stats["mismatched"] += 1
+                return JSONResponse({"detail": "Idempotency-Key reused with another request"}, status_code=422)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                idempotency_stats["conflicted"] += 1
+                return JSONResponse(
+                    {"detail": "A request with this Idempotency-Key is in progress"},
+                    status_code=409,
+                    headers={"Retry-After": "1"},
+                )
+            idempotency_stats["waited"] += 1
+            if in_flight is not None:
+                # Woken up as soon as the request of this worker completes
+                await asyncio.wait([in_flight[1]], timeout=remaining)
+            else:
+                # Running in another worker
+                await asyncio.sleep(min(0.1, remaining))
+
+    async def _execute(self, key: str, fingerprint: str, scope: Scope, receive: Receive, send: Send) -> None:
+        status = 500
+        headers: List[tuple[bytes, bytes]] = []
+        chunks: List[bytes] = []
+        size = 0
+
+        async def capture(message: Message) -> None:
+            nonlocal status, headers, size
+            if message["type"] == "http.response.start":
+                status, headers = message["status"], list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                size += len(body)
+                if size <= settings.IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                    chunks.append(body)
+            await send(message)
+
+        completed = False
+        try:
+            await self.app(scope, receive, capture)
+            completed = True
+        finally:
+            _, done = self._in_flight.pop(key)
+            try:
+                if (
+                    completed
+                    and status < 500
+                    and status not in TRANSIENT_STATUSES
+                    and size <= settings.IDEMPOTENCY_MAX_RESPONSE_BYTES
+                ):
+                    stored = StoredResponse(fingerprint, status, headers, b"".join(chunks))
+                    await self.backend.save(key, stored, settings.IDEMPOTENCY_TTL)
+                else:
+                    await self.backend.release(key)
+            except Exception:
+                logger.warning("Idempotency backend unavailable", exc_info=True)
+            done.set_result(None)
+
+
+async def _read_body(receive: Receive) -> Optional[bytes]:
+    """The whole request body, None when the client disconnected"""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+def _replay_body(body: bytes, receive: Receive) -> Receive:
+    replayed = False
+
+    async def replay() -> Message:
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+    return replay
+
+
+async def _send_stored(stored: StoredResponse, send: Send) -> None:
+    await send({
+        "type": "http.response.start",
+        "status": stored.status,
+        "headers": stored.headers + [(b"idempotent-replayed", b"true")],
+    })
+    await send({"type": "http.response.body", "body": stored.body})
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import logging
+import random
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Callable, ClassVar, Dict, List, Optional, Type
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.session import get_async_engine
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """Change of the data of a user, local caches derived from it are stale."""
+
+    type: ClassVar[str]
+    user_id: uuid.UUID
+
+
+@dataclass(frozen=True)
+class UserUpdated(ChangeEvent):
+    type: ClassVar[str] = "user_updated"
+
+
+@dataclass(frozen=True)
+class TilesChanged(ChangeEvent):
+    type: ClassVar[str] = "tiles_changed"
+
+
+@dataclass(frozen=True)
+class UserDeactivated(ChangeEvent):
+    type: ClassVar[str] = "user_deactivated"
+
+
+EVENT_TYPES: Dict[str, Type[ChangeEvent]] = {
+    event_type.type: event_type for event_type in (UserUpdated, TilesChanged, UserDeactivated)
+}
+
+Handler = Callable[[ChangeEvent], None]
+MessageCallback = Callable[[str], None]
+ResetCallback = Callable[[], None]
+
+
+class InMemoryInvalidationBackend:
+    """Deliver the messages to the buses of the current process.
+       Buses sharing one backend behave like workers sharing a database, for tests and single-worker runs.
+    """
+
+    def __init__(self):
+        self._listeners: List[MessageCallback] = []
+
+    async def start(self, on_message: MessageCallback, on_reset: ResetCallback) -> None:
+        self._listeners.append(on_message)
+
+    async def stop(self) -> None:
+        self._listeners.clear()
+
+    async def publish(self, payload: str) -> None:
+        for listener in list(self._listeners):
+            listener(payload)
+
+
+class PostgresInvalidationBackend:
+    """Deliver the messages to every worker with Postgres `LISTEN/NOTIFY`.
+
+    Each worker keeps one connection outside the pool listening on `channel`, it is checked
+    every `keepalive` seconds and reopened with backoff when lost. Notifications sent while
+    the worker was not listening are lost, so `on_reset` clears the local caches every time
+    the listener (re)connects. Messages are published through the pool.
+    """
+
+    def __init__(self, dsn: str, channel: str, keepalive: float = 30, backoff_max: float = 30):
+        self.dsn = dsn
+        self.channel = channel
+        self.keepalive = keepalive
+        self.backoff_max = backoff_max
+        self.connected = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, on_message: MessageCallback, on_reset: ResetCallback) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen(on_message, on_reset))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def publish(self, payload: str) -> None:
+        async with get_async_engine().connect() as conn:
+            await conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": self.channel, "payload": payload})
+            await conn.commit()
+
+    async def _listen(self, on_message: MessageCallback, on_reset: ResetCallback) -> None:
+        import asyncpg
+
+        failures = 0
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(self.channel, lambda _conn, _pid, _channel, payload: on_message(payload))
+                self.connected = True
+                failures = 0
+                on_reset()
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), self.keepalive)
+                    except asyncio.TimeoutError:
+                        # A half-open connection is not reported by the termination listener
+                        await asyncio.wait_for(conn.execute("SELECT 1"), self.keepalive)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                logger.warning("Invalidation listener on %s failed: %r", self.channel, e)
+            finally:
+                self.connected = False
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(random.uniform(0, min(self.backoff_max, 2 ** failures)))
+
+
+class InvalidationBus:
+    """Publish change events to every worker, each one evicts its local caches.
+
+    Events are dispatched to the local handlers at once and to the other workers
+    through the backend; a worker ignores its own messages coming back.
+    Publishing never fails the caller, the caches are bounded by their TTL anyway.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.origin = uuid.uuid4().hex
+        self.published: Counter = Counter()
+        self.received: Counter = Counter()
+        self.resets = 0
+        self._handlers: Dict[Type[ChangeEvent], List[Handler]] = defaultdict(list)
+        self._reset_handlers: List[ResetCallback] = []
+
+    def subscribe(self, *event_types: Type[ChangeEvent], handler: Handler) -> None:
+        for event_type in event_types:
+            self._handlers[event_type].append(handler)
+
+    def on_reset(self, handler: ResetCallback) -> None:
+        self._reset_handlers.append(handler)
+
+    async def start(self) -> None:
+        await self.backend.start(self._on_message, self._on_reset)
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+
+    async def publish(self, event: ChangeEvent) -> None:
+        self.published[event.type] += 1
+        self._dispatch(event)
+        payload = json.dumps({"type": event.type, "user_id": str(event.user_id), "origin": self.origin})
+        try:
+            await self.backend.publish(payload)
+        except Exception as e:
+            logger.warning("Failed to publish %s: %r", event, e)
+
+    def _dispatch(self, event: ChangeEvent) -> None:
+        for handler in self._handlers[type(event)]:
+            try:
+                handler(event)
+            except Exception:
+                logger.exception("Invalidation handler failed for %s", event)
+
+    def _on_message(self, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+            event = EVENT_TYPES[message["type"]](user_id=uuid.UUID(message["user_id"]))
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed invalidation message %r", payload)
+            return
+        if message.get("origin") == self.origin:
+            return
+        self.received[event.type] += 1
+        self._dispatch(event)
+
+    def _on_reset(self) -> None:
+        self.resets += 1
+        for handler in self._reset_handlers:
+            handler()
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "connected": getattr(self.backend, "connected", True),
+            "published": dict(self.published),
+            "received": dict(self.received),
+            "resets": self.resets,
+        }
+
+
+def get_invalidation_backend():
+    if settings.INVALIDATION_BACKEND == "postgres":
+        return PostgresInvalidationBackend(str(settings.SQLALCHEMY_DATABASE_URI), settings.INVALIDATION_CHANNEL)
+    return InMemoryInvalidationBackend()
+
+
+invalidation_bus = InvalidationBus(get_invalidation_backend())
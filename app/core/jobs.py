@@ -0,0 +1,316 @@
+import asyncio
+import logging
+import multiprocessing
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Literal, Optional
+
+from sqlalchemy import and_, delete, event, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.constants import JobStatusEnum, JobTypeEnum
+from app.core.config import settings
+from app.db.session import get_async_engine
+from app.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+Executor = Literal["async", "thread", "process"]
+
+
+@dataclass(frozen=True)
+class JobSpec:
+    """How a job type runs.
+
+    `async` jobs are coroutines run on the event loop, `thread` jobs are blocking functions
+    run in the thread pool of the runner and `process` jobs are CPU-bound functions run in
+    its process pool; those must be importable module-level functions. A job receives its
+    payload and returns a JSON-serializable result.
+    """
+
+    type: JobTypeEnum
+    fn: Callable[[dict], Any]
+    executor: Executor = "async"
+    concurrency: int = 1
+    max_attempts: int = 3
+    timeout: Optional[float] = None
+
+
+class JobRunner:
+    """Run deferred jobs persisted in the `jobs` table, in every worker, without a broker.
+
+    Jobs are enqueued in the transaction of the request, so a job exists only if the work
+    that scheduled it was committed. Each worker claims queued jobs with `FOR UPDATE SKIP LOCKED`,
+    at most `concurrency` running jobs per type and worker, and holds them under a lease renewed
+    while they run; the job of a worker that died is claimed again once its lease expired.
+    Failed jobs are retried with backoff until `max_attempts`, succeeded jobs are pruned
+    after `retention`. A `thread` or `process` job timed out or cancelled by the shutdown keeps
+    running, so it stays RUNNING until its lease expired; a job whose lease expired on its last
+    attempt is failed.
+    """
+
+    def __init__(
+        self,
+        *,
+        poll_interval: float,
+        lease: float,
+        thread_workers: int,
+        process_workers: int,
+        retention: timedelta,
+        shutdown_timeout: float
+    ):
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.retention = retention
+        self.shutdown_timeout = shutdown_timeout
+        self.specs: Dict[str, JobSpec] = {}
+        self.succeeded: Counter = Counter()
+        self.retried: Counter = Counter()
+        self.failed: Counter = Counter()
+        self.timed_out: Counter = Counter()
+        self._running: Dict[int, tuple[str, asyncio.Task]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: list[asyncio.Task] = []
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._pruned_at = float("-inf")
+
+    def job(self, type: JobTypeEnum, **options) -> Callable:
+        def register(fn: Callable[[dict], Any]) -> Callable[[dict], Any]:
+            self.specs[type.value] = JobSpec(type, fn, **options)
+            return fn
+        return register
+
+    @staticmethod
+    def enqueue(db: AsyncSession, type: JobTypeEnum, payload: dict, *, run_at: Optional[datetime] = None) -> Job:
+        job = Job(type=type.value, payload=payload, status=JobStatusEnum.QUEUED)
+        if run_at is not None:
+            job.run_at = run_at
+        db.add(job)
+        db.info["jobs"] = True
+        return job
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run()), asyncio.create_task(self._renew_leases())]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        running = [task for _, task in self._running.values()]
+        if running:
+            _, pending = await asyncio.wait(running, timeout=self.shutdown_timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._thread_pool = self._process_pool = None
+
+    def wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        failures = 0
+        while True:
+            self._wakeup.clear()
+            try:
+                for spec in self.specs.values():
+                    await self._claim(spec)
+                await self._prune()
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                logger.warning("Job runner failed to claim jobs: %r", e)
+                await asyncio.sleep(random.uniform(0, min(30, 2 ** failures)))
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self, spec: JobSpec) -> None:
+        free = spec.concurrency - sum(1 for type, _ in self._running.values() if type == spec.type.value)
+        if free <= 0:
+            return
+        now = func.now()
+        # Jobs killing their worker, or timing out in a thread or a process, every time
+        exhausted = (
+            update(Job)
+            .where(
+                Job.type == spec.type.value,
+                Job.status == JobStatusEnum.RUNNING,
+                Job.locked_until < now,
+                Job.attempts >= spec.max_attempts,
+            )
+            .values(
+                status=JobStatusEnum.FAILED,
+                locked_until=None,
+                last_error="The lease expired on the last attempt",
+                finished_at=now,
+            )
+        )
+        claimable = (
+            select(Job.id)
+            .where(
+                Job.type == spec.type.value,
+                or_(
+                    and_(Job.status == JobStatusEnum.QUEUED, Job.run_at <= now),
+                    and_(
+                        Job.status == JobStatusEnum.RUNNING,
+                        Job.locked_until < now,
+                        Job.attempts < spec.max_attempts,
+                    ),
+                ),
+            )
+            .order_by(Job.run_at, Job.id)
+            .limit(free)
+            .with_for_update(skip_locked=True)
+        )
+        claim = (
+            update(Job)
+            .where(Job.id.in_(claimable.scalar_subquery()))
+            .values(
+                status=JobStatusEnum.RUNNING,
+                locked_until=now + timedelta(seconds=self.lease),
+                attempts=Job.attempts + 1,
+            )
+            .returning(Job.id, Job.payload, Job.attempts)
+        )
+        async with get_async_engine().begin() as conn:
+            failed = (await conn.execute(exhausted)).rowcount
+            jobs = (await conn.execute(claim)).all()
+        if failed:
+            self.failed[spec.type.value] += failed
+            logger.error("%s jobs (%s) failed for good, their lease expired on the last attempt", failed, spec.type.value)
+        for job in jobs:
+            task = asyncio.create_task(self._execute(spec, job.id, job.payload, job.attempts))
+            self._running[job.id] = (spec.type.value, task)
+
+    async def _execute(self, spec: JobSpec, job_id: int, payload: dict, attempts: int) -> None:
+        try:
+            if spec.executor == "async":
+                result = await asyncio.wait_for(spec.fn(payload), spec.timeout)
+            else:
+                future = self._submit(spec, payload)
+                done, _ = await asyncio.wait({future}, timeout=spec.timeout)
+                if not done:
+                    # Like a cancelled one, the job stays RUNNING while its function keeps running
+                    self.timed_out[spec.type.value] += 1
+                    logger.warning("Job %s (%s) timed out, it is claimed again once its lease expired", job_id, spec.type.value)
+                    return
+                result = future.result()
+        except asyncio.CancelledError:
+            if spec.executor == "async":
+                # Stopped by the shutdown, the job is not counted as an attempt
+                await self._finish(job_id, status=JobStatusEnum.QUEUED, attempts=Job.attempts - 1, run_at=func.now())
+            # A thread or a process keeps running once cancelled, requeued its job could run twice
+            # at once: it stays RUNNING and is claimed again once its lease, no longer renewed, expired
+            raise
+        except Exception as e:
+            error = repr(e)[:1024]
+            if attempts >= spec.max_attempts:
+                self.failed[spec.type.value] += 1
+                logger.error("Job %s (%s) failed for good: %s", job_id, spec.type.value, error)
+                await self._finish(job_id, status=JobStatusEnum.FAILED, last_error=error, finished_at=func.now())
+            else:
+                self.retried[spec.type.value] += 1
+                backoff = timedelta(seconds=min(3600, 2 ** attempts))
+                await self._finish(job_id, status=JobStatusEnum.QUEUED, last_error=error, run_at=func.now() + backoff)
+        else:
+            self.succeeded[spec.type.value] += 1
+            await self._finish(job_id, status=JobStatusEnum.SUCCEEDED, result=result, finished_at=func.now())
+        finally:
+            self._running.pop(job_id, None)
+            self.wake()
+
+    def _submit(self, spec: JobSpec, payload: dict) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        if spec.executor == "thread":
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(self.thread_workers, thread_name_prefix="jobs")
+            return loop.run_in_executor(self._thread_pool, spec.fn, payload)
+        if self._process_pool is None:
+            # Forking a process running an event loop and a connection pool is unsafe
+            self._process_pool = ProcessPoolExecutor(self.process_workers, mp_context=multiprocessing.get_context("spawn"))
+        return loop.run_in_executor(self._process_pool, spec.fn, payload)
+
+    @staticmethod
+    async def _finish(job_id: int, **values) -> None:
+        try:
+            async with get_async_engine().begin() as conn:
+                await conn.execute(update(Job).where(Job.id == job_id).values(locked_until=None, **values))
+        except Exception as e:
+            # The lease expires and the job is claimed again
+            logger.warning("Failed to record the outcome of job %s: %r", job_id, e)
+
+    async def _renew_leases(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            if not self._running:
+                continue
+            try:
+                async with get_async_engine().begin() as conn:
+                    await conn.execute(
+                        update(Job)
+                        .where(Job.id.in_(list(self._running)), Job.status == JobStatusEnum.RUNNING)
+                        .values(locked_until=func.now() + timedelta(seconds=self.lease))
+                    )
+            except Exception as e:
+                logger.warning("Failed to renew the job leases: %r", e)
+
+    async def _prune(self) -> None:
+        if time.monotonic() - self._pruned_at < 3600:
+            return
+        self._pruned_at = time.monotonic()
+        async with get_async_engine().begin() as conn:
+            await conn.execute(
+                delete(Job).where(Job.status == JobStatusEnum.SUCCEEDED, Job.finished_at < func.now() - self.retention)
+            )
+
+    def stats(self) -> dict:
+        return {
+            "running": Counter(type for type, _ in self._running.values()),
+            "concurrency": {type: spec.concurrency for type, spec in self.specs.items()},
+            "succeeded": dict(self.succeeded),
+            "retried": dict(self.retried),
+            "failed": dict(self.failed),
+            "timed_out": dict(self.timed_out),
+        }
+
+
+job_runner = JobRunner(
+    poll_interval=settings.JOBS_POLL_INTERVAL,
+    lease=settings.JOBS_LEASE_SECONDS,
+    thread_workers=settings.JOBS_THREAD_WORKERS,
+    process_workers=settings.JOBS_PROCESS_WORKERS,
+    retention=timedelta(hours=settings.JOBS_RETENTION_HOURS),
+    shutdown_timeout=settings.JOBS_SHUTDOWN_TIMEOUT,
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_runner(session: Session) -> None:
+    if session.info.pop("jobs", False):
+        job_runner.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session) -> None:
+    session.info.pop("jobs", None)
@@ -0,0 +1,201 @@
+"""
+Health checks of the tile URLs.
+
+Links are checked through one pooled HTTP client, with at most `concurrency` requests in flight
+and `per_host` per host, so a batch full of links to the same site does not hammer it. Results
+are cached per normalized URL, the same link on many cards is requested once. The checker yields
+to the requests of the worker: it pauses while the event loop lags or requests wait for a
+database connection.
+
+Only public hosts are requested, the URLs come from the users: the host is resolved once, the
+connection goes to the checked address and the name is only sent in the Host header and for TLS,
+so a host answering with a public address first and a private one next cannot get through.
+LINK_CHECK_ALLOW_PRIVATE lifts that restriction, e.g. to run the checker against a local stub
+server. The HTTP client is imported with the first check, not by every worker.
+"""
+import asyncio
+import ipaddress
+import logging
+import socket
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, Iterable, Optional
+from urllib.parse import urljoin
+
+from app.constants import TileLinkStatusEnum
+from app.core.config import settings
+from app.core.load_shedding import LoadMonitor, load_monitor
+from app.core.local_cache import LocalCache
+from app.utils.tile_urls import normalize_url
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+LinkCheck = tuple[TileLinkStatusEnum, Optional[int]]
+
+# Servers answering HEAD with these often serve GET fine
+_HEAD_UNSUPPORTED = {403, 405, 501}
+
+
+class BlockedHost(Exception):
+    """The host resolves to a private, loopback or otherwise non-public address"""
+
+
+class RequestFailed(Exception):
+    """No response, the connection or the exchange failed"""
+
+
+class LinkChecker:
+    def __init__(
+        self,
+        *,
+        concurrency: int,
+        per_host: int,
+        timeout: float,
+        max_redirects: int,
+        cache: LocalCache,
+        monitor: LoadMonitor,
+        allow_private: bool = False
+    ):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.cache = cache
+        self.monitor = monitor
+        self.allow_private = allow_private
+        self.checked: Counter = Counter()
+        self.pauses = 0
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._host_users: Counter = Counter()
+
+    async def check_many(self, urls: Iterable[str]) -> Dict[str, LinkCheck]:
+        """The check of every distinct URL, run concurrently within the limits"""
+        urls = list(dict.fromkeys(urls))
+        results = await asyncio.gather(*(self.check(url) for url in urls))
+        return dict(zip(urls, results))
+
+    async def check(self, url: str) -> LinkCheck:
+        url = normalize_url(url)
+        cached = self.cache.get(url)
+        if cached is not None:
+            return cached
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        async with self._slots:
+            await self._wait_for_idle()
+            result = await self._check(url)
+        self.checked[result[0].value] += 1
+        self.cache.set(url, result)
+        return result
+
+    async def _check(self, url: str) -> LinkCheck:
+        try:
+            # Redirects are followed here, every host has to be checked
+            for _ in range(self.max_redirects + 1):
+                status_code, location = await self._request(url)
+                if location is None:
+                    break
+                url = urljoin(url, location)
+            else:
+                return TileLinkStatusEnum.ERROR, status_code
+        except (RequestFailed, BlockedHost, OSError, ValueError) as e:
+            logger.debug("Link %s is unreachable: %r", url, e)
+            return TileLinkStatusEnum.UNREACHABLE, None
+        if status_code < 400:
+            return TileLinkStatusEnum.OK, status_code
+        if status_code in (404, 410):
+            return TileLinkStatusEnum.BROKEN, status_code
+        return TileLinkStatusEnum.ERROR, status_code
+
+    async def _request(self, url: str) -> tuple[int, Optional[str]]:
+        """The status code of `url` and where it redirects to, the body is never read"""
+        import httpx
+
+        try:
+            request_url = httpx.URL(url)
+        except httpx.InvalidURL as e:
+            raise ValueError(f"Invalid URL: {url}") from e
+        if request_url.scheme not in ("http", "https") or not request_url.raw_host:
+            raise ValueError(f"Not a web URL: {url}")
+        host = request_url.raw_host.decode("ascii")
+        address = await self._resolve(host, request_url.port or (443 if request_url.scheme == "https" else 80))
+        # Connected to the checked address, the host name is kept for the Host header and the certificate
+        headers = {"Host": request_url.netloc.decode("ascii")}
+        extensions = {"sni_hostname": host}
+        request_url = request_url.copy_with(host=address)
+        self._host_users[host] += 1
+        slots = self._host_slots.setdefault(host, asyncio.Semaphore(self.per_host))
+        try:
+            async with slots:
+                client = self._get_client()
+                async with client.stream("HEAD", request_url, headers=headers, extensions=extensions) as response:
+                    status_code, location = response.status_code, response.headers.get("location")
+                if status_code in _HEAD_UNSUPPORTED:
+                    async with client.stream("GET", request_url, headers=headers, extensions=extensions) as response:
+                        status_code, location = response.status_code, response.headers.get("location")
+        except httpx.HTTPError as e:
+            raise RequestFailed(e) from e
+        finally:
+            self._host_users[host] -= 1
+            if not self._host_users[host]:
+                del self._host_users[host]
+                del self._host_slots[host]
+        return status_code, location if 300 <= status_code < 400 else None
+
+    async def _resolve(self, host: str, port: int) -> str:
+        """The address to connect to for `host`, a public one unless `allow_private`"""
+        if self.allow_private:
+            return host
+        addresses = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        for *_, sockaddr in addresses:
+            if not ipaddress.ip_address(sockaddr[0]).is_global:
+                raise BlockedHost(host)
+        return addresses[0][4][0]
+
+    async def _wait_for_idle(self) -> None:
+        # The checks wait while the worker is busy with requests, they are never urgent
+        while (
+            self.monitor.loop_lag * 1000 > settings.LINK_CHECK_MAX_LOOP_LAG_MS
+            or self.monitor.pool_wait * 1000 > settings.LINK_CHECK_MAX_POOL_WAIT_MS
+        ):
+            self.pauses += 1
+            await asyncio.sleep(settings.LINK_CHECK_PAUSE)
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+                headers={"User-Agent": settings.LINK_CHECK_USER_AGENT},
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "checked": dict(self.checked),
+            "pauses": self.pauses,
+            "hosts": len(self._host_slots),
+            "cache": self.cache.stats(),
+        }
+
+
+link_checker = LinkChecker(
+    concurrency=settings.LINK_CHECK_CONCURRENCY,
+    per_host=settings.LINK_CHECK_PER_HOST,
+    timeout=settings.LINK_CHECK_TIMEOUT,
+    max_redirects=settings.LINK_CHECK_MAX_REDIRECTS,
+    cache=LocalCache("link_checks", maxsize=settings.LINK_CHECK_CACHE_SIZE, ttl=settings.LINK_CHECK_CACHE_TTL),
+    monitor=load_monitor,
+    allow_private=settings.LINK_CHECK_ALLOW_PRIVATE,
+)
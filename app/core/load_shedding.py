@@ -0,0 +1,137 @@
+import asyncio
+import time
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import ORMExecuteState, Session, SessionTransaction
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.db.session import holds_connection
+
+
+class DecayingPeak:
+    """Highest recent value, halved every `half_life` seconds."""
+
+    def __init__(self, half_life: float):
+        self.half_life = half_life
+        self._value = 0.0
+        self._recorded_at = 0.0
+
+    def record(self, value: float) -> None:
+        self._value = max(value, self.value)
+        self._recorded_at = time.monotonic()
+
+    @property
+    def value(self) -> float:
+        elapsed = time.monotonic() - self._recorded_at
+        return self._value * 0.5 ** (elapsed / self.half_life)
+
+
+class LoadMonitor:
+    """Track event-loop lag and database pool wait of the worker.
+
+    Loop lag is sampled by a background task that measures how late its own
+    wake-ups are, pool wait is the time the first query of a session waits for its
+    connection. Both keep their
+    recent peak and decay with `half_life` seconds, so the monitor recovers once
+    shed requests stop reaching the loop and the pool.
+    """
+
+    def __init__(self, interval: float = 0.1, half_life: float = 1.0):
+        self.interval = interval
+        self.shed = 0
+        self._loop_lag = DecayingPeak(half_life)
+        self._pool_wait = DecayingPeak(half_life)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._sample_loop_lag())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sample_loop_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self._loop_lag.record(max(0.0, loop.time() - started - self.interval))
+
+    def record_pool_wait(self, seconds: float) -> None:
+        self._pool_wait.record(seconds)
+
+    @property
+    def loop_lag(self) -> float:
+        return self._loop_lag.value
+
+    @property
+    def pool_wait(self) -> float:
+        return self._pool_wait.value
+
+    def overloaded(self) -> bool:
+        return (
+            self.loop_lag * 1000 > settings.LOAD_SHEDDING_MAX_LOOP_LAG_MS
+            or self.pool_wait * 1000 > settings.LOAD_SHEDDING_MAX_POOL_WAIT_MS
+        )
+
+    def stats(self) -> dict:
+        return {
+            "loop_lag_ms": self.loop_lag * 1000,
+            "pool_wait_ms": self.pool_wait * 1000,
+            "overloaded": self.overloaded(),
+            "shed": self.shed,
+        }
+
+
+load_monitor = LoadMonitor()
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _start_pool_wait(state: ORMExecuteState) -> None:
+    # A session checks out its connection lazily, for its first query
+    if not holds_connection(state.session):
+        state.session.info.setdefault("pool_wait_started", time.perf_counter())
+
+
+@event.listens_for(Session, "after_begin")
+def _record_pool_wait(session: Session, transaction: SessionTransaction, connection: Connection) -> None:
+    started = session.info.pop("pool_wait_started", None)
+    if started is not None:
+        load_monitor.record_pool_wait(time.perf_counter() - started)
+
+
+class LoadSheddingMiddleware:
+    """Reject requests with 503 and `Retry-After` while the worker is overloaded,
+       so the latency of admitted requests stays bounded.
+    """
+
+    def __init__(self, app: ASGIApp, monitor: LoadMonitor = load_monitor, exempt_paths: tuple[str, ...] = ("/health", "/ready")):
+        self.app = app
+        self.monitor = monitor
+        self.exempt_paths = exempt_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] == "http"
+            and scope["path"] not in self.exempt_paths
+            and self.monitor.overloaded()
+        ):
+            self.monitor.shed += 1
+            response = JSONResponse(
+                {"detail": "Service overloaded"},
+                status_code=503,
+                headers={"Retry-After": str(settings.LOAD_SHEDDING_RETRY_AFTER)}
+            )
+            return await response(scope, receive, send)
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,100 @@
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Type
+
+from app.core.config import settings
+from app.core.invalidation import ChangeEvent, TilesChanged, UserDeactivated, UserUpdated, invalidation_bus
+
+
+class LocalCache:
+    """Bounded cache local to the worker, entries expire after `ttl` seconds.
+
+    Entries are tagged with the ids they derive from, a change event evicts every entry
+    of its user. `generation` changes on every eviction: a value loaded before an
+    eviction is not stored, so a slow load cannot put back data the event just evicted.
+    """
+
+    def __init__(self, name: str, *, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, tuple[float, Any, tuple]]" = OrderedDict()
+        self._tags: Dict[Hashable, Set[Hashable]] = defaultdict(set)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, *, tags: Iterable[Hashable] = (), generation: Optional[int] = None) -> None:
+        if generation is not None and generation != self.generation:
+            return
+        if key in self._entries:
+            self._remove(key)
+        tags = tuple(tags)
+        self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+        for tag in tags:
+            self._tags[tag].add(key)
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate_tag(self, tag: Hashable) -> None:
+        self.generation += 1
+        for key in self._tags.pop(tag, ()):
+            if key in self._entries:
+                self._remove(key)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        self.generation += 1
+        self.evictions += len(self._entries)
+        self._entries.clear()
+        self._tags.clear()
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+local_caches: Dict[str, LocalCache] = {}
+
+
+def register_cache(cache: LocalCache, *event_types: Type[ChangeEvent]) -> LocalCache:
+    """Evict the entries of a user on `event_types`, and everything when the bus missed events."""
+    local_caches[cache.name] = cache
+    invalidation_bus.subscribe(*event_types, handler=lambda event: cache.invalidate_tag(event.user_id))
+    invalidation_bus.on_reset(cache.clear)
+    return cache
+
+
+# Serialized public profiles by username, tagged with the user id
+profile_cache = register_cache(
+    LocalCache("profiles", maxsize=settings.PROFILE_CACHE_SIZE, ttl=settings.PROFILE_CACHE_TTL),
+    UserUpdated, TilesChanged, UserDeactivated,
+)
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import defaultdict, deque
+from typing import Dict, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = LAG_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self) -> dict:
+        labels = [f"le_{bucket}" for bucket in self.buckets] + ["le_inf"]
+        return {"buckets": dict(zip(labels, self.counts)), "count": self.count, "sum": self.sum}
+
+
+class _InFlightRequest:
+    __slots__ = ("scope", "max_lag")
+
+    def __init__(self, scope: Scope):
+        self.scope = scope
+        self.max_lag = 0.0
+
+
+def _route_path(scope: Scope) -> str:
+    # Label by the route template so path parameters do not explode the cardinality
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+class LoopDiagnostics:
+    """Diagnostic mode detecting event-loop lag and the calls blocking the loop.
+
+    A heartbeat task ticks every `interval` seconds and measures how late it wakes
+    up. A watchdog thread checks the heartbeat; when it is older than `threshold`
+    the loop is stuck in a single step, so the watchdog captures the stack of the
+    loop thread and the route of the task being run. The event is completed with
+    its duration when the heartbeat comes back.
+
+    Two histograms per route are kept, in milliseconds:
+      - ``lag``: the worst loop lag each request of the route had to wait through,
+      - ``blocking``: the duration of the blocking steps caused by the route.
+    """
+
+    def __init__(self, threshold: float, interval: float = 0.01, max_events: int = 100):
+        self.threshold = threshold
+        self.interval = interval
+        self.lag: Dict[str, Histogram] = defaultdict(Histogram)
+        self.blocking: Dict[str, Histogram] = defaultdict(Histogram)
+        self.events: deque = deque(maxlen=max_events)
+        self._in_flight: Dict[asyncio.Task, _InFlightRequest] = {}
+        self._pending: Optional[dict] = None
+        self._heartbeat = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        if self._heartbeat_task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat_task = self._loop.create_task(self._beat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        if self._heartbeat_task is None:
+            return
+        self._stopped.set()
+        self._heartbeat_task.cancel()
+        try:
+            await self._heartbeat_task
+        except asyncio.CancelledError:
+            pass
+        self._heartbeat_task = None
+        self._watchdog.join(timeout=1)
+
+    async def _beat(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._heartbeat = time.monotonic()
+            self._observe_lag(max(0.0, self._heartbeat - started - self.interval))
+
+    def _observe_lag(self, lag: float) -> None:
+        for request in self._in_flight.values():
+            request.max_lag = max(request.max_lag, lag)
+
+        event, self._pending = self._pending, None
+        if event is not None:
+            event["duration_ms"] = max(lag, event.pop("stale")) * 1000
+            self.blocking[event["route"]].observe(event["duration_ms"])
+            self.events.append(event)
+            logger.warning(
+                "Event loop blocked for %.0f ms in %s\n%s",
+                event["duration_ms"], event["route"], "".join(event["stack"])
+            )
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.threshold / 4):
+            heartbeat = self._heartbeat
+            stale = time.monotonic() - heartbeat - self.interval
+            if stale > self.threshold and self._pending is None:
+                event = self._capture(stale)
+                # Drop the capture when the loop moved on while the stack was taken
+                if self._heartbeat == heartbeat:
+                    self._pending = event
+
+    def _capture(self, stale: float) -> dict:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        task = asyncio.current_task(self._loop)
+        request = self._in_flight.get(task)
+        return {
+            "at": time.time(),
+            "route": _route_path(request.scope) if request else "background",
+            "task": task.get_name() if task else None,
+            "stack": traceback.format_stack(frame) if frame else [],
+            "stale": stale,
+        }
+
+    def track(self, scope: Scope) -> Optional[_InFlightRequest]:
+        task = asyncio.current_task()
+        if task is None:
+            return None
+        request = self._in_flight[task] = _InFlightRequest(scope)
+        return request
+
+    def untrack(self, request: _InFlightRequest) -> None:
+        self._in_flight.pop(asyncio.current_task(), None)
+        self.lag[_route_path(request.scope)].observe(request.max_lag * 1000)
+
+    def stats(self) -> dict:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "lag": {route: histogram.to_dict() for route, histogram in self.lag.items()},
+            "blocking": {route: histogram.to_dict() for route, histogram in self.blocking.items()},
+            "events": list(self.events),
+        }
+
+
+loop_diagnostics = LoopDiagnostics(threshold=settings.LOOP_DIAGNOSTICS_THRESHOLD_MS / 1000)
+
+
+class LoopDiagnosticsMiddleware:
+    """Attribute loop lag and blocking steps to the route of each request."""
+
+    def __init__(self, app: ASGIApp, diagnostics: LoopDiagnostics = loop_diagnostics):
+        self.app = app
+        self.diagnostics = diagnostics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request = self.diagnostics.track(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if request is not None:
+                self.diagnostics.untrack(request)
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import random
+from collections import Counter
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.constants import OutboxTopicEnum
+from app.core.config import settings
+from app.db.session import get_async_engine
+from app.models.outbox_event import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+OutboxHandler = Callable[[dict], Awaitable[None]]
+
+
+class Outbox:
+    """Side effects of database changes that must not be lost nor run for a change rolled back.
+
+    `add` writes the event in the transaction of the change, so the event exists if and only
+    if the change was committed. The dispatcher processes the committed events afterwards.
+    Delivery is at least once: a handler may run again for the same event and must be idempotent.
+    """
+
+    def __init__(self):
+        self.handlers: Dict[str, OutboxHandler] = {}
+
+    def handler(self, topic: OutboxTopicEnum) -> Callable[[OutboxHandler], OutboxHandler]:
+        def register(fn: OutboxHandler) -> OutboxHandler:
+            self.handlers[topic.value] = fn
+            return fn
+        return register
+
+    @staticmethod
+    def add(db: Union[AsyncSession, Session], topic: OutboxTopicEnum, payload: dict) -> None:
+        db.add(OutboxEvent(topic=topic.value, payload=payload))
+        db.info["outbox"] = True
+
+
+outbox = Outbox()
+
+
+class OutboxDispatcher:
+    """Process the committed outbox events in batches.
+
+    A batch is claimed with `FOR UPDATE SKIP LOCKED`, so every worker can run a dispatcher
+    without two of them claiming the same events. Claiming leases the events for `lease`
+    seconds: an event claimed by a worker that died is claimed again once its lease expired.
+    Processed events are deleted; failed events are retried with backoff and kept with
+    `failed_at` set after `max_attempts`, for inspection.
+
+    The dispatcher wakes up on the commits of the worker that added events and polls every
+    `poll_interval` seconds for the events of the other workers and the retries.
+    """
+
+    def __init__(self, outbox: Outbox, *, batch_size: int, poll_interval: float, max_attempts: int, lease: float):
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.processed: Counter = Counter()
+        self.retried: Counter = Counter()
+        self.failed: Counter = Counter()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        failures = 0
+        while True:
+            try:
+                claimed = await self.dispatch_batch()
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                logger.warning("Outbox dispatch failed: %r", e)
+                await asyncio.sleep(random.uniform(0, min(30, 2 ** failures)))
+                continue
+            # A full batch means more events are likely waiting
+            if claimed == self.batch_size:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def dispatch_batch(self) -> int:
+        """Claim a batch of available events, run their handlers and record the outcomes."""
+        claimable = (
+            select(OutboxEvent.id)
+            .where(OutboxEvent.failed_at.is_(None), OutboxEvent.available_at <= func.now())
+            .order_by(OutboxEvent.available_at, OutboxEvent.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        claim = (
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_(claimable.scalar_subquery()))
+            .values(available_at=func.now() + timedelta(seconds=self.lease), attempts=OutboxEvent.attempts + 1)
+            .returning(OutboxEvent.id, OutboxEvent.topic, OutboxEvent.payload, OutboxEvent.attempts)
+        )
+        async with get_async_engine().begin() as conn:
+            events = (await conn.execute(claim)).all()
+        if not events:
+            return 0
+
+        results = await asyncio.gather(*(self._handle(event) for event in events), return_exceptions=True)
+        done: List[int] = []
+        async with get_async_engine().begin() as conn:
+            for event, result in zip(events, results):
+                if result is None:
+                    done.append(event.id)
+                    self.processed[event.topic] += 1
+                    continue
+                values = {"last_error": repr(result)[:1024]}
+                if event.attempts >= self.max_attempts:
+                    values["failed_at"] = func.now()
+                    self.failed[event.topic] += 1
+                    logger.error("Outbox event %s (%s) failed for good: %r", event.id, event.topic, result)
+                else:
+                    values["available_at"] = func.now() + timedelta(seconds=min(3600, 2 ** event.attempts))
+                    self.retried[event.topic] += 1
+                await conn.execute(update(OutboxEvent).where(OutboxEvent.id == event.id).values(**values))
+            if done:
+                await conn.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(done)))
+        return len(events)
+
+    async def _handle(self, event) -> None:
+        handler = self.outbox.handlers.get(event.topic)
+        if handler is None:
+            raise LookupError(f"No outbox handler for {event.topic}")
+        await handler(event.payload)
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "processed": dict(self.processed),
+            "retried": dict(self.retried),
+            "failed": dict(self.failed),
+        }
+
+
+outbox_dispatcher = OutboxDispatcher(
+    outbox,
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    poll_interval=settings.OUTBOX_POLL_INTERVAL,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    lease=settings.OUTBOX_LEASE_SECONDS,
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_dispatcher(session: Session) -> None:
+    if session.info.pop("outbox", False):
+        outbox_dispatcher.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session) -> None:
+    session.info.pop("outbox", None)
@@ -0,0 +1,229 @@
+"""
+Live updates of the public profiles, pushed to the WebSocket and SSE subscribers of the worker.
+
+Subscribers follow a user, not a username, so they keep following a renamed user. The change
+events of the invalidation bus trigger one read of the profile per change, whatever the number
+of subscribers, and the same document is handed to all of them. A subscriber keeps only the
+latest document it has not sent yet: a slow client skips intermediate versions instead of
+queueing them, so the memory of a subscriber is bounded whatever the rate of changes.
+"""
+import asyncio
+import logging
+import uuid
+from typing import Dict, Optional, Set
+
+from app import crud, models
+from app.core.config import settings
+from app.core.invalidation import ChangeEvent, TilesChanged, UserDeactivated, UserUpdated, invalidation_bus
+from app.core.local_cache import profile_cache
+from app.db.session import async_session
+from app.schemas.serializers import profile_serializer
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileFeedFull(Exception):
+    """The worker or the profile has reached its subscriber limit"""
+
+
+class ProfileSubscriber:
+    """One connection following the profile of `user_id`.
+
+    `reason` tells why `next` returned None: `deleted` when the profile is gone,
+    `closed` when the worker shuts down, `unsubscribed` when the connection ended.
+    """
+
+    __slots__ = ("user_id", "reason", "_document", "_changed")
+
+    def __init__(self, user_id: uuid.UUID):
+        self.user_id = user_id
+        self.reason: Optional[str] = None
+        self._document: Optional[bytes] = None
+        self._changed = asyncio.Event()
+
+    def push(self, document: bytes) -> bool:
+        """Hand over the latest document, False when it replaces one not sent yet"""
+        replaced = self._document is not None
+        self._document = document
+        self._changed.set()
+        return not replaced
+
+    def end(self, reason: str) -> None:
+        if self.reason is None:
+            self.reason = reason
+            self._changed.set()
+
+    async def next(self) -> Optional[bytes]:
+        """The next document to send, None once the subscription ended"""
+        while self._document is None and self.reason is None:
+            self._changed.clear()
+            await self._changed.wait()
+        document, self._document = self._document, None
+        return document if self.reason is None else None
+
+
+class ProfileFeed:
+    """Fan-out of the profile changes to the subscribers of the worker.
+
+    At most `max_subscribers` connections per worker and `max_per_profile` per profile are
+    accepted. A change arriving while the profile is being read is coalesced into one more read.
+    """
+
+    def __init__(self, *, max_subscribers: int, max_per_profile: int):
+        self.max_subscribers = max_subscribers
+        self.max_per_profile = max_per_profile
+        self.reads = 0
+        self.delivered = 0
+        self.skipped = 0
+        self.rejected = 0
+        self.failed = 0
+        self._count = 0
+        self._changes = 0
+        self._topics: Dict[uuid.UUID, Set[ProfileSubscriber]] = {}
+        self._refreshing: Dict[uuid.UUID, asyncio.Task] = {}
+        self._stale: Set[uuid.UUID] = set()
+
+    async def subscribe(self, username: str) -> Optional[tuple[ProfileSubscriber, bytes]]:
+        """Follow the profile of `username`, with its current document; None when not found.
+
+        :raises ProfileFeedFull: Over the subscriber limits
+        """
+        if self._count >= self.max_subscribers:
+            self.rejected += 1
+            raise ProfileFeedFull()
+        changes = self._changes
+        loaded = await self._load(username=username)
+        if loaded is None:
+            return None
+        user_id, document = loaded
+        subscribers = self._topics.setdefault(user_id, set())
+        if len(subscribers) >= self.max_per_profile or self._count >= self.max_subscribers:
+            if not subscribers:
+                del self._topics[user_id]
+            self.rejected += 1
+            raise ProfileFeedFull()
+        subscriber = ProfileSubscriber(user_id)
+        subscribers.add(subscriber)
+        self._count += 1
+        if self._changes != changes:
+            # A change may have been fanned out while the document was read
+            self._schedule(user_id)
+        return subscriber, document
+
+    def unsubscribe(self, subscriber: ProfileSubscriber) -> None:
+        subscriber.end("unsubscribed")
+        subscribers = self._topics.get(subscriber.user_id)
+        if subscribers is not None and subscriber in subscribers:
+            subscribers.remove(subscriber)
+            self._count -= 1
+            if not subscribers:
+                del self._topics[subscriber.user_id]
+
+    def close(self) -> None:
+        """End every subscription, e.g. before the worker drains its connections"""
+        for task in self._refreshing.values():
+            task.cancel()
+        for subscribers in self._topics.values():
+            for subscriber in subscribers:
+                subscriber.end("closed")
+        self._topics.clear()
+        self._count = 0
+
+    def _on_change(self, event: ChangeEvent) -> None:
+        self._changes += 1
+        if event.user_id in self._topics:
+            self._schedule(event.user_id)
+
+    def _on_reset(self) -> None:
+        # Events were missed, every followed profile may have changed
+        self._changes += 1
+        for user_id in list(self._topics):
+            self._schedule(user_id)
+
+    def _schedule(self, user_id: uuid.UUID) -> None:
+        if user_id in self._refreshing:
+            self._stale.add(user_id)
+            return
+        self._refreshing[user_id] = asyncio.get_running_loop().create_task(self._refresh(user_id))
+
+    async def _refresh(self, user_id: uuid.UUID) -> None:
+        try:
+            while True:
+                self._stale.discard(user_id)
+                try:
+                    loaded = await self._load(user_id=user_id)
+                except Exception as e:
+                    self.failed += 1
+                    logger.warning("Failed to read the profile of %s for its subscribers: %r", user_id, e)
+                    return
+                self._fan_out(user_id, loaded[1] if loaded is not None else None)
+                if user_id not in self._stale:
+                    return
+        finally:
+            self._refreshing.pop(user_id, None)
+
+    def _fan_out(self, user_id: uuid.UUID, document: Optional[bytes]) -> None:
+        if document is None:
+            for subscriber in self._topics.pop(user_id, ()):
+                subscriber.end("deleted")
+                self._count -= 1
+            return
+        for subscriber in self._topics.get(user_id, ()):
+            if subscriber.push(document):
+                self.delivered += 1
+            else:
+                self.skipped += 1
+
+    async def _load(
+        self, *, username: Optional[str] = None, user_id: Optional[uuid.UUID] = None
+    ) -> Optional[tuple[uuid.UUID, bytes]]:
+        """The user id and the serialized profile, from the published document when there is one"""
+        self.reads += 1
+        generation = profile_cache.generation
+        async with async_session() as db:
+            if username is not None:
+                published = await crud.published_profile.get_by_username(db, username=username)
+                if published is not None:
+                    user_id = published.user_id
+            else:
+                published = await crud.published_profile.get(db, user_id=user_id)
+                if published is not None:
+                    username = published.username
+            if published is not None:
+                content = published.document.encode()
+            else:
+                # Not published yet, e.g. before the drift check filled in the existing users
+                db_users = await crud.user.get_many(
+                    db,
+                    usernames=[username] if username is not None else [],
+                    ids=[user_id] if user_id is not None else [],
+                    including=[models.Tile],
+                )
+                if not db_users:
+                    return None
+                user_id, username, content = db_users[0].id, db_users[0].username, profile_serializer.dump_json(db_users[0])
+        # The HTTP reads following the change are served from the cache
+        profile_cache.set(username, content, tags=(user_id,), generation=generation)
+        return user_id, content
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self._count,
+            "profiles": len(self._topics),
+            "max_subscribers": self.max_subscribers,
+            "max_per_profile": self.max_per_profile,
+            "refreshing": len(self._refreshing),
+            "reads": self.reads,
+            "delivered": self.delivered,
+            "skipped": self.skipped,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
+
+
+profile_feed = ProfileFeed(
+    max_subscribers=settings.PROFILE_FEED_MAX_SUBSCRIBERS,
+    max_per_profile=settings.PROFILE_FEED_MAX_PER_PROFILE,
+)
+invalidation_bus.subscribe(UserUpdated, TilesChanged, UserDeactivated, handler=profile_feed._on_change)
+invalidation_bus.on_reset(profile_feed._on_reset)
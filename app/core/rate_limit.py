@@ -0,0 +1,198 @@
+import logging
+import math
+import re
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Pattern
+
+from jose import jwt
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rejected requests per rule name
+rate_limited: Counter = Counter()
+
+
+@dataclass(frozen=True)
+class Rate:
+    """Token bucket holding up to `capacity` tokens, refilled with `per_second` tokens."""
+    capacity: int
+    per_second: float
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    name: str
+    methods: frozenset[str]
+    path: Pattern[str]
+    per_ip: Optional[Rate] = None
+    per_user: Optional[Rate] = None
+
+
+PICTURE_PATH = re.compile(rf"^{re.escape(settings.API_V1_STR)}/users(/[^/]+)?/picture$")
+
+RATE_LIMIT_RULES = (
+    RateLimitRule(
+        name="login",
+        methods=frozenset({"POST"}),
+        path=re.compile(rf"^{re.escape(settings.API_V1_STR)}/login$"),
+        per_ip=Rate(capacity=10, per_second=10 / 60),
+    ),
+    RateLimitRule(
+        name="register",
+        methods=frozenset({"POST"}),
+        path=re.compile(rf"^{re.escape(settings.API_V1_STR)}/register$"),
+        per_ip=Rate(capacity=5, per_second=5 / 3600),
+    ),
+    RateLimitRule(
+        name="picture",
+        methods=frozenset({"POST", "PATCH"}),
+        path=PICTURE_PATH,
+        per_ip=Rate(capacity=30, per_second=30 / 3600),
+        per_user=Rate(capacity=10, per_second=10 / 3600),
+    ),
+)
+
+
+class InMemoryRateLimitBackend:
+    """Token buckets local to the worker process.
+       The number of buckets is bounded, the least recently used ones are evicted first.
+    """
+
+    def __init__(self, max_buckets: int = 100_000):
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+
+    async def acquire(self, key: str, rate: Rate, cost: int = 1) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (rate.capacity, now))
+        tokens = min(rate.capacity, tokens + (now - updated_at) * rate.per_second)
+
+        retry_after = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            retry_after = (cost - tokens) / rate.per_second
+
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local per_second = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - updated_at) * per_second)
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    retry_after = (cost - tokens) / per_second
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / per_second) + 1)
+return tostring(retry_after)
+"""
+
+
+class RedisRateLimitBackend:
+    """Token buckets shared by all workers, kept in any server speaking the Redis protocol.
+
+    The bucket is updated atomically by a Lua script using the server clock, so workers
+    on different hosts agree on it. When the server is unreachable requests are allowed,
+    a rate limiter outage must not take the API down.
+    """
+
+    def __init__(self, client, prefix: str = "rate-limit:"):
+        self.prefix = prefix
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisRateLimitBackend":
+        import redis.asyncio as redis
+
+        return cls(redis.from_url(url))
+
+    async def acquire(self, key: str, rate: Rate, cost: int = 1) -> float:
+        try:
+            retry_after = await self._script(
+                keys=[self.prefix + key], args=[rate.capacity, rate.per_second, cost]
+            )
+        except Exception:
+            logger.warning("Rate limit backend unavailable", exc_info=True)
+            return 0.0
+        return float(retry_after)
+
+
+def get_rate_limit_backend():
+    if settings.RATE_LIMIT_REDIS_URL:
+        return RedisRateLimitBackend.from_url(settings.RATE_LIMIT_REDIS_URL)
+    return InMemoryRateLimitBackend()
+
+
+class RateLimitMiddleware:
+    """Apply per-IP and per-user token buckets to the routes in `rules`.
+       Rejected requests get 429 with `Retry-After`.
+    """
+
+    def __init__(self, app: ASGIApp, backend=None, rules: tuple[RateLimitRule, ...] = RATE_LIMIT_RULES):
+        self.app = app
+        self.backend = backend or get_rate_limit_backend()
+        self.rules = rules
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        rule = self._match(scope)
+        if rule is not None:
+            retry_after = await self._acquire(rule, Request(scope))
+            if retry_after > 0:
+                rate_limited[rule.name] += 1
+                response = JSONResponse(
+                    {"detail": "Too many requests"},
+                    status_code=429,
+                    headers={"Retry-After": str(math.ceil(retry_after))}
+                )
+                return await response(scope, receive, send)
+
+        await self.app(scope, receive, send)
+
+    def _match(self, scope: Scope) -> Optional[RateLimitRule]:
+        for rule in self.rules:
+            if scope["method"] in rule.methods and rule.path.match(scope["path"]):
+                return rule
+        return None
+
+    async def _acquire(self, rule: RateLimitRule, request: Request) -> float:
+        retry_after = 0.0
+        if rule.per_ip and request.client:
+            retry_after = await self.backend.acquire(f"{rule.name}:ip:{request.client.host}", rule.per_ip)
+        if rule.per_user and not retry_after:
+            username = username_from_token(request.cookies.get("access_token"))
+            if username:
+                retry_after = await self.backend.acquire(f"{rule.name}:user:{username}", rule.per_user)
+        return retry_after
+
+
+def username_from_token(access_token: Optional[str]) -> Optional[str]:
+    if not access_token:
+        return None
+    try:
+        payload = jwt.decode(access_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except jwt.JWTError:
+        return None
+    return payload.get("sub")
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from app.constants import SSHTunnelStateEnum
+from app.core.config import settings
+from app.core.singleflight import single_flight
+from app.core.ssh_tunnel import ssh_tunnel_manager
+from app.db.session import get_async_engine
+from app.static_files import PATH_STATIC_FILES
+
+logger = logging.getLogger(__name__)
+
+Check = Callable[[], Awaitable[Optional[dict]]]
+
+
+class Readiness:
+    """Whether the worker should receive traffic.
+
+    It is set once the startup of the application, warmup included, has finished and
+    cleared as soon as the worker starts to drain under `app.server`, so load balancers stop
+    routing to it before the in-flight requests are completed; under plain uvicorn only by
+    the shutdown event, once the connections are drained. `/health` only tells that the process is alive.
+
+    While set, the registered checks of the dependencies are run too. A check raises when
+    its dependency is unavailable and may return details. Results are cached for `ttl`
+    seconds and concurrent probes share one run, so frequent probing costs one query at most.
+    """
+
+    def __init__(self, ttl: float, timeout: float):
+        self.ready = False
+        self.ttl = ttl
+        self.timeout = timeout
+        self.results: Dict[str, dict] = {}
+        self._checks: Dict[str, Check] = {}
+        self._checked_at = float("-inf")
+
+    def add_check(self, name: str, check: Check) -> None:
+        self._checks[name] = check
+
+    async def check(self) -> bool:
+        if not self.ready:
+            return False
+        if time.monotonic() - self._checked_at > self.ttl:
+            self.results = await single_flight.do(("readiness",), self._run_checks)
+            self._checked_at = time.monotonic()
+        return all(result["ok"] for result in self.results.values())
+
+    async def _run_checks(self) -> Dict[str, dict]:
+        results = await asyncio.gather(*(self._run_check(name, check) for name, check in self._checks.items()))
+        return dict(zip(self._checks, results))
+
+    async def _run_check(self, name: str, check: Check) -> dict:
+        started = time.perf_counter()
+        try:
+            details = await asyncio.wait_for(check(), self.timeout)
+        except Exception as e:
+            logger.warning("Readiness check %s failed: %r", name, e)
+            return {"ok": False, "error": repr(e), "duration_ms": (time.perf_counter() - started) * 1000}
+        return {"ok": True, **(details or {}), "duration_ms": (time.perf_counter() - started) * 1000}
+
+
+async def check_database() -> dict:
+    engine = get_async_engine()
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    pool = engine.pool
+    return {"pool": {"size": pool.size(), "checked_out": pool.checkedout(), "overflow": pool.overflow()}}
+
+
+async def check_tunnel() -> dict:
+    if settings.ENVIRONMENT != "prod":
+        return {"enabled": False}
+    if ssh_tunnel_manager.state != SSHTunnelStateEnum.UP:
+        raise ConnectionError(f"SSH tunnel is {ssh_tunnel_manager.state.value}: {ssh_tunnel_manager.last_error}")
+    return {"enabled": True, **ssh_tunnel_manager.stats()}
+
+
+async def check_storage() -> None:
+    def writable() -> bool:
+        return os.path.isdir(PATH_STATIC_FILES) and os.access(PATH_STATIC_FILES, os.W_OK)
+
+    # Network mounts can block, keep the filesystem off the event loop
+    if not await asyncio.to_thread(writable):
+        raise OSError(f"{PATH_STATIC_FILES} is not a writable directory")
+
+
+readiness = Readiness(ttl=settings.READINESS_CACHE_SECONDS, timeout=settings.READINESS_CHECK_TIMEOUT)
+readiness.add_check("database", check_database)
+readiness.add_check("tunnel", check_tunnel)
+readiness.add_check("storage", check_storage)
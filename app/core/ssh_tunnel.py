@@ -1,28 +1,97 @@
+import logging
+import os
+import random
+import socket
+import struct
+import tempfile
+import threading
+import time
 from contextlib import contextmanager
+from typing import Optional, TextIO
 
 from sshtunnel import SSHTunnelForwarder
 
+from app.constants import SSHTunnelStateEnum
 from app.core.config import settings
 
+try:
+    import fcntl
+except ImportError:  # Windows, every process runs its own tunnel
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Asks a Postgres server whether it speaks TLS, it answers `S` or `N` at once
+POSTGRES_SSL_REQUEST = struct.pack("!ii", 8, 80877103)
+
 
 class SSHTunnelManager:
-    def __init__(self):
-        self.tunnel = None
+    """Supervised SSH tunnel to the database.
+
+    One process per host owns the tunnel, the one holding the lock file of the local
+    port; it is the master of `app.server` or the first worker to start. The other
+    workers only probe the local port, and take the tunnel over when the owner exits.
+
+    The owner sends keepalives on the SSH transport, and every process probes the database
+    through the local port every `probe_interval` seconds. A dead tunnel is closed at once, so
+    database connections are refused instead of hanging until the pool timeout, and
+    reopened with exponential backoff up to `backoff_max` seconds.
+    """
+
+    def __init__(
+        self,
+        *,
+        ssh_address: Optional[tuple[str, int]] = None,
+        ssh_username: Optional[str] = None,
+        ssh_password: Optional[str] = None,
+        remote_bind_address: Optional[tuple[str, int]] = None,
+        local_bind_address: Optional[tuple[str, int]] = None,
+        keepalive: float = settings.SSH_TUNNEL_KEEPALIVE,
+        probe_interval: float = settings.SSH_TUNNEL_PROBE_INTERVAL,
+        probe_timeout: float = settings.SSH_TUNNEL_PROBE_TIMEOUT,
+        backoff_max: float = settings.SSH_TUNNEL_BACKOFF_MAX,
+        lock_path: Optional[str] = None
+    ):
+        self.ssh_address = ssh_address or (settings.SSH_HOST, settings.SSH_PORT)
+        self.ssh_username = ssh_username or settings.SSH_USERNAME
+        self.ssh_password = ssh_password or settings.SSH_PASSWORD
+        self.remote_bind_address = remote_bind_address or (settings.REMOTE_DB_HOST, settings.REMOTE_DB_PORT)
+        self.local_bind_address = local_bind_address or (settings.DB_HOST, settings.DB_PORT)
+        self.keepalive = keepalive
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.backoff_max = backoff_max
+        self.lock_path = lock_path or os.path.join(
+            tempfile.gettempdir(), f"yoocard-ssh-tunnel-{self.local_bind_address[1]}.lock"
+        )
+
+        self.tunnel: Optional[SSHTunnelForwarder] = None
+        self.state = SSHTunnelStateEnum.DOWN
+        self.owner = False
+        self.failures = 0
+        self.reconnects = 0
+        self.last_error: Optional[str] = None
+        self._lock_file: Optional[TextIO] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
 
     def start_tunnel(self):
-        if not self.tunnel or not self.tunnel.is_active:
-            self.tunnel = SSHTunnelForwarder(
-                ssh_address_or_host=(settings.SSH_HOST, settings.SSH_PORT),
-                ssh_username=settings.SSH_USERNAME,
-                ssh_password=settings.SSH_PASSWORD,
-                remote_bind_address=(settings.REMOTE_DB_HOST, settings.REMOTE_DB_PORT),
-                local_bind_address=(settings.DB_HOST, settings.DB_PORT),
-            )
-            self.tunnel.start()
+        """Bring the tunnel up, or wait for the owner's one, and keep supervising it in the background."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._supervise_once()
+        self._thread = threading.Thread(target=self._supervise, name="ssh-tunnel", daemon=True)
+        self._thread.start()
 
     def stop_tunnel(self):
-        if self.tunnel and self.tunnel.is_active:
-            self.tunnel.stop()
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._close()
+        self._release_lock()
+        self.state = SSHTunnelStateEnum.DOWN
 
     @contextmanager
     def tunnel_context(self):
@@ -30,5 +99,127 @@ class SSHTunnelManager:
         yield
         self.stop_tunnel()
 
+    def stats(self) -> dict:
+        return {
+            "state": self.state.value,
+            "owner": self.owner,
+            "failures": self.failures,
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+        }
+
+    def _supervise(self) -> None:
+        delay = self.probe_interval
+        while not self._stopped.wait(delay):
+            delay = self._supervise_once()
+
+    def _supervise_once(self) -> float:
+        """Probe the tunnel, reopen it when this process owns it.
+        :return: Seconds until the next probe
+        """
+        if not self.owner:
+            self.owner = self._acquire_lock()
+
+        if self._probe() or (self.owner and self._reopen()):
+            if self.state != SSHTunnelStateEnum.UP:
+                logger.info("SSH tunnel to %s:%s is up", *self.remote_bind_address)
+            self.state = SSHTunnelStateEnum.UP
+            self.failures = 0
+            self.last_error = None
+            return self.probe_interval
+
+        if self.state == SSHTunnelStateEnum.UP:
+            logger.warning("SSH tunnel to %s:%s is down: %s", *self.remote_bind_address, self.last_error)
+        self.state = SSHTunnelStateEnum.DOWN
+        self.failures += 1
+        if not self.owner:
+            return self.probe_interval
+        # Full jitter, the workers of several hosts do not hammer the SSH server in lockstep
+        return random.uniform(0, min(self.backoff_max, 2 ** self.failures))
+
+    def _probe(self) -> bool:
+        try:
+            if self.owner:
+                self._probe_tunnel()
+            else:
+                self._probe_database()
+        except Exception as e:
+            self.last_error = repr(e)
+            return False
+        return True
+
+    def _probe_tunnel(self) -> None:
+        if self.tunnel is None or not self.tunnel.is_active:
+            raise ConnectionError("SSH transport is not active")
+        self._probe_database()
+
+    def _probe_database(self) -> None:
+        # The local port accepts even when the tunnel cannot reach the database,
+        # only an answer of the database tells that the whole path works
+        with socket.create_connection(self.local_bind_address, timeout=self.probe_timeout) as connection:
+            connection.sendall(POSTGRES_SSL_REQUEST)
+            if connection.recv(1) not in (b"S", b"N"):
+                raise ConnectionError("The database did not answer through the SSH tunnel")
+
+    def _reopen(self) -> bool:
+        self._close()
+        self.state = SSHTunnelStateEnum.CONNECTING
+        try:
+            self.tunnel = SSHTunnelForwarder(
+                ssh_address_or_host=self.ssh_address,
+                ssh_username=self.ssh_username,
+                ssh_password=self.ssh_password,
+                remote_bind_address=self.remote_bind_address,
+                local_bind_address=self.local_bind_address,
+                set_keepalive=self.keepalive,
+            )
+            self.tunnel.start()
+            self._probe_tunnel()
+        except Exception as e:
+            self.last_error = repr(e)
+            self._close()
+            return False
+        self.reconnects += 1
+        return True
+
+    def _close(self) -> None:
+        tunnel, self.tunnel = self.tunnel, None
+        if tunnel is not None:
+            try:
+                tunnel.stop(force=True)
+            except Exception:
+                logger.exception("Failed to close the SSH tunnel")
+
+    def _acquire_lock(self) -> bool:
+        if fcntl is None:
+            return True
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _release_lock(self) -> None:
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        self.owner = False
+
 
 ssh_tunnel_manager = SSHTunnelManager()
+
+
+if __name__ == "__main__":
+    # Run the supervisor alone and print its state, e.g. against a local sshd:
+    #     SSH_HOST=localhost SSH_PORT=2222 ... python -m app.core.ssh_tunnel
+    logging.basicConfig(level=logging.INFO)
+    ssh_tunnel_manager.start_tunnel()
+    try:
+        while True:
+            print(ssh_tunnel_manager.stats())
+            time.sleep(ssh_tunnel_manager.probe_interval)
+    except KeyboardInterrupt:
+        ssh_tunnel_manager.stop_tunnel()
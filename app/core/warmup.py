@@ -0,0 +1,84 @@
+"""
+Warmup run at startup, before the worker reports ready, so the first requests
+after a deploy do not pay for opening connections, compiling statements and
+building serializers.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import AsyncExitStack
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app import crud, models, schemas
+from app.constants import TileTypeEnum, UserRoleEnum
+from app.core.config import settings
+from app.db.session import get_async_engine
+from app.schemas.serializers import profile_serializer
+
+logger = logging.getLogger(__name__)
+
+
+async def open_connections(count: int) -> None:
+    """Open `count` pool connections at once, they stay in the pool when released."""
+    engine = get_async_engine()
+    async with AsyncExitStack() as stack:
+        connections = await asyncio.gather(*(stack.enter_async_context(engine.connect()) for _ in range(count)))
+        await asyncio.gather(*(_prepare_hot_statements(conn) for conn in connections))
+
+
+async def _prepare_hot_statements(conn: AsyncConnection) -> None:
+    """Run the lookups of the hot paths with keys matching nothing.
+
+    It builds the statements of the CRUD statement cache, fills the compiled cache of
+    SQLAlchemy and prepares the statements on the connection for asyncpg.
+    """
+    await conn.execute(text("SELECT 1"))
+    async with AsyncSession(bind=conn) as db:
+        await crud.user.get_by_username(db, username="", including=[models.Tile])
+        await crud.user.get_by_username(db, username="")
+        await crud.user.get_by_email(db, email="")
+        await crud.user.get(db, id=uuid.UUID(int=0))
+        await crud.user.get(db, id=uuid.UUID(int=0), including=[models.Tile])
+
+
+def build_serializers(app: FastAPI) -> None:
+    """Complete the response models of every route and serialize a sample profile."""
+    for route in app.routes:
+        model = getattr(route, "response_model", None) if isinstance(route, APIRoute) else None
+        if isinstance(model, type) and issubclass(model, BaseModel):
+            model.model_rebuild()
+
+    user_id = uuid.uuid4()
+    user = models.User(
+        id=user_id,
+        first_name="Warmup",
+        last_name="Warmup",
+        username="warmup",
+        email="warmup@example.com",
+        role=UserRoleEnum.USER,
+        tiles=[
+            models.Tile(
+                id=uuid.uuid4(), type=TileTypeEnum.CLASSIC, title="Warmup", url="https://example.com",
+                active=True, position=0, short_id="warmup", user_id=user_id
+            )
+        ],
+    )
+    schemas.ResponseProfile.model_validate(user, from_attributes=True).model_dump_json()
+    profile_serializer.dump_json(user)
+
+
+async def warmup(app: FastAPI) -> None:
+    started = time.perf_counter()
+    build_serializers(app)
+    try:
+        await asyncio.wait_for(open_connections(min(settings.WARMUP_CONNECTIONS, settings.DB_POOL_SIZE)), settings.WARMUP_TIMEOUT)
+    except Exception as e:
+        # The worker still starts, the readiness checks report the database until it is reachable
+        logger.warning("Database warmup failed: %r", e)
+    logger.info("Warmup finished in %.0f ms", (time.perf_counter() - started) * 1000)
@@ -1,2 +1,4 @@
 from .crud_user import user
 from .crud_tile import tile
+
+from .crud_published_profile import published_profile
\ No newline at end of file
@@ -1,13 +1,17 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Type, TypeVar, Union
 
 from sqlalchemy.future import select
 
+from app.core.singleflight import single_flight
 from app.db.base import Base
+from app.db.session import async_session, holds_connection
+from app.db.statement_cache import statement_cache
 from fastapi.encoders import jsonable_encoder
 from pydantic import UUID4, BaseModel
-from sqlalchemy.orm import Session, joinedload, selectinload
-from sqlalchemy import inspect, func
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload
+from sqlalchemy import Integer, bindparam, inspect, func
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Executable
 
 # Define custom types for SQLAlchemy model, and Pydantic schemas
 ModelType = TypeVar("ModelType", bound=Base)
@@ -24,6 +28,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         :type model: Type[ModelType]
         """
         self.model = model
+        self._filter_paths: Dict[str, Optional[tuple[tuple, Any]]] = {}
 
     # @property
     # def relations(self):
@@ -35,28 +40,46 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     #     return relationships
 
     async def get_multi(
-        self, db: AsyncSession, *, offset: int = 0, limit: int = 100
+        self, db: AsyncSession, *, offset: int = 0, limit: int = 100, columns: tuple[str, ...] = ()
     ) -> tuple[List[ModelType], int]:
-        query = select(self.model)
-        count_query = select(func.count()).select_from(query.alias())
+        """:param columns: Load only these columns, and the primary key; all of them when empty"""
+        count_query = self._cached_statement(
+            "count", builder=lambda: select(func.count()).select_from(self.model)
+        )
+        column_spec = self._column_spec(columns)
+        query = self._cached_statement(
+            "multi", column_spec,
+            builder=lambda: self._with_columns(
+                # A stable order, pages neither repeat nor skip rows
+                select(self.model)
+                .order_by(self.model.id)
+                .offset(bindparam("offset", type_=Integer))
+                .limit(bindparam("limit", type_=Integer)),
+                column_spec
+            )
+        )
         total_count: int = await db.scalar(count_query)
-        result = await db.execute(query)
+        result = await db.execute(query, {"offset": offset, "limit": limit})
         db_models = [db_model for db_model in result.unique().scalars().all()]
         return db_models, total_count
 
-    async def get(self, db: AsyncSession, id: Union[UUID4, int], including: list[T]) -> Optional[ModelType]:
-        stmt = select(self.model).where(self.model.id == id)
-
-        if including:
-            for rel in including:
-                stmt = stmt.options(selectinload(getattr(self.model, rel.__tablename__)))
-
-        result = await db.execute(stmt)
+    async def get(self, db: AsyncSession, id: Union[UUID4, int], including: list[T] = None) -> Optional[ModelType]:
+        load_spec = self._load_spec(including)
+        stmt = self._cached_statement(
+            "get", load_spec,
+            builder=lambda: self._with_loaders(select(self.model).where(self.model.id == bindparam("id")), load_spec)
+        )
+        result = await db.execute(stmt, {"id": id})
         return result.scalar()
-        #
-        # stmt = select(self.model).where(self.model.id == id)
-        # result = await db.execute(stmt)
-        # return result.scalar()
+
+    async def get_coalesced(
+        self, db: AsyncSession, id: Union[UUID4, int], including: list[T] = None
+    ) -> Optional[ModelType]:
+        """Like `get`, but concurrent identical lookups share one in-flight query.
+        """
+        return await self._coalesce(
+            db, ("get", id, self._load_spec(including)), lambda session: self.get(session, id, including)
+        )
 
     async def create(self, db: AsyncSession, *, obj_in: Union[CreateSchemaType, ModelType]) -> ModelType:
         db_obj = obj_in
@@ -105,53 +128,121 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         return db_obj
 
     @staticmethod
-    def remove(db: Session, *, db_obj: ModelType) -> ModelType:
-        db.delete(db_obj)
-        db.commit()
+    async def remove(db: AsyncSession, *, db_obj: ModelType) -> ModelType:
+        await db.delete(db_obj)
+        await db.commit()
         return db_obj
 
-    def _apply_filters(self, query, **filters):
-        for field, value in filters.items():
-            if value is None:
-                continue
+    async def _coalesce(
+        self,
+        db: AsyncSession,
+        key: tuple,
+        load: Callable[[AsyncSession], Awaitable[Optional[ModelType]]]
+    ) -> Optional[ModelType]:
+        """Run `load` once for all concurrent callers with the same key.
+           The shared query uses its own session, so no caller depends on another request's
+           session. Every caller gets its own copy of the result merged into `db` without
+           another round trip.
+           A caller whose session holds a connection loads on it alone: waiting for a second
+           connection while holding one deadlocks once every connection of the pool is held so.
+        """
+        if holds_connection(db):
+            return await load(db)
 
-            # Handle fields that are in related models
-            if '__' in field:
-                related_model_name, related_field_name = field.split('__')
-                related_model = getattr(self.model, related_model_name).property.mapper.class_
-
-                # Handle many-to-many relationships
-                if related_model_name in self.model.__mapper__.relationships.keys():
-                    related_table = self.model.__mapper__.relationships[related_model_name].secondary
-                    related_column = getattr(related_model, related_field_name, None)
-                    if related_column is None:
-                        continue
-                    if isinstance(value, str):
-                        query = query.join(related_table).join(related_model).where(related_column.ilike(f"%{value}%"))
-                    else:
-                        query = query.join(related_table).join(related_model).where(related_column == value)
-
-                # Handle one-to-many relationships
-                elif related_model_name in self.model.__mapper__.relationships.values():
-                    related_column = getattr(related_model, related_field_name, None)
-                    if related_column is None:
-                        continue
-                    if isinstance(value, str):
-                        query = query.join(getattr(self.model, related_model_name)).where(related_column.ilike(f"%{value}%"))
+        async def load_detached() -> Optional[ModelType]:
+            async with async_session() as session:
+                return await load(session)
+
+        shared = await single_flight.do((self.model, *key), load_detached)
+        if shared is None:
+            return None
+        return await db.merge(shared, load=False)
+
+    def _cached_statement(self, kind: str, *spec: Hashable, builder: Callable[[], Executable]) -> Any:
+        return statement_cache.get_or_build((self.model, kind, *spec), builder)
+
+    @staticmethod
+    def _load_spec(including: Optional[list[T]]) -> tuple[str, ...]:
+        return tuple(rel.__tablename__ for rel in including or ())
+
+    def _column_spec(self, columns: tuple[str, ...]) -> tuple[str, ...]:
+        """The column attributes among `columns`, relationships and unknown names are left out"""
+        column_attrs = self.model.__mapper__.column_attrs
+        return tuple(column for column in columns if column in column_attrs)
+
+    def _with_columns(self, query, column_spec: tuple[str, ...]):
+        if column_spec:
+            query = query.options(load_only(*(getattr(self.model, column) for column in column_spec)))
+        return query
+
+    def _with_loaders(self, query, load_spec: tuple[str, ...]):
+        for key in load_spec:
+            query = query.options(selectinload(getattr(self.model, key)))
+        return query
+
+    def _resolve_filter(self, field: str) -> Optional[tuple[tuple, Any]]:
+        """Resolve a filter field to the joins it needs and the column it targets.
+           Resolved paths are kept per CRUD instance, so the mapper is inspected once per field.
+        """
+        if field in self._filter_paths:
+            return self._filter_paths[field]
+
+        path = None
+        # Handle fields that are in related models
+        if '__' in field:
+            related_model_name, related_field_name = field.split('__')
+            relationship = self.model.__mapper__.relationships.get(related_model_name)
+            if relationship is not None:
+                related_model = relationship.mapper.class_
+                related_column = getattr(related_model, related_field_name, None)
+                if related_column is not None:
+                    # Many-to-many relationships are joined through the secondary table
+                    if relationship.secondary is not None:
+                        joins = (relationship.secondary, related_model)
                     else:
-                        query = query.join(getattr(self.model, related_model_name)).where(related_column == value)
+                        joins = (getattr(self.model, related_model_name),)
+                    path = (joins, related_column)
 
-            # Handle fields that are in the main model
+        # Handle fields that are in the main model
+        else:
+            column = getattr(self.model, field, None)
+            if column is not None:
+                path = ((), column)
+
+        self._filter_paths[field] = path
+        return path
+
+    def _apply_filters(self, query, filter_shape: tuple[tuple[str, bool], ...]):
+        joined = set()
+        for field, is_text in filter_shape:
+            joins, column = self._resolve_filter(field)
+            for target in joins:
+                if target not in joined:
+                    query = query.join(target)
+                    joined.add(target)
+            if is_text:
+                query = query.where(column.ilike(bindparam(field)))
             else:
-                column = getattr(self.model, field, None)
-                if column is None:
-                    continue
-                if isinstance(value, str):
-                    query = query.where(column.ilike(f"%{value}%"))
-                else:
-                    query = query.where(column == value)
+                query = query.where(column == bindparam(field))
         return query
 
+    def _filtered_statement(self, including: list[T] = None, **filters) -> tuple[Executable, dict]:
+        """Return a cached statement for the shape of the given filters and its bound parameters.
+        """
+        params = {}
+        for field, value in sorted(filters.items()):
+            if value is None or self._resolve_filter(field) is None:
+                continue
+            params[field] = f"%{value}%" if isinstance(value, str) else value
+
+        filter_shape = tuple((field, isinstance(filters[field], str)) for field in params)
+        load_spec = self._load_spec(including)
+        stmt = self._cached_statement(
+            "filter", filter_shape, load_spec,
+            builder=lambda: self._with_loaders(self._apply_filters(select(self.model), filter_shape), load_spec)
+        )
+        return stmt, params
+
     def _query_with_all_joined_relationships(self, query=None) -> ModelType:
         mapper = inspect(self.model)
 
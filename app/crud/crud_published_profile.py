@@ -0,0 +1,174 @@
+from itertools import chain
+from typing import Iterable, List, Optional
+
+from pydantic import UUID4
+from sqlalchemy import String, Text, UUID, any_, bindparam, cast, delete, event, func, or_, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from app.constants import OutboxTopicEnum
+from app.core.config import settings
+from app.core.outbox import outbox
+from app.db.statement_cache import statement_cache
+from app.models import PublishedProfile, Tile, User
+from app.schemas.serializers import profile_serializer
+
+
+class CRUDPublishedProfile:
+    """Denormalized public profiles, read as JSON without loading the user and its tiles.
+
+    Every flush records the users whose row or tiles changed, their documents are rebuilt
+    right before the commit, in the same transaction, so a profile is never published
+    without its change nor a change committed without its profile. Documents of deleted
+    users are removed. `repair` rebuilds the documents that drifted anyway, e.g. after
+    changes made outside the ORM.
+
+    With PROFILE_SNAPSHOTS_ENABLED every rebuilt document is also written to the static store
+    once committed, through the outbox.
+    """
+
+    model = PublishedProfile
+
+    async def get_by_username(self, db: AsyncSession, *, username: str) -> Optional[Row]:
+        """The user id and the document rendered by Postgres as JSON text"""
+        stmt = select(self.model.user_id, cast(self.model.document, Text).label("document")).where(
+            self.model.username == bindparam("username")
+        )
+        return (await db.execute(stmt, {"username": username})).first()
+
+    async def get(self, db: AsyncSession, *, user_id: UUID4) -> Optional[Row]:
+        """The username and the document rendered by Postgres as JSON text"""
+        stmt = select(self.model.username, cast(self.model.document, Text).label("document")).where(
+            self.model.user_id == bindparam("user_id")
+        )
+        return (await db.execute(stmt, {"user_id": user_id})).first()
+
+    async def get_many(
+        self, db: AsyncSession, *, usernames: List[str], user_ids: List[UUID4]
+    ) -> List[Row]:
+        """The user id, username and document of every profile matching one of the usernames or ids.
+        The lists are bound as two arrays, one statement serves any number of keys.
+        """
+        stmt = statement_cache.get_or_build(
+            (self.model, "many"),
+            lambda: select(
+                self.model.user_id, self.model.username, cast(self.model.document, Text).label("document")
+            ).where(
+                or_(
+                    self.model.username == any_(bindparam("usernames", type_=ARRAY(String))),
+                    self.model.user_id == any_(bindparam("user_ids", type_=ARRAY(UUID(as_uuid=True)))),
+                )
+            )
+        )
+        result = await db.execute(stmt, {"usernames": usernames, "user_ids": user_ids})
+        return list(result.all())
+
+    @staticmethod
+    def build(db_user: User) -> dict:
+        return profile_serializer.adapter.dump_python(profile_serializer.to_dict(db_user), mode="json")
+
+    def rebuild(self, session: Session, user_ids: Iterable[UUID4]) -> int:
+        """Rebuild the documents of `user_ids` in the transaction of the sync `session`"""
+        user_ids = set(user_ids)
+        db_users = self._load_users(session, user_ids)
+        self._publish_snapshots(session, user_ids)
+        self._upsert(session, db_users)
+        removed = user_ids - {db_user.id for db_user in db_users}
+        if removed:
+            session.execute(delete(self.model).where(self.model.user_id.in_(removed)))
+        return len(user_ids)
+
+    def repair(self, session: Session, user_ids: Iterable[UUID4]) -> dict:
+        """Rebuild the documents of `user_ids` that are missing or differ from their user"""
+        db_users = self._load_users(session, set(user_ids))
+        stored = dict(
+            session.execute(
+                select(self.model.user_id, self.model.document).where(
+                    self.model.user_id.in_([db_user.id for db_user in db_users])
+                )
+            ).all()
+        )
+        missing = [db_user for db_user in db_users if db_user.id not in stored]
+        drifted = [
+            db_user for db_user in db_users
+            if db_user.id in stored and stored[db_user.id] != self.build(db_user)
+        ]
+        self._publish_snapshots(session, [db_user.id for db_user in missing + drifted])
+        self._upsert(session, missing + drifted)
+        return {"checked": len(db_users), "missing": len(missing), "drifted": len(drifted)}
+
+    def remove_deleted(self, session: Session) -> int:
+        """Remove the documents of the soft deleted users, their rows are purged later"""
+        result = session.execute(
+            delete(self.model).where(self.model.user_id.in_(select(User.id).where(User.deleted_at.is_not(None))))
+        )
+        return result.rowcount
+
+    def _publish_snapshots(self, session: Session, user_ids: Iterable[UUID4]) -> None:
+        user_ids = list(user_ids)
+        if not settings.PROFILE_SNAPSHOTS_ENABLED or not user_ids:
+            return
+        # The snapshots under the previous usernames of renamed users are removed
+        previous = dict(
+            session.execute(select(self.model.user_id, self.model.username).where(self.model.user_id.in_(user_ids))).all()
+        )
+        for user_id in user_ids:
+            usernames = [previous[user_id]] if user_id in previous else []
+            outbox.add(session, OutboxTopicEnum.PROFILE_SNAPSHOT_PUBLISH, {"user_id": str(user_id), "usernames": usernames})
+
+    @staticmethod
+    def _load_users(session: Session, user_ids: set) -> List[User]:
+        if not user_ids:
+            return []
+        stmt = (
+            select(User)
+            .where(User.id.in_(user_ids))
+            .options(selectinload(User.tiles))
+            .execution_options(populate_existing=True)
+        )
+        return list(session.scalars(stmt))
+
+    def _upsert(self, session: Session, db_users: List[User]) -> None:
+        if not db_users:
+            return
+        stmt = insert(self.model).values([
+            {"user_id": db_user.id, "username": db_user.username, "document": self.build(db_user)}
+            for db_user in db_users
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.model.user_id],
+            set_={"username": stmt.excluded.username, "document": stmt.excluded.document, "updated_at": func.now()},
+        )
+        session.execute(stmt)
+
+
+published_profile = CRUDPublishedProfile()
+
+
+@event.listens_for(Session, "after_flush")
+def _record_changed_profiles(session: Session, flush_context) -> None:
+    user_ids = session.info.setdefault("changed_profiles", set())
+    # `dirty` also holds the objects only assigned their current values
+    dirty = (obj for obj in session.dirty if session.is_modified(obj, include_collections=False))
+    for obj in chain(session.new, dirty, session.deleted):
+        if isinstance(obj, User):
+            user_ids.add(obj.id)
+        elif isinstance(obj, Tile):
+            user_ids.add(obj.user_id)
+
+
+@event.listens_for(Session, "before_commit")
+def _rebuild_changed_profiles(session: Session) -> None:
+    # Flush first, the pending changes record their users
+    session.flush()
+    user_ids = session.info.pop("changed_profiles", None)
+    if user_ids:
+        published_profile.rebuild(session, user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_profiles(session: Session) -> None:
+    session.info.pop("changed_profiles", None)
@@ -1,8 +1,12 @@
-from typing import Union, Optional
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Union, Optional
 
 from pydantic import UUID4
+from sqlalchemy import UUID, DateTime, any_, bindparam, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.invalidation import TilesChanged, invalidation_bus
 from app.crud.base import CRUDBase
 from app.models import Tile
 from app.schemas import TileCreate, TileUpdate
@@ -16,10 +20,79 @@ class CRUDTile(CRUDBase[Tile, TileCreate, TileUpdate]):
     #     result = await db.execute(query)
     #     i
 
+    async def create(self, db: AsyncSession, *, obj_in: Union[TileCreate, Tile]) -> Tile:
+        db_obj = await super().create(db, obj_in=obj_in)
+        await invalidation_bus.publish(TilesChanged(user_id=db_obj.user_id))
+        return db_obj
+
+    async def create_multi(self, db: AsyncSession, *, objs_in: List[Union[TileCreate, Tile]]) -> List[Tile]:
+        db_objs = await super().create_multi(db, objs_in=objs_in)
+        for user_id in {db_obj.user_id for db_obj in db_objs}:
+            await invalidation_bus.publish(TilesChanged(user_id=user_id))
+        return db_objs
+
+    async def update(self, db: AsyncSession, *, db_obj: Tile, obj_in: Union[TileUpdate, Dict[str, Any]]) -> Tile:
+        db_obj = await super().update(db, db_obj=db_obj, obj_in=obj_in)
+        await invalidation_bus.publish(TilesChanged(user_id=db_obj.user_id))
+        return db_obj
+
+    async def remove(self, db: AsyncSession, *, db_obj: Tile) -> Tile:
+        """Soft delete the tile, it stays a tombstone for the delta sync until purged.
+        """
+        db_obj.deleted_at = datetime.now(timezone.utc)
+        await db.commit()
+        await invalidation_bus.publish(TilesChanged(user_id=db_obj.user_id))
+        return db_obj
+
+    async def get_changes(self, db: AsyncSession, *, user_id: UUID4, since: Optional[datetime]) -> List[Tile]:
+        """The tiles of the user created, updated or deleted at or after `since`, tombstones included;
+        every tile when `since` is None.
+        """
+        stmt = self._cached_statement(
+            "changes", since is not None,
+            builder=lambda: (
+                select(self.model).where(self.model.user_id == bindparam("user_id"))
+                if since is None else
+                select(self.model).where(
+                    self.model.user_id == bindparam("user_id"),
+                    self.model.updated_at >= bindparam("since", type_=DateTime(timezone=True)),
+                )
+            )
+        )
+        result = await db.execute(
+            stmt, {"user_id": user_id, "since": since}, execution_options={"include_deleted": since is not None}
+        )
+        return list(result.scalars().all())
+
+    async def get_short_ids(self, db: AsyncSession, *, ids: List[UUID4]) -> Dict[UUID4, str]:
+        """The short ids of the tiles by tile id, bound as one array whatever the number of ids"""
+        stmt = self._cached_statement(
+            "short_ids",
+            builder=lambda: select(self.model.id, self.model.short_id).where(
+                self.model.id == any_(bindparam("ids", type_=ARRAY(UUID(as_uuid=True))))
+            )
+        )
+        result = await db.execute(stmt, {"ids": ids})
+        return dict(result.all())
+
+    @staticmethod
+    async def sync_horizon(db: AsyncSession) -> datetime:
+        """The time from which the next delta sync has to look for changes.
+
+        Rows are stamped with the start of their transaction, which may commit after a sync read
+        past that time. The start of the oldest open transaction is the latest time no change
+        can be committed before anymore, so a change is never skipped, at worst sent twice.
+        """
+        return await db.scalar(text(
+            "SELECT least(now(), coalesce(min(xact_start), now())) FROM pg_stat_activity "
+            "WHERE datname = current_database() AND backend_type = 'client backend' AND xact_start IS NOT NULL"
+        ))
+
     async def create_tile(self, db: AsyncSession, *, user_id: UUID4, tile: Union[Tile, TileCreate]) -> Optional[Tile]:
         print("Creating tile")
         ...
         return None
 
 
-tile = CRUDTile(Tile)
\ No newline at end of file
+tile = CRUDTile(Tile)
+
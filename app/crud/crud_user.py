@@ -1,10 +1,18 @@
+import sys
+from datetime import datetime, timezone
 from typing import Any, Dict, Optional, Union, List
 
-from sqlalchemy import func
+from pydantic import UUID4
+from sqlalchemy import Float, Integer, String, and_, any_, bindparam, func, or_, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app import schemas
+from app.constants import JobTypeEnum, OutboxTopicEnum, UserSearchModeEnum
+from app.core.invalidation import UserDeactivated, UserUpdated, invalidation_bus
+from app.core.jobs import job_runner
+from app.core.outbox import outbox
 from app.core.security import get_password_hash, verify_password
 from app.crud.base import CRUDBase, ModelType, T
 from app.models import Tile
@@ -13,29 +21,180 @@ from app.schemas.user import UserCreateInDB, UserUpdate
 from sqlalchemy.orm import Session, selectinload
 
 
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """The smallest string greater than every string starting with `prefix` in code point order,
+    None when there is none (a prefix of U+10FFFF only)"""
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    code_point = ord(prefix[-1]) + 1
+    if 0xD800 <= code_point <= 0xDFFF:
+        # Surrogates are not encodable, the next character is U+E000
+        code_point = 0xE000
+    return prefix[:-1] + chr(code_point)
+
+
 class CRUDUser(CRUDBase[User, UserCreateInDB, UserUpdate]):
-    async def get_by_email(self, db: AsyncSession, *, email: str) -> Optional[User]:
-        stmt = select(self.model).where(self.model.email == email)
-        result = await db.execute(stmt)
+    async def get_by_email(self, db: AsyncSession, *, email: str, include_deleted: bool = False) -> Optional[User]:
+        """:param include_deleted: Also match the deleted users not purged yet, their email is still taken"""
+        stmt = self._cached_statement(
+            "by_email", builder=lambda: select(self.model).where(self.model.email == bindparam("email"))
+        )
+        result = await db.execute(stmt, {"email": email}, execution_options={"include_deleted": include_deleted})
         user = result.scalar()
         return user
         # return db.query(self.model).filter(self.model.email == email).first()
 
-    async def get_by_username(self, db: AsyncSession, *, username: str, including: list[T] = None) -> Optional[User]:
-        stmt = select(self.model).where(self.model.username == username)
-
-        if including:
-            for rel in including:
-                print(rel.__tablename__)
-                stmt = stmt.options(selectinload(getattr(self.model, rel.__tablename__)))
-                #
-                # if rel.__tablename__ == "tiles":
-                #     stmt = stmt.options(selectinload(self.model.tiles).selectinload(Tile.icon))
-
-        result = await db.execute(stmt)
+    async def get_by_username(
+        self,
+        db: AsyncSession,
+        *,
+        username: str,
+        including: list[T] = None,
+        include_deleted: bool = False,
+        columns: tuple[str, ...] = ()
+    ) -> Optional[User]:
+        """:param include_deleted: Also match the deleted users not purged yet, their username is still taken
+        :param columns: Load only these columns, and the primary key; all of them when empty
+        """
+        load_spec = self._load_spec(including)
+        column_spec = self._column_spec(columns)
+        stmt = self._cached_statement(
+            "by_username", load_spec, column_spec,
+            builder=lambda: self._with_columns(
+                self._with_loaders(select(self.model).where(self.model.username == bindparam("username")), load_spec),
+                column_spec
+            )
+        )
+        result = await db.execute(stmt, {"username": username}, execution_options={"include_deleted": include_deleted})
         return result.scalar()
         # return db.query(self.model).filter(self.model.username == username).first()
 
+    async def get_many(
+        self, db: AsyncSession, *, usernames: List[str], ids: List[UUID4], including: list[T] = None
+    ) -> List[User]:
+        """The users matching one of the usernames or ids, with one query and one per loaded relationship."""
+        load_spec = self._load_spec(including)
+        stmt = self._cached_statement(
+            "many", load_spec,
+            builder=lambda: self._with_loaders(
+                select(self.model).where(
+                    or_(
+                        self.model.username == any_(bindparam("usernames", type_=ARRAY(String))),
+                        self.model.id == any_(bindparam("ids", type_=ARRAY(self.model.id.type))),
+                    )
+                ),
+                load_spec
+            )
+        )
+        result = await db.execute(stmt, {"usernames": usernames, "ids": ids})
+        return list(result.scalars().all())
+
+    async def get_by_username_coalesced(
+        self, db: AsyncSession, *, username: str, including: list[T] = None
+    ) -> Optional[User]:
+        """Like `get_by_username`, but concurrent identical lookups share one in-flight query.
+        """
+        return await self._coalesce(
+            db,
+            ("by_username", username, self._load_spec(including)),
+            lambda session: self.get_by_username(session, username=username, including=including)
+        )
+
+    async def search(
+        self,
+        db: AsyncSession,
+        *,
+        query: str,
+        mode: UserSearchModeEnum,
+        limit: int = 20,
+        after: Optional[tuple[Any, UUID4]] = None,
+        columns: tuple[str, ...] = ()
+    ) -> tuple[List[User], Optional[tuple[Any, UUID4]]]:
+        """Search users by username, email or name with keyset pagination.
+
+        EXACT and PREFIX match the username or email and are served by the
+        ``ix_users_username_c`` / ``ix_users_email_c`` btree indexes; they compare
+        with the "C" collation, in code point order, so that the prefix range holds
+        whatever the collation of the database. SEARCH matches
+        a substring of any searchable column through the ``pg_trgm`` GIN indexes
+        and ranks the results by trigram similarity.
+
+        :param columns: Load only these columns of the users; all of them when empty
+        :return: The page of users and the keyset to pass as ``after`` for the next page
+        """
+        column_spec = self._column_spec(columns)
+        upper = _prefix_upper_bound(query) if mode == UserSearchModeEnum.PREFIX else None
+        stmt = self._cached_statement(
+            "search", mode, after is not None, upper is not None, column_spec,
+            builder=lambda: self._with_columns(
+                self._search_statement(mode, has_cursor=after is not None, has_upper=upper is not None), column_spec
+            )
+        )
+        params: Dict[str, Any] = {"query": query, "limit": limit + 1}
+        if mode == UserSearchModeEnum.PREFIX:
+            if upper is not None:
+                params["upper"] = upper
+            params["pattern"] = _escape_like(query) + "%"
+        elif mode == UserSearchModeEnum.SEARCH:
+            params["pattern"] = "%" + _escape_like(query) + "%"
+        if after is not None:
+            params["after_key"], params["after_id"] = after
+
+        rows = (await db.execute(stmt, params)).all()
+        next_after = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_after = (rows[-1].key, rows[-1].User.id)
+        return [row.User for row in rows], next_after
+
+    def _search_statement(self, mode: UserSearchModeEnum, *, has_cursor: bool, has_upper: bool = True):
+        query = bindparam("query", type_=String)
+        if mode == UserSearchModeEnum.SEARCH:
+            pattern = bindparam("pattern", type_=String)
+            key = func.greatest(
+                func.similarity(self.model.username, query),
+                func.similarity(self.model.email, query),
+                func.similarity(self.model.first_name + " " + self.model.last_name, query),
+                type_=Float,
+            ).label("key")
+            condition = or_(
+                self.model.username.ilike(pattern),
+                self.model.email.ilike(pattern),
+                self.model.first_name.ilike(pattern),
+                self.model.last_name.ilike(pattern),
+            )
+            order_by = (key.desc(), self.model.id)
+        else:
+            username = self.model.username.collate("C")
+            email = self.model.email.collate("C")
+            key = username.label("key")
+            if mode == UserSearchModeEnum.EXACT:
+                condition = or_(username == query, email == query)
+            else:
+                # The range keeps the btree index usable, LIKE rechecks the prefix
+                upper = bindparam("upper", type_=String)
+                pattern = bindparam("pattern", type_=String)
+                condition = or_(*(
+                    and_(column >= query, *((column < upper,) if has_upper else ()), column.like(pattern))
+                    for column in (username, email)
+                ))
+            order_by = (username, self.model.id)
+
+        stmt = select(self.model, key).where(condition).order_by(*order_by).limit(bindparam("limit", type_=Integer))
+        if has_cursor:
+            after_key = bindparam("after_key", type_=key.type)
+            after_id = bindparam("after_id", type_=self.model.id.type)
+            if mode == UserSearchModeEnum.SEARCH:
+                stmt = stmt.where(or_(key < after_key, and_(key == after_key, self.model.id > after_id)))
+            else:
+                stmt = stmt.where(tuple_(self.model.username.collate("C"), self.model.id) > tuple_(after_key, after_id))
+        return stmt
+
     async def create(self, db: AsyncSession, *, obj_in: UserCreateInDB) -> User:
         db_obj = User(
             username=obj_in.username,
@@ -59,7 +218,21 @@ class CRUDUser(CRUDBase[User, UserCreateInDB, UserUpdate]):
             hashed_password = get_password_hash(update_data["password"])
             del update_data["password"]
             update_data["hashed_password"] = hashed_password
-        return await super().update(db, db_obj=db_obj, obj_in=update_data)
+        db_obj = await super().update(db, db_obj=db_obj, obj_in=update_data)
+        event = UserDeactivated if update_data.get("is_active") is False else UserUpdated
+        await invalidation_bus.publish(event(user_id=db_obj.id))
+        return db_obj
+
+    async def remove(self, db: AsyncSession, *, db_obj: User) -> User:
+        """Soft delete the user, its tiles and the row itself are purged by a background job.
+        """
+        db_obj.deleted_at = datetime.now(timezone.utc)
+        # The pictures are removed once the deletion is committed, never for a rolled back one
+        outbox.add(db, OutboxTopicEnum.USER_PICTURES_DELETE, {"user_id": str(db_obj.id)})
+        job_runner.enqueue(db, JobTypeEnum.PURGE_USER, {"user_id": str(db_obj.id)})
+        await db.commit()
+        await invalidation_bus.publish(UserDeactivated(user_id=db_obj.id))
+        return db_obj
 
     async def authenticate(self, db: AsyncSession, *, password: str, email: str = None, username: str = None) -> Optional[User]:
         if email:
@@ -79,12 +252,14 @@ class CRUDUser(CRUDBase[User, UserCreateInDB, UserUpdate]):
     async def set_picture(db: AsyncSession, *, db_user: User, profile_picture_url: str) -> User:
         db_user.profile_picture_url = profile_picture_url
         await db.commit()
+        await invalidation_bus.publish(UserUpdated(user_id=db_user.id))
         return db_user
 
     @staticmethod
     async def delete_picture(db: AsyncSession, *, db_user: User) -> User:
         db_user.profile_picture_url = None
         await db.commit()
+        await invalidation_bus.publish(UserUpdated(user_id=db_user.id))
         return db_user
 
     # async def add_contact_links(self, db: AsyncSession, *, user: User, contact_links: ContactLink):
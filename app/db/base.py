@@ -3,4 +3,7 @@
 from app.db.base_class import Base
 from app.models.user import User
 from app.models.tile import Tile
+from app.models.outbox_event import OutboxEvent
+from app.models.job import Job
+from app.models.published_profile import PublishedProfile
 # from app.models.icon import Icon
@@ -1,8 +1,17 @@
 from typing import Any
 
-import inflect
 from sqlalchemy.orm import as_declarative, declared_attr
-p = inflect.engine()
+
+
+def pluralize(name: str) -> str:
+    """English plural of a lowercase model name, covering the regular forms.
+    Models with an irregular plural set `__tablename__` themselves.
+    """
+    if name.endswith("y") and name[-2:-1] not in "aeiou":
+        return name[:-1] + "ies"
+    if name.endswith(("s", "x", "z", "ch", "sh")):
+        return name + "es"
+    return name + "s"
 
 
 @as_declarative()
@@ -13,4 +22,4 @@ class Base:
     # Generate __tablename__ automatically
     @declared_attr
     def __tablename__(cls) -> str:
-        return p.plural(cls.__name__.lower())
+        return pluralize(cls.__name__.lower())
@@ -1,12 +1,77 @@
+from functools import lru_cache
+from typing import Union
+
 from app.core.config import settings
-from sqlalchemy import create_engine
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, SessionTransaction, sessionmaker
+
+# Engines are built on first use, importing the app does not load the database drivers
+
+
+@lru_cache()
+def get_engine() -> Engine:
+    return create_engine(url=str(settings.SQLALCHEMY_DATABASE_URI), pool_pre_ping=True)
+
+
+@lru_cache()
+def get_sessionmaker() -> sessionmaker:
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+
+@lru_cache()
+def get_async_engine() -> AsyncEngine:
+    return create_async_engine(
+        url=str(settings.ASYNC_SQLALCHEMY_DATABASE_URI),
+        future=True,
+        echo=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        query_cache_size=settings.SQLALCHEMY_QUERY_CACHE_SIZE,
+        connect_args={"prepared_statement_cache_size": settings.ASYNCPG_PREPARED_STATEMENT_CACHE_SIZE},
+    )
+
+
+@lru_cache()
+def get_async_sessionmaker() -> async_sessionmaker:
+    return async_sessionmaker(get_async_engine(), expire_on_commit=False, class_=AsyncSession)
+
+
+def async_session() -> AsyncSession:
+    return get_async_sessionmaker()()
+
+
+def holds_connection(session: Union[Session, AsyncSession]) -> bool:
+    """Whether the session has a connection checked out, it holds one from its first query
+    until the end of its transaction"""
+    if isinstance(session, AsyncSession):
+        session = session.sync_session
+    return session.info.get("connected", False)
+
+
+@event.listens_for(Session, "after_begin")
+def _connected(session: Session, transaction: SessionTransaction, connection: Connection) -> None:
+    session.info["connected"] = True
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _released(session: Session, transaction: SessionTransaction) -> None:
+    if transaction.parent is None:
+        session.info.pop("connected", None)
+
+
+_LAZY_ATTRIBUTES = {
+    "engine": get_engine,
+    "SessionLocal": get_sessionmaker,
+    "async_engine": get_async_engine,
+    "AsyncSessionLocal": get_async_sessionmaker,
+}
 
-engine = create_engine(url=str(settings.SQLALCHEMY_DATABASE_URI), pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-async_engine = create_async_engine(
-    url=str(settings.ASYNC_SQLALCHEMY_DATABASE_URI), future=True, echo=True
-)
-AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
\ No newline at end of file
+def __getattr__(name: str):
+    # The former module attributes, building the engine when first imported
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
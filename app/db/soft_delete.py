@@ -0,0 +1,26 @@
+"""
+Soft delete of the models with a `deleted_at` column.
+
+Every ORM select of a session excludes their deleted rows, relationship loads included,
+so the CRUD reads never return them. Pass `include_deleted=True` as an execution option
+to read them anyway. Core statements run on a connection are not filtered.
+"""
+from sqlalchemy import Column, DateTime, event
+from sqlalchemy.orm import ORMExecuteState, Session, with_loader_criteria
+
+
+class SoftDeleteMixin:
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _exclude_deleted(state: ORMExecuteState) -> None:
+    if (
+        state.is_select
+        and not state.is_column_load
+        and not state.is_relationship_load
+        and not state.execution_options.get("include_deleted", False)
+    ):
+        state.statement = state.statement.options(
+            with_loader_criteria(SoftDeleteMixin, lambda cls: cls.deleted_at.is_(None), include_aliases=True)
+        )
@@ -0,0 +1,57 @@
+from collections import OrderedDict
+from typing import Callable, Hashable, TypeVar
+
+from sqlalchemy.sql import Executable
+
+from app.core.config import settings
+
+StatementType = TypeVar("StatementType", bound=Executable)
+
+
+class StatementCache:
+    """LRU cache of parameterized SQLAlchemy statements.
+
+    Statements are built once per key (model, statement shape, load spec) and
+    executed with bound parameters afterwards. Reusing the same statement object
+    lets SQLAlchemy memoize its cache key, so the compiled cache and asyncpg's
+    prepared statement cache are hit without rebuilding the construct.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._statements: "OrderedDict[Hashable, Executable]" = OrderedDict()
+
+    def get_or_build(self, key: Hashable, builder: Callable[[], StatementType]) -> StatementType:
+        try:
+            stmt = self._statements[key]
+        except KeyError:
+            self.misses += 1
+            stmt = builder()
+            self._statements[key] = stmt
+            if len(self._statements) > self.maxsize:
+                self._statements.popitem(last=False)
+            return stmt
+
+        self.hits += 1
+        self._statements.move_to_end(key)
+        return stmt
+
+    def clear(self) -> None:
+        self._statements.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._statements),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+statement_cache = StatementCache(maxsize=settings.STATEMENT_CACHE_SIZE)
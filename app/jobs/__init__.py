@@ -0,0 +1,6 @@
+"""
+Jobs run by the background job runner, importing the package registers them
+"""
+from app.core.jobs import job_runner
+
+from . import pictures, profiles, tiles, users
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import uuid
+from typing import List
+
+from sqlalchemy import select
+
+from app.constants import JobTypeEnum
+from app.core.jobs import job_runner
+from app.db.session import async_session
+from app.models import User
+from app.static_files import PATH_STATIC_FILES
+from app.utils.func import UserPictureManager
+
+USER_PICTURES_FOLDER = os.path.join(PATH_STATIC_FILES, "users", "pictures")
+BATCH_SIZE = 500
+
+
+def _list_picture_folders() -> List[str]:
+    try:
+        return [entry.name for entry in os.scandir(USER_PICTURES_FOLDER) if entry.is_dir()]
+    except FileNotFoundError:
+        return []
+
+
+@job_runner.job(JobTypeEnum.CLEANUP_ORPHANED_PICTURES, concurrency=1)
+async def cleanup_orphaned_pictures(payload: dict) -> dict:
+    """Remove the picture folders of users that no longer exist"""
+    user_ids = []
+    for name in await asyncio.to_thread(_list_picture_folders):
+        try:
+            user_ids.append(uuid.UUID(name))
+        except ValueError:
+            # Not a folder of this job
+            continue
+
+    removed = 0
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        batch = user_ids[start:start + BATCH_SIZE]
+        async with async_session() as db:
+            existing = set(await db.scalars(select(User.id).where(User.id.in_(batch))))
+        for user_id in batch:
+            if user_id not in existing:
+                await UserPictureManager.remove_user_pictures(user_id=str(user_id))
+                removed += 1
+    return {"scanned": len(user_ids), "removed": removed}
@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+from sqlalchemy import Text, cast, select
+
+from app import crud
+from app.constants import JobTypeEnum
+from app.core.config import settings
+from app.core.jobs import job_runner
+from app.db.session import async_session
+from app.models import PublishedProfile, User
+from app.utils.profile_snapshots import profile_snapshots
+
+BATCH_SIZE = 500
+
+
+@job_runner.job(JobTypeEnum.CHECK_PROFILE_DRIFT, concurrency=1)
+async def check_profile_drift(payload: dict) -> dict:
+    """Compare the published profile of every user with its rows and repair the ones that drifted.
+    Also publishes the profiles of the users created before the documents existed.
+    """
+    totals = {"checked": 0, "missing": 0, "drifted": 0, "removed": 0}
+    after = None
+    while True:
+        async with async_session() as db:
+            stmt = select(User.id).order_by(User.id).limit(BATCH_SIZE)
+            if after is not None:
+                stmt = stmt.where(User.id > after)
+            user_ids = list(await db.scalars(stmt))
+            if not user_ids:
+                break
+            result = await db.run_sync(crud.published_profile.repair, user_ids)
+            await db.commit()
+        for key, count in result.items():
+            totals[key] += count
+        after = user_ids[-1]
+        await asyncio.sleep(0)
+
+    async with async_session() as db:
+        totals["removed"] = await db.run_sync(crud.published_profile.remove_deleted)
+        await db.commit()
+    return totals
+
+
+@job_runner.job(JobTypeEnum.PUBLISH_PROFILE_SNAPSHOTS, concurrency=1)
+async def publish_profile_snapshots(payload: dict) -> dict:
+    """Write the snapshots of every published profile, e.g. after a change of the HTML template,
+    and remove the snapshots of the profiles no longer published.
+    """
+    started = time.time()
+    semaphore = asyncio.Semaphore(settings.PROFILE_SNAPSHOTS_CONCURRENCY)
+    usernames = []
+
+    async def write(username: str, document: str) -> None:
+        async with semaphore:
+            await asyncio.to_thread(profile_snapshots.write, username, document)
+
+    after = None
+    while True:
+        async with async_session() as db:
+            stmt = (
+                select(PublishedProfile.user_id, PublishedProfile.username, cast(PublishedProfile.document, Text))
+                .order_by(PublishedProfile.user_id)
+                .limit(BATCH_SIZE)
+            )
+            if after is not None:
+                stmt = stmt.where(PublishedProfile.user_id > after)
+            rows = (await db.execute(stmt)).all()
+        if not rows:
+            break
+        await asyncio.gather(*(write(username, document) for _, username, document in rows))
+        usernames.extend(username for _, username, _ in rows)
+        after = rows[-1][0]
+
+    removed = await asyncio.to_thread(profile_snapshots.remove_except, usernames, older_than=started)
+    return {"published": len(usernames), "removed": removed}
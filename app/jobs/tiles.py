@@ -0,0 +1,130 @@
+import asyncio
+import secrets
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import bindparam, delete, func, or_, select, update
+
+from app import crud
+from app.constants import JobTypeEnum
+from app.core.config import settings
+from app.core.invalidation import TilesChanged, invalidation_bus
+from app.core.jobs import job_runner
+from app.core.link_checker import link_checker
+from app.db.session import async_session, get_async_engine
+from app.models import Tile
+from app.schemas import TileCreate
+
+
+@job_runner.job(JobTypeEnum.IMPORT_TILES, concurrency=2)
+async def import_tiles(payload: dict) -> dict:
+    """Create the tiles of a user in one transaction, payload: `{"user_id": ..., "tiles": [TileCreate, ...]}`"""
+    user_id = uuid.UUID(payload["user_id"])
+    tiles = [TileCreate.model_validate(tile) for tile in payload["tiles"]]
+    async with async_session() as db:
+        if await crud.user.get(db, id=user_id) is None:
+            raise LookupError(f"User {user_id} does not exist")
+        db_tiles = [
+            Tile(**tile.model_dump(), user_id=user_id, short_id=secrets.token_urlsafe(9))
+            for tile in tiles
+        ]
+        await crud.tile.create_multi(db, objs_in=db_tiles)
+    return {"imported": len(db_tiles)}
+
+
+@job_runner.job(JobTypeEnum.PURGE_TILE_TOMBSTONES, concurrency=1)
+async def purge_tile_tombstones(payload: dict) -> dict:
+    """Delete the tiles deleted for longer than TILE_TOMBSTONE_RETENTION_DAYS, in bounded batches"""
+    horizon = datetime.now(timezone.utc) - timedelta(days=settings.TILE_TOMBSTONE_RETENTION_DAYS)
+    batch_size = settings.USER_PURGE_BATCH_SIZE
+    purged = 0
+    while True:
+        batch = select(Tile.id).where(Tile.deleted_at < horizon).limit(batch_size).scalar_subquery()
+        async with async_session() as db:
+            result = await db.execute(
+                delete(Tile).where(Tile.id.in_(batch)), execution_options={"synchronize_session": False}
+            )
+            await db.commit()
+        purged += result.rowcount
+        if result.rowcount < batch_size:
+            return {"purged": purged}
+        await asyncio.sleep(0)
+
+
+@job_runner.job(JobTypeEnum.CLASSIFY_TILES, concurrency=1)
+async def classify_tiles(payload: dict) -> dict:
+    """Normalize the urls and detect the platform of the existing tiles, in keyset batches of TILE_CLASSIFY_BATCH_SIZE"""
+    batch_size = settings.TILE_CLASSIFY_BATCH_SIZE
+    after = None
+    checked = changed = 0
+    while True:
+        stmt = select(Tile).order_by(Tile.id).limit(batch_size)
+        if after is not None:
+            stmt = stmt.where(Tile.id > after)
+        async with async_session() as db:
+            db_tiles = list(await db.scalars(stmt))
+            user_ids = set()
+            for db_tile in db_tiles:
+                # Assigning the urls normalizes them again, unchanged tiles are not updated
+                db_tile.url = db_tile.url
+                db_tile.icon_url = db_tile.icon_url
+                if db.is_modified(db_tile):
+                    user_ids.add(db_tile.user_id)
+                    changed += 1
+            await db.commit()
+        for user_id in user_ids:
+            await invalidation_bus.publish(TilesChanged(user_id=user_id))
+        checked += len(db_tiles)
+        if len(db_tiles) < batch_size:
+            return {"checked": checked, "changed": changed}
+        after = db_tiles[-1].id
+        await asyncio.sleep(0)
+
+
+@job_runner.job(JobTypeEnum.CHECK_TILE_LINKS, concurrency=1)
+async def check_tile_links(payload: dict) -> dict:
+    """Check the web urls of the tiles not checked for LINK_CHECK_INTERVAL_HOURS, in keyset batches"""
+    stale_before = datetime.now(timezone.utc) - timedelta(hours=settings.LINK_CHECK_INTERVAL_HOURS)
+    batch_size = settings.LINK_CHECK_BATCH_SIZE
+    tiles = Tile.__table__
+    # Recording a check is not a change of the tile, its `updated_at` is kept for the delta sync
+    record = (
+        update(tiles)
+        .where(tiles.c.id == bindparam("tile_id"))
+        .values(
+            link_status=bindparam("status"),
+            link_status_code=bindparam("status_code"),
+            link_checked_at=func.now(),
+            updated_at=tiles.c.updated_at,
+        )
+    )
+    after = None
+    statuses = Counter()
+    while True:
+        stmt = (
+            select(Tile.id, Tile.url)
+            .where(
+                or_(Tile.url.startswith("http://"), Tile.url.startswith("https://")),
+                or_(Tile.link_checked_at.is_(None), Tile.link_checked_at < stale_before),
+            )
+            .order_by(Tile.id)
+            .limit(batch_size)
+        )
+        if after is not None:
+            stmt = stmt.where(Tile.id > after)
+        async with async_session() as db:
+            rows = (await db.execute(stmt)).all()
+        if not rows:
+            break
+        checks = await link_checker.check_many(row.url for row in rows)
+        async with get_async_engine().begin() as conn:
+            await conn.execute(record, [
+                {"tile_id": row.id, "status": checks[row.url][0], "status_code": checks[row.url][1]}
+                for row in rows
+            ])
+        statuses.update(checks[row.url][0].value for row in rows)
+        if len(rows) < batch_size:
+            break
+        after = rows[-1].id
+    return {"checked": sum(statuses.values()), **statuses}
@@ -0,0 +1,40 @@
+import asyncio
+import uuid
+
+from sqlalchemy import delete, select
+
+from app.constants import JobTypeEnum
+from app.core.config import settings
+from app.core.jobs import job_runner
+from app.db.session import async_session
+from app.models import Tile, User
+
+
+@job_runner.job(JobTypeEnum.PURGE_USER, concurrency=2)
+async def purge_user(payload: dict) -> dict:
+    """Delete the tiles of a soft deleted user in bounded batches, then the user itself.
+    Each batch is its own short transaction, so the purge of a large account never holds many locks.
+    """
+    user_id = uuid.UUID(payload["user_id"])
+    batch_size = settings.USER_PURGE_BATCH_SIZE
+    tiles = 0
+    while True:
+        batch = select(Tile.id).where(Tile.user_id == user_id).limit(batch_size).scalar_subquery()
+        async with async_session() as db:
+            result = await db.execute(
+                delete(Tile).where(Tile.id.in_(batch)), execution_options={"synchronize_session": False}
+            )
+            await db.commit()
+        tiles += result.rowcount
+        if result.rowcount < batch_size:
+            break
+        # Let the requests of this worker through between the batches
+        await asyncio.sleep(0)
+
+    async with async_session() as db:
+        result = await db.execute(
+            delete(User).where(User.id == user_id, User.deleted_at.is_not(None)),
+            execution_options={"synchronize_session": False}
+        )
+        await db.commit()
+    return {"tiles": tiles, "users": result.rowcount}
@@ -1,11 +1,25 @@
-from fastapi import FastAPI
+import asyncio
+
+from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.staticfiles import StaticFiles
 
 from app.api.api_v1.api import router
 from app.core.config import settings
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.invalidation import invalidation_bus
+from app.core.link_checker import link_checker
+from app.core.load_shedding import LoadSheddingMiddleware, load_monitor
+from app.core.loop_diagnostics import LoopDiagnosticsMiddleware, loop_diagnostics
+from app.core.outbox import outbox_dispatcher
+from app.core.profile_feed import profile_feed
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.readiness import readiness
 from app.core.ssh_tunnel import ssh_tunnel_manager
+from app.core.warmup import warmup
+from app.jobs import job_runner
 from app.static_files import PATH_STATIC_FILES
+from app.utils.qr_codes import qr_code_renderer
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -16,6 +30,19 @@ origins = [
     "https://192.168.1.4:8000",
 ]
 
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
+# Outside the rate limiting, replayed retries do not consume the rate limits
+if settings.IDEMPOTENCY_ENABLED:
+    app.add_middleware(IdempotencyMiddleware)
+
+if settings.LOAD_SHEDDING_ENABLED:
+    app.add_middleware(LoadSheddingMiddleware)
+
+if settings.LOOP_DIAGNOSTICS_ENABLED:
+    app.add_middleware(LoopDiagnosticsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -34,13 +61,43 @@ async def root():
     return {"message": "ok"}
 
 
+@app.get("/ready")
+async def ready(response: Response):
+    is_ready = await readiness.check()
+    checks = {name: result["ok"] for name, result in readiness.results.items()}
+    if not is_ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"message": "not ready", "checks": checks}
+    return {"message": "ok", "checks": checks}
+
+
 @app.on_event("startup")
 async def startup_event():
     if settings.ENVIRONMENT == "prod":
-        ssh_tunnel_manager.start_tunnel()
+        # Connecting and probing block, the loop keeps running meanwhile
+        await asyncio.to_thread(ssh_tunnel_manager.start_tunnel)
+    if settings.LOAD_SHEDDING_ENABLED:
+        load_monitor.start()
+    if settings.LOOP_DIAGNOSTICS_ENABLED:
+        loop_diagnostics.start()
+    await invalidation_bus.start()
+    outbox_dispatcher.start()
+    if settings.JOBS_ENABLED:
+        job_runner.start()
+    await warmup(app)
+    readiness.ready = True
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    readiness.ready = False
+    profile_feed.close()
+    await load_monitor.stop()
+    await loop_diagnostics.stop()
+    await invalidation_bus.stop()
+    await outbox_dispatcher.stop()
+    await job_runner.stop()
+    qr_code_renderer.shutdown()
+    await link_checker.aclose()
     if settings.ENVIRONMENT == "prod":
-        ssh_tunnel_manager.stop_tunnel()
\ No newline at end of file
+        await asyncio.to_thread(ssh_tunnel_manager.stop_tunnel)
\ No newline at end of file
@@ -1,3 +1,6 @@
 from .user import User
 from .tile import Tile
-# from .icon import Icon
\ No newline at end of file
+# from .icon import Icon
+from .outbox_event import OutboxEvent
+from .job import Job
+from .published_profile import PublishedProfile
\ No newline at end of file
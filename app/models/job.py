@@ -0,0 +1,34 @@
+from sqlalchemy import BigInteger, Column, DateTime, Enum, Index, Integer, String, func, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.constants import JobStatusEnum
+from app.db.base_class import Base
+
+
+class Job(Base):
+    """
+    Deferred work persisted until a job runner of any worker has completed it
+    """
+
+    __table_args__ = (
+        Index(
+            "ix_jobs_type_run_at",
+            "type",
+            "run_at",
+            postgresql_where=text("status IN ('QUEUED', 'RUNNING')"),
+        ),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    type = Column(String(64), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    status = Column(Enum(JobStatusEnum), nullable=False, default=JobStatusEnum.QUEUED)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    result = Column(JSONB, nullable=True)
+    last_error = Column(String(1024), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    run_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # A running job whose lease expired is claimed again, its runner is gone
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
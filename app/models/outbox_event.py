@@ -0,0 +1,27 @@
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String, func, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.db.base_class import Base
+
+
+class OutboxEvent(Base):
+    """
+    Side effect of a change, written in the same transaction as the change
+    and processed by the outbox dispatcher after the commit
+    """
+
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        Index("ix_outbox_events_available_at", "available_at", postgresql_where=text("failed_at IS NULL")),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    topic = Column(String(64), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    last_error = Column(String(1024), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # Claimed rows are leased by pushing it forward, failed rows are retried from it
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    failed_at = Column(DateTime(timezone=True), nullable=True)
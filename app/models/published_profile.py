@@ -0,0 +1,18 @@
+from sqlalchemy import Column, DateTime, ForeignKey, String, UUID, func
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.db.base_class import Base
+
+
+class PublishedProfile(Base):
+    """
+    Public profile of a user rendered to JSON, rebuilt in the transaction of every change
+    of the user or its tiles
+    """
+
+    __tablename__ = "published_profiles"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    username = Column(String(32), unique=True, index=True, nullable=False)
+    document = Column(JSONB, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
@@ -1,22 +1,56 @@
-from app.constants import TilePlatformEnum
+from app.constants import TileLinkStatusEnum, TilePlatformEnum
 from app.constants.tile_type import TileTypeEnum
 from app.db.base_class import Base
-from sqlalchemy import Column, String, ForeignKey, Enum, Integer, Boolean
+from app.db.soft_delete import SoftDeleteMixin
+from app.utils.tile_urls import detect_platform, normalize_url
+from sqlalchemy import Column, String, ForeignKey, Enum, Integer, SmallInteger, Boolean, DateTime, Index, event, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
+from typing import Optional
 
 
-class Tile(Base):
+class Tile(SoftDeleteMixin, Base):
+    # Deleted tiles are kept as tombstones for the delta sync of the clients until purged
+    __table_args__ = (
+        Index("ix_tiles_user_id_updated_at", "user_id", "updated_at"),
+    )
+
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
     type = Column(Enum(TileTypeEnum), nullable=False)
     title = Column(String(32), nullable=False)
     url = Column(String(2048), nullable=True)
+    # Detected from the url, see `app.utils.tile_urls`
+    platform = Column(Enum(TilePlatformEnum), nullable=True, index=True)
+    # Last health check of the url, see `app.core.link_checker`
+    link_status = Column(Enum(TileLinkStatusEnum), nullable=True)
+    link_status_code = Column(SmallInteger, nullable=True)
+    link_checked_at = Column(DateTime(timezone=True), nullable=True)
     active = Column(Boolean, default=True, nullable=False)
     position = Column(Integer, nullable=False)
     icon_url = Column(String(2048), nullable=True)
     short_id = Column(String(length=12), unique=True, nullable=False)
-    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), index=True, nullable=False)
+    version = Column(Integer, nullable=False, server_default="1")
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
 
     user = relationship("User", back_populates="tiles")
 
+    __mapper_args__ = {"version_id_col": version}
+
+
+# Every tile created or updated, wherever it is from, stores normalized urls
+@event.listens_for(Tile.url, "set", retval=True)
+def _classify_url(target: Tile, value: Optional[str], oldvalue, initiator) -> Optional[str]:
+    if value is not None:
+        value = normalize_url(value)
+    target.platform = detect_platform(value) if value is not None else None
+    if value != oldvalue:
+        # The health check was about the previous url
+        target.link_status = target.link_status_code = target.link_checked_at = None
+    return value
+
+
+@event.listens_for(Tile.icon_url, "set", retval=True)
+def _normalize_icon_url(target: Tile, value: Optional[str], oldvalue, initiator) -> Optional[str]:
+    return normalize_url(value) if value is not None else None
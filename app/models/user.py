@@ -1,18 +1,33 @@
 from datetime import datetime
 from uuid import uuid4
 
-from sqlalchemy import Column, Enum, UUID, String, Boolean, DateTime
+from sqlalchemy import Column, Enum, UUID, String, Boolean, DateTime, Index, func, text
 from sqlalchemy.orm import relationship
 
 from app.constants import UserRoleEnum
 from app.db.base_class import Base
+from app.db.soft_delete import SoftDeleteMixin
 
 
-class User(Base):
+class User(SoftDeleteMixin, Base):
     """
     Database model for an application user
     """
 
+    __table_args__ = tuple(
+        Index(
+            f"ix_users_{column}_trgm",
+            column,
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"},
+        )
+        for column in ("username", "email", "first_name", "last_name")
+    ) + tuple(
+        # The prefix search compares bytes, whatever the collation of the database
+        Index(f"ix_users_{column}_c", text(f'{column} COLLATE "C"'))
+        for column in ("username", "email")
+    )
+
     id = Column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid4)
     first_name = Column(String(32), nullable=False)
     last_name = Column(String(32), nullable=False)
@@ -26,6 +41,10 @@ class User(Base):
     description = Column(String(256), nullable=True)
 
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Set by the database clock, the one of the sync cursors of `GET /profiles/changes`
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    tiles = relationship("Tile", back_populates="user")
 
-    tiles = relationship("Tile", back_populates="user")
\ No newline at end of file
+    # `updated_at` is returned by the INSERT and UPDATE, it is never loaded lazily
+    __mapper_args__ = {"eager_defaults": True}
\ No newline at end of file
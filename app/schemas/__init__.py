@@ -1,5 +1,7 @@
 from .user import User, UserCreate, UserUpdate, UserInDB, UserCreateInDB, UserBase, UserSimple, ChangePassword
-from .tile import Tile, TileCreate, TileUpdate
-from .profile import ResponseProfile
+from .tile import Tile, TileCreate, TileUpdate, TileChange
+from .profile import ResponseProfile, ProfileBatchRequest, ResponseProfileBatch, ResponseProfileChanges
 from .token import Token, TokenData
-# from .icon import Icon, IconCreate, IconUpdate, IconInDBBase
\ No newline at end of file
+# from .icon import Icon, IconCreate, IconUpdate, IconInDBBase
+from .job import Job, JobCreate
+from .qr_code import QRCodeBatchRequest
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import List, Type, TypeVar, Generic
+from typing import List, Optional, Type, TypeVar, Generic
 
 from pydantic import BaseModel
 
@@ -7,5 +7,6 @@ T = TypeVar("T", bound=BaseModel)
 
 class ResponseWithPagination(BaseModel, Generic[T]):
     items: List[T]
-    total_count: int
-    total_pages: int
+    total_count: Optional[int] = None
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Any, Optional
+
+from pydantic import BaseModel, Field
+
+from app.constants import JobStatusEnum, JobTypeEnum
+
+
+class JobCreate(BaseModel):
+    type: JobTypeEnum
+    payload: dict = Field(
+        default_factory=dict
+    )
+    run_at: Optional[datetime] = None
+
+
+class Job(BaseModel):
+    id: int
+    type: JobTypeEnum
+    status: JobStatusEnum
+    attempts: int
+    result: Optional[Any] = None
+    last_error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    run_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
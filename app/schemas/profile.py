@@ -1,8 +1,10 @@
 from typing import Optional
 
-from pydantic import BaseModel, EmailStr, UUID4
+from pydantic import BaseModel, EmailStr, Field, UUID4, model_validator
 
+from app.core.config import settings
 from app.schemas import Tile
+from app.schemas.tile import TileChange
 
 
 class ResponseProfile(BaseModel):
@@ -17,3 +19,45 @@ class ResponseProfile(BaseModel):
 
     class Config:
         arbitrary_types_allowed = True
+
+
+class ProfileBatchRequest(BaseModel):
+    usernames: list[str] = Field(
+        default_factory=list
+    )
+    ids: list[UUID4] = Field(
+        default_factory=list
+    )
+
+    @model_validator(mode="after")
+    def validate_size(self):
+        if len(self.usernames) + len(self.ids) > settings.PROFILE_BATCH_MAX_SIZE:
+            raise ValueError(f"At most {settings.PROFILE_BATCH_MAX_SIZE} usernames and ids can be requested at once")
+        return self
+
+
+class ResponseProfileBatch(BaseModel):
+    """Profiles by requested username and id, `null` for the ones not found"""
+
+    usernames: dict[str, Optional[ResponseProfile]]
+    ids: dict[UUID4, Optional[ResponseProfile]]
+
+
+class ProfileUserChange(BaseModel):
+    id: UUID4
+    username: str
+    first_name: str
+    last_name: str
+    email: EmailStr
+    phone_number: Optional[str]
+    profile_picture_url: Optional[str]
+
+
+class ResponseProfileChanges(BaseModel):
+    """Changes of the profile since the `since` of the previous sync, all of it when `reset`"""
+
+    user: Optional[ProfileUserChange]
+    tiles: list[TileChange]
+    deleted_tiles: list[UUID4]
+    next_since: str
+    reset: bool
@@ -0,0 +1,23 @@
+from pydantic import BaseModel, Field, UUID4, model_validator
+
+from app.constants import QRCodeFormatEnum
+from app.core.config import settings
+
+
+class QRCodeBatchRequest(BaseModel):
+    usernames: list[str] = Field(
+        default_factory=list
+    )
+    tile_ids: list[UUID4] = Field(
+        default_factory=list
+    )
+    format: QRCodeFormatEnum = QRCodeFormatEnum.PNG
+    size: int = settings.QR_CODE_DEFAULT_SIZE
+
+    @model_validator(mode="after")
+    def validate_batch(self):
+        if self.size not in settings.QR_CODE_SIZES:
+            raise ValueError(f"The size must be one of {', '.join(map(str, settings.QR_CODE_SIZES))}")
+        if len(self.usernames) + len(self.tile_ids) > settings.QR_CODE_BATCH_MAX_SIZE:
+            raise ValueError(f"At most {settings.QR_CODE_BATCH_MAX_SIZE} QR codes can be requested at once")
+        return self
@@ -0,0 +1,188 @@
+"""
+Serialization fast path of the hot responses.
+
+Rows loaded by the CRUD layer are trusted, validating them again through the response
+models only to dump them costs more than the dump itself. `OrmSerializer` derives a
+serializer-only schema from a response model, a TypedDict with the same fields, and
+serializes the column values read from the ORM instances with a TypeAdapter built once.
+The JSON is the same the response model produces.
+
+Sparse fieldsets (`fields=`) are served by pruned serializers, built once per field set.
+Field sets are subsets of the model fields, so there are only so many of them.
+"""
+import operator
+import uuid
+from typing import Any, Dict, List, Optional, Type, Union, get_args, get_origin
+
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
+
+from app.schemas.profile import ProfileUserChange, ResponseProfile
+from app.schemas.tile import Tile, TileChange
+from app.schemas.user import UserSimple
+
+
+def _getter(getter, keys: List[str]):
+    # `itemgetter` and `attrgetter` return a bare value for a single key
+    get = getter(*keys)
+    return get if len(keys) > 1 else lambda obj: (get(obj),)
+
+
+class OrmSerializer:
+    """Serializer of the fields of a response model, or of a subset of them with `fields`."""
+
+    def __init__(self, model: Type[BaseModel], *, by_alias: bool = False, fields: Optional[tuple[str, ...]] = None):
+        self.model = model
+        self.by_alias = by_alias
+        model_fields = {
+            name: field for name, field in model.model_fields.items() if fields is None or name in fields
+        }
+        self.attributes = list(model_fields)
+        self.keys = [
+            field.alias if by_alias and field.alias else name for name, field in model_fields.items()
+        ]
+        self.nested: Dict[int, tuple[OrmSerializer, bool]] = {}
+        annotations = {}
+        for index, (name, field) in enumerate(model_fields.items()):
+            annotations[self.keys[index]] = self._annotation(index, field.annotation, by_alias)
+        self.schema = TypedDict(f"{model.__name__}Serialized", annotations)
+        self.adapter = TypeAdapter(self.schema)
+        self._from_state = _getter(operator.itemgetter, self.attributes)
+        self._from_attributes = _getter(operator.attrgetter, self.attributes)
+        self._names = {
+            key: name for name, field in model.model_fields.items() for key in (name, field.alias) if key
+        }
+        self._pruned: Dict[tuple[str, ...], OrmSerializer] = {}
+
+    def parse_fields(self, value: str) -> tuple[str, ...]:
+        """The field names of a `fields=` parameter, names or aliases separated by commas, in model order.
+
+        :raises ValueError: For unknown fields
+        """
+        requested = {field.strip() for field in value.split(",") if field.strip()}
+        unknown = requested - self._names.keys()
+        if unknown or not requested:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}" if unknown else "No fields")
+        names = {self._names[field] for field in requested}
+        return tuple(name for name in self.model.model_fields if name in names)
+
+    def only(self, fields: tuple[str, ...]) -> "OrmSerializer":
+        """Serializer of the given fields, built once per field set"""
+        pruned = self._pruned.get(fields)
+        if pruned is None:
+            pruned = self._pruned[fields] = OrmSerializer(self.model, by_alias=self.by_alias, fields=fields)
+        return pruned
+
+    def _annotation(self, index: int, annotation: Any, by_alias: bool) -> Any:
+        """Replace the nested response models of a field by their serialized schema."""
+        origin, args = get_origin(annotation), get_args(annotation)
+        many = origin is list
+        if many:
+            inner = args[0]
+        elif origin is Union:
+            inner = next(arg for arg in args if arg is not type(None))
+        else:
+            inner = annotation
+        if not (isinstance(inner, type) and issubclass(inner, BaseModel)):
+            return annotation
+        nested = OrmSerializer(inner, by_alias=by_alias)
+        self.nested[index] = (nested, many)
+        return list[nested.schema] if many else Optional[nested.schema]
+
+    def to_dict(self, obj: Any) -> dict:
+        try:
+            # Loaded columns live in the instance dict, reading it skips the descriptors
+            values = list(self._from_state(obj.__dict__))
+        except KeyError:
+            # Expired or deferred columns are loaded by the descriptors
+            values = list(self._from_attributes(obj))
+        for index, (nested, many) in self.nested.items():
+            value = values[index]
+            if many:
+                values[index] = [nested.to_dict(item) for item in value]
+            elif value is not None:
+                values[index] = nested.to_dict(value)
+        return dict(zip(self.keys, values))
+
+    def dump_json(self, obj: Any) -> bytes:
+        return self.adapter.dump_json(self.to_dict(obj))
+
+
+class PageSerializer:
+    """Serializer of `ResponseWithPagination` pages of ORM instances."""
+
+    def __init__(self, items: OrmSerializer):
+        self.items = items
+        self._pruned: Dict[tuple[str, ...], PageSerializer] = {}
+        self.adapter = TypeAdapter(
+            TypedDict(
+                f"{items.model.__name__}PageSerialized",
+                {
+                    "items": list[items.schema],
+                    "total_count": Optional[int],
+                    "total_pages": Optional[int],
+                    "next_cursor": Optional[str],
+                },
+            )
+        )
+
+    def only(self, fields: tuple[str, ...]) -> "PageSerializer":
+        """Serializer of pages of the given item fields, built once per field set"""
+        pruned = self._pruned.get(fields)
+        if pruned is None:
+            pruned = self._pruned[fields] = PageSerializer(self.items.only(fields))
+        return pruned
+
+    def dump_json(
+        self,
+        items: List[Any],
+        *,
+        total_count: Optional[int] = None,
+        total_pages: Optional[int] = None,
+        next_cursor: Optional[str] = None
+    ) -> bytes:
+        return self.adapter.dump_json({
+            "items": [self.items.to_dict(item) for item in items],
+            "total_count": total_count,
+            "total_pages": total_pages,
+            "next_cursor": next_cursor,
+        })
+
+
+tile_serializer = OrmSerializer(Tile)
+profile_serializer = OrmSerializer(ResponseProfile)
+# FastAPI dumps response models by alias
+user_simple_serializer = OrmSerializer(UserSimple, by_alias=True)
+user_simple_page_serializer = PageSerializer(user_simple_serializer)
+
+
+class ChangesSerializer:
+    """Serializer of `ResponseProfileChanges` from the changed ORM instances."""
+
+    def __init__(self):
+        self.user = OrmSerializer(ProfileUserChange)
+        self.tile = OrmSerializer(TileChange)
+        self.adapter = TypeAdapter(
+            TypedDict(
+                "ResponseProfileChangesSerialized",
+                {
+                    "user": Optional[self.user.schema],
+                    "tiles": list[self.tile.schema],
+                    "deleted_tiles": list[uuid.UUID],
+                    "next_since": str,
+                    "reset": bool,
+                },
+            )
+        )
+
+    def dump_json(self, user: Optional[Any], tiles: List[Any], *, next_since: str, reset: bool) -> bytes:
+        return self.adapter.dump_json({
+            "user": self.user.to_dict(user) if user is not None else None,
+            "tiles": [self.tile.to_dict(tile) for tile in tiles if tile.deleted_at is None],
+            "deleted_tiles": [tile.id for tile in tiles if tile.deleted_at is not None],
+            "next_since": next_since,
+            "reset": reset,
+        })
+
+
+changes_serializer = ChangesSerializer()
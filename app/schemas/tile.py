@@ -20,7 +20,7 @@ class TileBase(BaseModel):
         max_length=2048,
     )
     active: Optional[bool] = True
-    position: conint = Field(
+    position: int = Field(
         ...,
         ge=0,
         lt=100
@@ -54,3 +54,8 @@ class Tile(TileInDBBase):
 
 class TileInDB(TileInDBBase):
     pass
+
+
+class TileChange(TileInDBBase):
+    version: int
+    updated_at: datetime
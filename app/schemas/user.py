@@ -1,8 +1,8 @@
-import re
 from datetime import datetime
 from typing import Optional
 
 from pydantic import BaseModel, Field, EmailStr, UUID4, field_validator
+from pydantic.alias_generators import to_camel
 # import typing
 #
 # if typing.TYPE_CHECKING:
@@ -44,7 +44,7 @@ class UserBase(BaseModel):
 
     class Config:
         populate_by_name = True
-        alias_generator = lambda s: re.sub(r'_([a-z])', lambda match: match.group(1).upper(), s)
+        alias_generator = to_camel
 
 
 class UserCreate(UserBase):
@@ -0,0 +1,245 @@
+"""
+Production entry point running the API in several uvicorn workers.
+
+    python -m app.server --host 0.0.0.0 --port 9000 --workers 4 --pid-file server.pid
+
+Signals handled by the master process:
+    SIGHUP           rolling restart: each worker is replaced by a new one running the
+                     current code, the old one is drained only after the new one is ready
+    SIGTERM, SIGINT  stop accepting connections, drain in-flight requests and exit
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from dataclasses import dataclass
+from importlib.util import find_spec
+from multiprocessing.synchronize import Event
+from typing import List, Optional
+
+import uvicorn
+from uvicorn.importer import import_from_string
+
+logger = logging.getLogger("app.server")
+
+APP = "app.main:app"
+
+multiprocessing.allow_connection_pickling()
+spawn = multiprocessing.get_context("spawn")
+
+
+class _WorkerServer(uvicorn.Server):
+    def __init__(self, config: uvicorn.Config, ready: Event):
+        super().__init__(config)
+        self.ready = ready
+
+    async def startup(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        # The lifespan startup has run and the sockets are served from here on
+        await super().startup(sockets=sockets)
+        if not self.should_exit:
+            self.ready.set()
+
+    async def shutdown(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        from app.core.profile_feed import profile_feed
+        from app.core.readiness import readiness
+
+        # Probes on the kept-alive connections get 503 while they drain
+        readiness.ready = False
+        # Live profile streams never end on their own, they would hold the drain until it times out
+        profile_feed.close()
+        await super().shutdown(sockets=sockets)
+
+
+def _run_worker(config: uvicorn.Config, sockets: List[socket.socket], ready: Event) -> None:
+    # Reloads are orchestrated by the master, a SIGHUP sent to the whole process group must not kill workers
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    config.configure_logging()
+    _WorkerServer(config, ready).run(sockets=sockets)
+
+
+@dataclass
+class _Worker:
+    process: multiprocessing.Process
+    ready: Event
+
+
+def pool_size_per_worker(
+    workers: int, max_connections: int, reserved_connections: int, listener_connections: int = 0
+) -> tuple[int, int]:
+    """Split the connection budget of Postgres between the workers.
+
+    One extra worker is accounted for, it exists while a rolling restart replaces a worker.
+    Every worker also holds `listener_connections` outside of its pool, e.g. the LISTEN
+    connection of the invalidation bus.
+    :return: `pool_size` and `max_overflow` of every worker
+    """
+    per_worker = max(2, (max_connections - reserved_connections) // (workers + 1) - listener_connections)
+    pool_size = max(1, per_worker * 2 // 3)
+    return pool_size, per_worker - pool_size
+
+
+class Supervisor:
+    def __init__(
+        self,
+        config: uvicorn.Config,
+        *,
+        workers: int,
+        ready_timeout: float,
+        graceful_timeout: float
+    ):
+        self.config = config
+        self.workers_count = workers
+        self.ready_timeout = ready_timeout
+        self.graceful_timeout = graceful_timeout
+        self.workers: List[_Worker] = []
+        self.sockets: List[socket.socket] = []
+        self._should_exit = False
+        self._reload_requested = False
+
+    def run(self) -> None:
+        self.sockets = [self.config.bind_socket()]
+        signal.signal(signal.SIGHUP, self._on_reload)
+        signal.signal(signal.SIGTERM, self._on_exit)
+        signal.signal(signal.SIGINT, self._on_exit)
+
+        for _ in range(self.workers_count):
+            self.workers.append(self._spawn())
+        for worker in self.workers:
+            self._wait_ready(worker)
+        logger.info("Started %s workers [%s]", len(self.workers), os.getpid())
+
+        while not self._should_exit:
+            if self._reload_requested:
+                self._reload_requested = False
+                self.rolling_restart()
+            self._replace_dead_workers()
+            time.sleep(0.5)
+
+        self.drain()
+        for sock in self.sockets:
+            sock.close()
+
+    def _on_reload(self, signum, frame) -> None:
+        self._reload_requested = True
+
+    def _on_exit(self, signum, frame) -> None:
+        self._should_exit = True
+
+    def _spawn(self) -> _Worker:
+        ready = spawn.Event()
+        process = spawn.Process(
+            target=_run_worker,
+            kwargs={"config": self.config, "sockets": self.sockets, "ready": ready},
+        )
+        process.start()
+        return _Worker(process, ready)
+
+    def _wait_ready(self, worker: _Worker) -> bool:
+        deadline = time.monotonic() + self.ready_timeout
+        while not worker.ready.wait(0.1):
+            if not worker.process.is_alive() or time.monotonic() > deadline:
+                return False
+        return True
+
+    def _stop(self, worker: _Worker) -> None:
+        worker.process.terminate()
+        worker.process.join(self.graceful_timeout)
+        if worker.process.is_alive():
+            logger.warning("Worker [%s] did not drain in %ss, killing it", worker.process.pid, self.graceful_timeout)
+            worker.process.kill()
+            worker.process.join()
+
+    def rolling_restart(self) -> None:
+        logger.info("Rolling restart of %s workers", len(self.workers))
+        for index, old in enumerate(list(self.workers)):
+            new = self._spawn()
+            if not self._wait_ready(new):
+                # Keep serving with the old workers when the new code does not start
+                logger.error("New worker [%s] did not become ready, rolling restart aborted", new.process.pid)
+                self._stop(new)
+                return
+            self.workers[index] = new
+            self._stop(old)
+        logger.info("Rolling restart finished")
+
+    def _replace_dead_workers(self) -> None:
+        for index, worker in enumerate(self.workers):
+            if not worker.process.is_alive():
+                logger.warning("Worker [%s] exited with %s, replacing it", worker.process.pid, worker.process.exitcode)
+                self.workers[index] = self._spawn()
+
+    def drain(self) -> None:
+        logger.info("Draining %s workers", len(self.workers))
+        for worker in self.workers:
+            worker.process.terminate()
+        deadline = time.monotonic() + self.graceful_timeout
+        for worker in self.workers:
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count())
+    parser.add_argument("--ready-timeout", type=float, default=60, help="Seconds a new worker has to become ready")
+    parser.add_argument("--graceful-timeout", type=float, default=30, help="Seconds a worker has to drain")
+    parser.add_argument("--pid-file")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper())
+
+    from app.core.config import settings
+    from app.core.ssh_tunnel import ssh_tunnel_manager
+
+    pool_size, max_overflow = pool_size_per_worker(
+        args.workers,
+        settings.DB_MAX_CONNECTIONS,
+        settings.DB_RESERVED_CONNECTIONS,
+        listener_connections=1 if settings.INVALIDATION_BACKEND == "postgres" else 0,
+    )
+    # Spawned workers inherit the environment and read their pool size from it
+    os.environ["DB_POOL_SIZE"] = str(pool_size)
+    os.environ["DB_MAX_OVERFLOW"] = str(max_overflow)
+
+    config = uvicorn.Config(
+        APP,
+        host=args.host,
+        port=args.port,
+        loop="uvloop" if find_spec("uvloop") else "asyncio",
+        http="httptools" if find_spec("httptools") else "h11",
+        log_level=args.log_level,
+        timeout_graceful_shutdown=int(args.graceful_timeout),
+    )
+    # Import the application once in the master, a broken build fails before any worker is started
+    import_from_string(APP)
+
+    if args.pid_file:
+        with open(args.pid_file, "w") as file:
+            file.write(str(os.getpid()))
+    if settings.ENVIRONMENT == "prod":
+        # The master owns the tunnel, it outlives the workers replaced by rolling restarts
+        ssh_tunnel_manager.start_tunnel()
+    try:
+        Supervisor(
+            config,
+            workers=args.workers,
+            ready_timeout=args.ready_timeout,
+            graceful_timeout=args.graceful_timeout,
+        ).run()
+    finally:
+        if settings.ENVIRONMENT == "prod":
+            ssh_tunnel_manager.stop_tunnel()
+        if args.pid_file and os.path.exists(args.pid_file):
+            os.remove(args.pid_file)
+
+
+if __name__ == "__main__":
+    main()
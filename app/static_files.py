@@ -1,4 +1,4 @@
 import os
 
-PATH_STATIC_FILES = os.path.dirname(os.path.abspath(__name__)) + r"\app\static"
+PATH_STATIC_FILES = os.path.join(os.path.dirname(os.path.abspath(__name__)), "app", "static")
 
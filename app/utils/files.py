@@ -0,0 +1,17 @@
+import os
+import tempfile
+
+
+def write_atomic(path: str, content: bytes) -> None:
+    """Write `content` to `path` through a temporary file, readers see the old or the new file, never a partial one"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(content)
+        # Readable by the web server, mkstemp creates the file private
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -6,7 +6,9 @@ from typing import Optional
 import aiofiles
 from fastapi import HTTPException
 
+from app.constants import OutboxTopicEnum
 from app.core.config import settings
+from app.core.outbox import outbox
 from app.models import User
 from app.static_files import PATH_STATIC_FILES
 
@@ -44,6 +46,17 @@ class UserPictureManager:
 
         return True
 
+    @classmethod
+    async def remove_user_pictures(cls, *, user_id: str) -> None:
+        """Remove the pictures of a user, nothing to do when they are already gone"""
+        user_picture_folder = PATH_STATIC_FILES + f"/users/pictures/{user_id}"
+        await asyncio.to_thread(shutil.rmtree, user_picture_folder, ignore_errors=True)
+
+
+@outbox.handler(OutboxTopicEnum.USER_PICTURES_DELETE)
+async def delete_user_pictures(payload: dict) -> None:
+    await UserPictureManager.remove_user_pictures(user_id=payload["user_id"])
+
 
 def generate_vcf(user: User) -> str:
     return f"""
@@ -0,0 +1,152 @@
+"""
+Static snapshots of the public profiles.
+
+With PROFILE_SNAPSHOTS_ENABLED every published profile is also written to the static store,
+`profiles/{username}.json` and with PROFILE_SNAPSHOTS_HTML a minimal landing page
+`profiles/{username}.html`, so anonymous reads can be served by the `/static` mount, nginx
+or a CDN. Files are replaced atomically, a reader sees the old or the new snapshot, never
+a partial one. Usernames are percent-encoded into the file names.
+"""
+import asyncio
+import html
+import json
+import os
+import re
+from typing import Iterable, Optional, Set
+from urllib.parse import quote
+
+from app import crud
+from app.constants import OutboxTopicEnum, TilePlatformEnum
+from app.constants.tile_platform import PlatformData
+from app.core.config import settings
+from app.core.outbox import outbox
+from app.db.session import async_session
+from app.static_files import PATH_STATIC_FILES
+from app.utils.files import write_atomic
+
+PATH_PROFILE_SNAPSHOTS = os.path.join(PATH_STATIC_FILES, "profiles")
+
+# Web, mail and phone links, and the app schemes the tiles link to (`whatsapp://`, `viber://`)
+SAFE_URL_SCHEMES = {"http", "https", "mailto", "tel"} | {
+    platform.value.url_pattern.split(":", 1)[0]
+    for platform in TilePlatformEnum if isinstance(platform.value, PlatformData)
+}
+
+_URL_SCHEME = re.compile(r"^([a-z][a-z0-9+.-]*):", re.IGNORECASE)
+# Browsers drop these while parsing a URL, `java\tscript:` runs as `javascript:`
+_CONTROL_CHARACTERS = re.compile(r"[\x00-\x1f\x7f]")
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{name}</title>
+<meta property="og:title" content="{name}">
+{picture}</head>
+<body>
+<h1>{name}</h1>
+<ul>
+{tiles}
+</ul>
+</body>
+</html>
+"""
+
+
+def _remove(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _is_safe_url(url: str) -> bool:
+    if _CONTROL_CHARACTERS.search(url):
+        return False
+    scheme = _URL_SCHEME.match(url.strip())
+    return scheme is not None and scheme.group(1).lower() in SAFE_URL_SCHEMES
+
+
+def render_html(document: dict) -> bytes:
+    picture = document.get("profile_picture_url")
+    tiles = sorted(
+        (tile for tile in document["tiles"] if tile.get("active") and _is_safe_url(tile["url"])),
+        key=lambda tile: tile["position"],
+    )
+    return HTML_TEMPLATE.format(
+        name=html.escape(f"{document['first_name']} {document['last_name']}"),
+        picture=f'<meta property="og:image" content="{html.escape(picture)}">\n' if picture else "",
+        tiles="\n".join(
+            f'<li><a href="{html.escape(tile["url"])}" rel="nofollow noopener">{html.escape(tile["title"])}</a></li>'
+            for tile in tiles
+        ),
+    ).encode()
+
+
+class ProfileSnapshotStore:
+    def __init__(self, path: str, *, with_html: bool):
+        self.path = path
+        self.with_html = with_html
+
+    def paths(self, username: str) -> list[str]:
+        name = quote(username, safe="")
+        paths = [os.path.join(self.path, f"{name}.json")]
+        if self.with_html:
+            paths.append(os.path.join(self.path, f"{name}.html"))
+        return paths
+
+    def write(self, username: str, document: str) -> None:
+        """Replace the snapshot of a user with its published document, the JSON text of Postgres"""
+        content = document.encode()
+        json_path, *html_path = self.paths(username)
+        write_atomic(json_path, content)
+        if html_path:
+            write_atomic(html_path[0], render_html(json.loads(content)))
+
+    def remove(self, username: str) -> None:
+        for path in self.paths(username):
+            _remove(path)
+
+    def remove_except(self, usernames: Iterable[str], *, older_than: float) -> int:
+        """Remove the snapshots of every username not in `usernames` written before `older_than`,
+        the newer ones were published meanwhile.
+        """
+        kept: Set[str] = {os.path.basename(path) for username in usernames for path in self.paths(username)}
+        removed = 0
+        try:
+            entries = list(os.scandir(self.path))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            if (
+                entry.is_file()
+                and entry.name not in kept
+                and not entry.name.startswith(".tmp-")
+                and entry.stat().st_mtime < older_than
+            ):
+                _remove(entry.path)
+                removed += 1
+        return removed
+
+    async def publish(self, username: Optional[str], document: Optional[str], previous: Iterable[str] = ()) -> None:
+        """Write the snapshot of `username`, or none when unpublished, and remove its previous usernames"""
+        for old in previous:
+            if old != username:
+                await asyncio.to_thread(self.remove, old)
+        if username is not None:
+            await asyncio.to_thread(self.write, username, document)
+
+
+profile_snapshots = ProfileSnapshotStore(PATH_PROFILE_SNAPSHOTS, with_html=settings.PROFILE_SNAPSHOTS_HTML)
+
+
+@outbox.handler(OutboxTopicEnum.PROFILE_SNAPSHOT_PUBLISH)
+async def publish_profile_snapshot(payload: dict) -> None:
+    """Write the snapshot of the profile as currently published, a stale event writes the latest one"""
+    async with async_session() as db:
+        published = await crud.published_profile.get(db, user_id=payload["user_id"])
+    if published is None:
+        await profile_snapshots.publish(None, None, payload["usernames"])
+    else:
+        await profile_snapshots.publish(published.username, published.document, payload["usernames"])
@@ -0,0 +1,229 @@
+"""
+QR codes of the profiles and of the tile short links.
+
+Rendered files are cached in the static store under the hash of what they encode and how they
+are drawn, so a QR code is rendered once whoever asks for it, and a renamed user or a new short
+link simply addresses another file. Rendering is CPU-bound, it runs in a process pool; the
+functions run there are module-level and read or fill the cache themselves. The QR code and PNG
+libraries are only imported by the processes rendering.
+"""
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional
+from urllib.parse import quote
+
+from app.constants import QRCodeFormatEnum
+from app.core.config import settings
+from app.core.singleflight import single_flight
+from app.static_files import PATH_STATIC_FILES
+from app.utils.files import write_atomic
+
+PATH_QR_CODES = os.path.join(PATH_STATIC_FILES, "qr-codes")
+
+# Part of the cache keys, bump it when the rendering changes
+RENDER_VERSION = 1
+
+MEDIA_TYPES = {QRCodeFormatEnum.PNG: "image/png", QRCodeFormatEnum.SVG: "image/svg+xml"}
+
+QRCodeItem = tuple[str, QRCodeFormatEnum, int]
+
+
+def profile_url(username: str) -> str:
+    return settings.QR_CODE_PROFILE_URL.format(domain=settings.DOMAIN, username=quote(username, safe=""))
+
+
+def short_link_url(short_id: str) -> str:
+    return settings.QR_CODE_SHORT_LINK_URL.format(domain=settings.DOMAIN, short_id=quote(short_id, safe=""))
+
+
+def qr_code_key(data: str, format: QRCodeFormatEnum, size: int) -> str:
+    return hashlib.sha256(f"{RENDER_VERSION}\0{format.value}\0{size}\0{data}".encode()).hexdigest()
+
+
+def qr_code_path(key: str, format: QRCodeFormatEnum) -> str:
+    return os.path.join(PATH_QR_CODES, key[:2], f"{key}.{format.value}")
+
+
+def render(data: str, format: QRCodeFormatEnum, size: int) -> bytes:
+    """The QR code of `data`, `size` pixels wide for SVG, the largest whole number of pixels
+    per module fitting in `size` for PNG"""
+    import qrcode
+
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=4)
+    qr.add_data(data)
+    qr.make(fit=True)
+    # Dark modules are True, the quiet zone included
+    matrix = qr.get_matrix()
+    if format == QRCodeFormatEnum.SVG:
+        return _render_svg(matrix, size)
+    return _render_png(matrix, max(1, size // len(matrix)))
+
+
+def _render_png(matrix: List[List[bool]], scale: int) -> bytes:
+    import png
+
+    rows = []
+    for modules in matrix:
+        row = [0 if dark else 1 for dark in modules for _ in range(scale)]
+        rows.extend([row] * scale)
+    width = len(matrix) * scale
+    buffer = io.BytesIO()
+    png.Writer(width, width, greyscale=True, bitdepth=1, compression=9).write(buffer, rows)
+    return buffer.getvalue()
+
+
+def _render_svg(matrix: List[List[bool]], size: int) -> bytes:
+    # One horizontal run per group of adjacent dark modules
+    path = []
+    for y, modules in enumerate(matrix):
+        x = 0
+        while x < len(modules):
+            if not modules[x]:
+                x += 1
+                continue
+            start = x
+            while x < len(modules) and modules[x]:
+                x += 1
+            path.append(f"M{start} {y}h{x - start}v1h-{x - start}z")
+    count = len(matrix)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {count} {count}" shape-rendering="crispEdges">'
+        f'<rect width="{count}" height="{count}" fill="#fff"/>'
+        f'<path fill="#000" d="{"".join(path)}"/></svg>'
+    ).encode()
+
+
+def render_cached(data: str, format: QRCodeFormatEnum, size: int) -> bytes:
+    """The cached QR code, rendered and cached first when missing"""
+    path = qr_code_path(qr_code_key(data, format, size), format)
+    try:
+        with open(path, "rb") as file:
+            return file.read()
+    except FileNotFoundError:
+        pass
+    content = render(data, format, size)
+    write_atomic(path, content)
+    return content
+
+
+def render_cached_many(items: List[QRCodeItem]) -> List[bytes]:
+    return [render_cached(*item) for item in items]
+
+
+class QRCodeRenderer:
+    """Render QR codes in a process pool, through the cache.
+
+    Concurrent requests for the same missing QR code share one render. Batches are sent to the
+    pool in chunks of `chunk_size`, with at most two chunks per process in flight, and come
+    back in order, so a batch of any size holds only a few chunks in memory.
+    """
+
+    def __init__(self, *, workers: int, chunk_size: int):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.hits = 0
+        self.renders = 0
+        self.batches = 0
+        self.batch_items = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def get(self, data: str, format: QRCodeFormatEnum, size: int) -> tuple[str, str]:
+        """The cache key and the path of the QR code, rendered first when missing"""
+        key = qr_code_key(data, format, size)
+        path = qr_code_path(key, format)
+        if os.path.exists(path):
+            self.hits += 1
+            return key, path
+
+        async def render_missing() -> None:
+            self.renders += 1
+            await asyncio.get_running_loop().run_in_executor(self._executor(), render_cached, data, format, size)
+
+        await single_flight.do(("qr_code", key), render_missing)
+        return key, path
+
+    async def render_many(self, items: List[QRCodeItem]) -> AsyncIterator[bytes]:
+        """The QR codes of `items`, in order"""
+        self.batches += 1
+        loop = asyncio.get_running_loop()
+        pending = deque()
+        try:
+            for start in range(0, len(items), self.chunk_size):
+                if len(pending) >= 2 * self.workers:
+                    for content in await pending.popleft():
+                        yield content
+                chunk = items[start:start + self.chunk_size]
+                pending.append(loop.run_in_executor(self._executor(), render_cached_many, chunk))
+                self.batch_items += len(chunk)
+            while pending:
+                for content in await pending.popleft():
+                    yield content
+        finally:
+            # The client is gone, the chunks not started yet are dropped
+            for future in pending:
+                future.cancel()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Forking a process running an event loop and a connection pool is unsafe
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "started": self._pool is not None,
+            "hits": self.hits,
+            "renders": self.renders,
+            "batches": self.batches,
+            "batch_items": self.batch_items,
+        }
+
+
+qr_code_renderer = QRCodeRenderer(workers=settings.QR_CODE_PROCESS_WORKERS, chunk_size=settings.QR_CODE_BATCH_CHUNK_SIZE)
+
+
+class _ZipSink:
+    """Write-only, unseekable file collecting the bytes written by `ZipFile` until taken"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+async def stream_zip(entries: AsyncIterator[tuple[str, bytes]]) -> AsyncIterator[bytes]:
+    """A ZIP archive of `entries`, yielded as each entry is added. PNG files are stored as is,
+    they are compressed already."""
+    sink = _ZipSink()
+    date_time = time.localtime()[:6]
+    # An unseekable file makes ZipFile write the sizes after each entry instead of seeking back
+    with zipfile.ZipFile(sink, "w") as archive:
+        async for name, content in entries:
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = zipfile.ZIP_STORED if name.endswith(".png") else zipfile.ZIP_DEFLATED
+            archive.writestr(info, content)
+            yield sink.take()
+    yield sink.take()
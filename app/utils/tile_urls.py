@@ -0,0 +1,80 @@
+"""
+Normalization of the tile URLs and detection of their platform.
+
+The platforms are recognized with one regular expression compiled at import from the
+`url_pattern` of `TilePlatformEnum`, one named group per platform, so a URL is classified
+with a single anchored match whatever the number of platforms. Web patterns match their
+domain over http and https, with or without a subdomain (`www.`, `m.`, a locale...).
+"""
+import re
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from app.constants import TilePlatformEnum
+from app.constants.tile_platform import PlatformData
+
+_DEFAULT_PORTS = {"http": ":80", "https": ":443"}
+
+# `example.com/...`, a host without a scheme
+_SCHEMELESS_HOST = re.compile(r"^(?:[a-z0-9-]+\.)+[a-z]{2,}(?::\d+)?(?:[/?#]|$)", re.IGNORECASE)
+_SCHEME = re.compile(r"^([a-z][a-z0-9+.-]*):", re.IGNORECASE)
+
+
+def normalize_url(url: str) -> str:
+    """The URL trimmed, with `https://` when it has no scheme, its scheme lowercased and, for web
+    URLs, its host lowercased and the default port removed"""
+    url = url.strip()
+    if url.startswith("//"):
+        url = "https:" + url
+    elif _SCHEMELESS_HOST.match(url):
+        url = "https://" + url
+    scheme = _SCHEME.match(url)
+    if scheme is None:
+        return url
+    scheme = scheme.group(1).lower()
+    if scheme not in _DEFAULT_PORTS:
+        return scheme + url[len(scheme):]
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    userinfo, _, host = parts.netloc.rpartition("@")
+    host = host.lower().removesuffix(_DEFAULT_PORTS[scheme])
+    netloc = f"{userinfo}@{host}" if userinfo else host
+    return urlunsplit((scheme, netloc, parts.path, parts.query, parts.fragment))
+
+
+def _platform_pattern(url_pattern: str) -> str:
+    url_pattern = normalize_url(url_pattern)
+    scheme = _SCHEME.match(url_pattern).group(1)
+    if scheme not in _DEFAULT_PORTS:
+        return re.escape(url_pattern)
+    parts = urlsplit(url_pattern)
+    labels = parts.hostname.split(".")
+    # `www.facebook.com` and `pl.pinterest.com` stand for any subdomain of their domain
+    domain = ".".join(labels[1:] if len(labels) > 2 else labels)
+    path = parts.path.rstrip("/")
+    return rf"https?://(?:[^/?#@]*@)?(?:[a-z0-9-]+\.)*{re.escape(domain)}(?::\d+)?{re.escape(path)}(?=[/?#]|$)"
+
+
+def _build_platform_regex() -> re.Pattern:
+    patterns = [
+        (platform.name, _platform_pattern(platform.value.url_pattern))
+        for platform in TilePlatformEnum if isinstance(platform.value, PlatformData)
+    ]
+    # The most specific patterns first, the first alternative matching wins
+    patterns.sort(key=lambda pattern: len(pattern[1]), reverse=True)
+    return re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in patterns), re.IGNORECASE)
+
+
+_PLATFORM_REGEX = _build_platform_regex()
+
+
+def detect_platform(url: str) -> Optional[TilePlatformEnum]:
+    """The platform of a normalized URL, `WEBSITE` for any other web URL, None for anything else"""
+    match = _PLATFORM_REGEX.match(url)
+    if match is not None:
+        return TilePlatformEnum[match.lastgroup]
+    if url.startswith(("http://", "https://")):
+        return TilePlatformEnum.WEBSITE
+    return None
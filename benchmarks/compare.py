@@ -0,0 +1,40 @@
+"""
+Compare two load benchmark results, e.g. the runs of two commits.
+
+    python -m benchmarks.compare benchmarks/results/<base>.json benchmarks/results/<head>.json
+"""
+import argparse
+import json
+
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms", "queries_per_request")
+
+
+def _change(base, head) -> str:
+    if base is None or head is None:
+        return "-"
+    if not base:
+        return f"{head:.2f}"
+    return f"{head:.2f} ({(head - base) / base * 100:+.1f}%)"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    args = parser.parse_args()
+
+    with open(args.base) as file:
+        base = json.load(file)
+    with open(args.head) as file:
+        head = json.load(file)
+
+    print(f"base {base.get('commit')} ({base.get('timestamp')}) -> head {head.get('commit')} ({head.get('timestamp')})")
+    for name, head_result in head["scenarios"].items():
+        base_result = base["scenarios"].get(name, {})
+        print(name)
+        for metric in METRICS:
+            print(f"  {metric:<20} {base_result.get(metric) or 0:>10.2f} -> {_change(base_result.get(metric), head_result.get(metric))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+Drive the API hot paths with concurrent clients and report RPS, latency
+percentiles and database queries per request.
+
+In-process against the ASGI app, queries per request are counted exactly:
+    python -m benchmarks.load --asgi --users 10000
+
+Against a running server (queries are counted when pg_stat_statements is installed):
+    python -m benchmarks.load --url http://localhost:8000 --duration 30
+
+Against a throwaway Postgres container, migrated and seeded before the run:
+    python -m benchmarks.load --asgi --docker --seed --users 100000
+
+Results are written to benchmarks/results/<timestamp>-<commit>.json,
+compare two runs with `python -m benchmarks.compare`.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import time
+from collections import Counter
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from benchmarks.postgres import ROOT_DIR, migrate, throwaway_postgres
+
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+API_V1_STR = "/api/v1"
+
+# Smallest valid PNG, the upload path does not inspect the contents
+PICTURE = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c63600000000200015e2d3b1e0000000049454e44ae426082"
+)
+
+
+@dataclass
+class VirtualUser:
+    index: int
+    username: str
+    email: str
+    cookie: Optional[str] = None
+
+    async def login(self, client: httpx.AsyncClient, password: str) -> httpx.Response:
+        response = await client.post(
+            f"{API_V1_STR}/login", data={"username": self.username, "password": password}
+        )
+        # The cookie is `Secure`, so it is sent by hand to plain HTTP targets
+        token = response.cookies.get("access_token")
+        if token:
+            self.cookie = f"access_token={token}"
+        return response
+
+    @property
+    def headers(self) -> dict:
+        return {"Cookie": self.cookie} if self.cookie else {}
+
+
+@dataclass
+class Scenario:
+    name: str
+    request: Callable[[httpx.AsyncClient, VirtualUser, "RunContext"], Awaitable[httpx.Response]]
+    authenticated: bool = False
+
+
+@dataclass
+class RunContext:
+    users: int
+    password: str
+    rng: random.Random
+
+    def random_user(self) -> int:
+        return self.rng.randint(1, self.users)
+
+
+async def _login(client, user, ctx):
+    return await _virtual_user(ctx.random_user()).login(client, ctx.password)
+
+
+async def _profile_by_username(client, user, ctx):
+    return await client.get(f"{API_V1_STR}/profiles/{_virtual_user(ctx.random_user()).username}")
+
+
+async def _current_profile(client, user, ctx):
+    return await client.get(f"{API_V1_STR}/profiles", headers=user.headers)
+
+
+async def _users_page(client, user, ctx):
+    page = ctx.rng.randint(1, max(1, min(ctx.users // 20, 50)))
+    return await client.get(f"{API_V1_STR}/users", params={"page": page, "page_size": 20})
+
+
+async def _picture_upload(client, user, ctx):
+    return await client.post(
+        f"{API_V1_STR}/users/picture",
+        headers=user.headers,
+        files={"file": ("picture.png", PICTURE, "image/png")},
+    )
+
+
+async def _update_user(client, user, ctx):
+    return await client.patch(
+        f"{API_V1_STR}/users",
+        headers=user.headers,
+        json={"username": user.username, "email": user.email, "firstName": f"Bench{ctx.rng.randint(10, 99)}"},
+    )
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario("login", _login),
+        Scenario("profile_by_username", _profile_by_username),
+        Scenario("current_profile", _current_profile, authenticated=True),
+        Scenario("users_page", _users_page),
+        Scenario("picture_upload", _picture_upload, authenticated=True),
+        Scenario("update_user", _update_user, authenticated=True),
+    )
+}
+
+
+def _virtual_user(index: int) -> VirtualUser:
+    from benchmarks.seed import benchmark_email, benchmark_username
+
+    return VirtualUser(index, benchmark_username(index), benchmark_email(index))
+
+
+class EngineQueryCounter:
+    """Count the statements executed by the in-process engine."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args) -> None:
+        self.count += 1
+
+    async def read(self) -> Optional[int]:
+        return self.count
+
+
+class PgStatStatementsCounter:
+    """Count the statements of the server from `pg_stat_statements`, when installed."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def read(self) -> Optional[int]:
+        from sqlalchemy import text
+
+        try:
+            async with self.engine.connect() as conn:
+                return await conn.scalar(text("SELECT sum(calls)::bigint FROM pg_stat_statements"))
+        except Exception:
+            return None
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    ctx: RunContext,
+    *,
+    concurrency: int,
+    duration: float,
+    counter
+) -> dict:
+    virtual_users = []
+    for _ in range(concurrency):
+        user = _virtual_user(ctx.random_user())
+        if scenario.authenticated:
+            await user.login(client, ctx.password)
+        virtual_users.append(user)
+
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    queries_before = await counter.read()
+    started = time.perf_counter()
+    deadline = started + duration
+
+    async def worker(user: VirtualUser) -> None:
+        while time.perf_counter() < deadline:
+            request_started = time.perf_counter()
+            response = await scenario.request(client, user, ctx)
+            latencies.append((time.perf_counter() - request_started) * 1000)
+            statuses[response.status_code] += 1
+            if scenario.authenticated and response.status_code in (401, 403):
+                await user.login(client, ctx.password)
+
+    await asyncio.gather(*(worker(user) for user in virtual_users))
+    elapsed = time.perf_counter() - started
+    queries_after = await counter.read()
+
+    latencies.sort()
+    requests = len(latencies)
+    queries = None
+    if queries_before is not None and queries_after is not None and requests:
+        queries = (queries_after - queries_before) / requests
+    return {
+        "requests": requests,
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "rps": requests / elapsed,
+        "p50_ms": _percentile(latencies, 0.50),
+        "p95_ms": _percentile(latencies, 0.95),
+        "p99_ms": _percentile(latencies, 0.99),
+        "queries_per_request": queries,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    from app.db.session import get_async_engine
+    from benchmarks.seed import BENCHMARK_PASSWORD, seed_users
+
+    async_engine = get_async_engine()
+    async_engine.echo = False
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.seed:
+        await seed_users(args.users, tiles=args.tiles)
+
+    if args.asgi:
+        from app.main import app
+
+        counter = EngineQueryCounter(async_engine)
+        await app.router.startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark")
+    else:
+        app = None
+        counter = PgStatStatementsCounter(async_engine)
+        client = httpx.AsyncClient(base_url=args.url, timeout=30)
+
+    ctx = RunContext(users=args.users, password=BENCHMARK_PASSWORD, rng=random.Random(args.random_seed))
+    results = {}
+    try:
+        async with client:
+            for name in args.scenarios:
+                results[name] = await run_scenario(
+                    client, SCENARIOS[name], ctx,
+                    concurrency=args.concurrency, duration=args.duration, counter=counter
+                )
+                _print_result(name, results[name])
+    finally:
+        if app is not None:
+            await app.router.shutdown()
+        await async_engine.dispose()
+    return results
+
+
+def _print_result(name: str, result: dict) -> None:
+    queries = result["queries_per_request"]
+    print(
+        f"{name:<22} {result['rps']:>9.1f} rps  p50 {result['p50_ms']:>7.1f} ms  "
+        f"p95 {result['p95_ms']:>7.1f} ms  p99 {result['p99_ms']:>7.1f} ms  "
+        f"queries/req {'-' if queries is None else f'{queries:.2f}'}  errors {result['errors']}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--asgi", action="store_true", help="Run in-process against the ASGI app")
+    target.add_argument("--url", help="Base URL of a running server")
+    parser.add_argument("--docker", action="store_true", help="Use a throwaway Postgres container")
+    parser.add_argument("--seed", action="store_true", help="Seed synthetic data before the run")
+    parser.add_argument("--users", type=int, default=10_000, help="Number of seeded users")
+    parser.add_argument("--tiles", type=int, default=5, help="Tiles per seeded user")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--random-seed", type=int, default=0)
+    parser.add_argument("--output", help="Result file, defaults to benchmarks/results/<timestamp>-<commit>.json")
+    args = parser.parse_args()
+
+    with ExitStack() as stack:
+        if args.docker:
+            os.environ.update(stack.enter_context(throwaway_postgres()))
+            migrate()
+        if args.asgi:
+            # Keep limits and short-lived tokens of the app out of the measurement
+            os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+            os.environ.setdefault("LOAD_SHEDDING_ENABLED", "false")
+            os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+
+        results = asyncio.run(run(args))
+
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "mode": "asgi" if args.asgi else "http",
+        "config": {
+            "users": args.users,
+            "tiles": args.tiles,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+        },
+        "scenarios": results,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{commit or 'unknown'}.json")
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+In-process micro-benchmarks of the deps, crud and schemas layers.
+Neither a server nor a database is needed.
+
+    python -m benchmarks.micro --output micro.json
+"""
+import argparse
+import json
+import statistics
+import time
+import uuid
+from datetime import datetime
+from typing import Callable
+
+
+def measure(fn: Callable[[], object], number: int, repeat: int = 5) -> dict:
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - started) / number * 1_000_000)
+    return {"best_us": min(runs), "median_us": statistics.median(runs), "number": number}
+
+
+def build_user(tiles: int):
+    """Transient ORM user with `tiles` tiles, as loaded by `crud.user.get_by_username`."""
+    from app import models
+    from app.constants import TileTypeEnum
+
+    user = models.User(
+        id=uuid.uuid4(),
+        username="jankowalski",
+        first_name="Jan",
+        last_name="Kowalski",
+        email="jankowalski@example.com",
+        phone_number="500500500",
+        role="USER",
+        profile_picture_url="https://localhost:8000/static/users/pictures/jan.png",
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+    )
+    user.tiles = [
+        models.Tile(
+            id=uuid.uuid4(),
+            type=TileTypeEnum.CLASSIC,
+            title=f"Tile {position}",
+            url=f"https://www.facebook.com/jankowalski/{position}",
+            active=True,
+            position=position,
+            short_id=uuid.uuid4().hex[:12],
+            user_id=user.id,
+        )
+        for position in range(tiles)
+    ]
+    return user
+
+
+def collect_benchmarks() -> dict[str, Callable[[], object]]:
+    from jose import jwt
+    from sqlalchemy.dialects.postgresql import asyncpg
+
+    from app import crud, schemas
+    from app.constants import UserSearchModeEnum
+    from app.core import security
+    from app.core.config import settings
+    from app.schemas.serializers import profile_serializer, user_simple_serializer
+
+    cases = {}
+    for tiles in (1, 10, 100):
+        user = build_user(tiles)
+        cases[f"schemas.profile[{tiles}_tiles]"] = (
+            lambda user=user: schemas.ResponseProfile.model_validate(user, from_attributes=True).model_dump_json()
+        )
+        cases[f"schemas.profile_fast[{tiles}_tiles]"] = lambda user=user: profile_serializer.dump_json(user)
+    simple_user = build_user(0)
+    cases["schemas.user_simple"] = (
+        lambda: schemas.UserSimple.model_validate(simple_user, from_attributes=True).model_dump_json()
+    )
+    cases["schemas.user_simple_fast"] = lambda: user_simple_serializer.dump_json(simple_user)
+
+    token = security.create_access_token(simple_user)
+    cases["security.create_access_token"] = lambda: security.create_access_token(simple_user)
+    cases["deps.decode_token"] = lambda: schemas.TokenData(
+        **jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    )
+
+    mode = UserSearchModeEnum.SEARCH
+    dialect = asyncpg.dialect()
+    cases["crud.statement.build"] = lambda: crud.user._search_statement(mode, has_cursor=False)
+    cases["crud.statement.cached"] = lambda: crud.user._cached_statement(
+        "search", mode, False, builder=lambda: crud.user._search_statement(mode, has_cursor=False)
+    )
+    cases["crud.statement.compile"] = lambda: crud.user._search_statement(mode, has_cursor=False).compile(
+        dialect=dialect
+    )
+    return cases
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=1000, help="Calls per repeat")
+    parser.add_argument("--filter", default="", help="Run only benchmarks containing this text")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for name, fn in collect_benchmarks().items():
+        if args.filter in name:
+            results[name] = measure(fn, args.number)
+            print(f"{name:<32} {results[name]['best_us']:>10.2f} us/op")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
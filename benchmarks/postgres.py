@@ -0,0 +1,57 @@
+"""
+Throwaway Postgres in a Docker container for benchmark runs.
+"""
+import os
+import subprocess
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@contextmanager
+def throwaway_postgres(image: str = "postgres:15-alpine", port: int = 55432, timeout: float = 60) -> Iterator[dict]:
+    """Start a disposable Postgres container and yield the `DB_*` settings pointing at it.
+    The container is removed on exit.
+    """
+    name = f"yoocard-bench-{uuid.uuid4().hex[:8]}"
+    subprocess.run(
+        [
+            "docker", "run", "-d", "--rm", "--name", name,
+            "-e", "POSTGRES_PASSWORD=bench", "-e", "POSTGRES_DB=yoocard_bench",
+            "-p", f"{port}:5432", image,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        # TCP readiness, the init server of the image listens on the unix socket only
+        while subprocess.run(
+            ["docker", "exec", name, "pg_isready", "-h", "127.0.0.1", "-U", "postgres"], capture_output=True
+        ).returncode != 0:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Postgres container {name} did not become ready")
+            time.sleep(0.5)
+
+        yield {
+            "DB_HOST": "localhost",
+            "DB_PORT": str(port),
+            "DB_USER": "postgres",
+            "DB_PASSWORD": "bench",
+            "DB_NAME": "yoocard_bench",
+        }
+    finally:
+        subprocess.run(["docker", "rm", "-f", name], capture_output=True)
+
+
+def migrate() -> None:
+    """Upgrade the configured database to the latest Alembic revision."""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(ROOT_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT_DIR, "alembic"))
+    command.upgrade(config, "head")
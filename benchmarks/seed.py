@@ -0,0 +1,102 @@
+"""
+Seed the configured database with synthetic users and tiles for benchmarks.
+
+    python -m benchmarks.seed --users 1000000 --tiles 5
+"""
+import argparse
+import asyncio
+import hashlib
+import time
+
+from sqlalchemy import text
+
+from app.core.security import get_password_hash
+from app.db.session import get_async_engine
+
+BENCHMARK_PASSWORD = "Benchmark@123"
+
+FIRST_NAMES = ["Anna", "Jan", "Piotr", "Maria", "Krzysztof", "Katarzyna", "Tomasz", "Agnieszka", "Adam", "Ewa"]
+LAST_NAMES = ["Nowak", "Kowalski", "Wisniewski", "Wojcik", "Kowalczyk", "Kaminski", "Lewandowski", "Zielinski"]
+
+INSERT_USERS = text(f"""
+    INSERT INTO users (
+        id, first_name, last_name, username, email, hashed_password, is_active, role, created_at, updated_at
+    )
+    SELECT
+        gen_random_uuid(),
+        (ARRAY{FIRST_NAMES!r})[1 + i % {len(FIRST_NAMES)}],
+        (ARRAY{LAST_NAMES!r})[1 + (i / {len(FIRST_NAMES)}) % {len(LAST_NAMES)}],
+        'bench_' || substr(md5(i::text), 1, 8) || '_' || i,
+        'bench_' || i || '@example.com',
+        :hashed_password,
+        true,
+        'USER',
+        now(),
+        now()
+    FROM generate_series(:start, :stop) AS i
+    ON CONFLICT DO NOTHING
+""")
+
+
+INSERT_TILES = text("""
+    INSERT INTO tiles (id, type, title, url, active, position, icon_url, short_id, user_id)
+    SELECT
+        gen_random_uuid(),
+        'CLASSIC',
+        'Tile ' || n,
+        'https://www.facebook.com/' || users.username || '/' || n,
+        true,
+        n,
+        NULL,
+        substr(md5(users.id::text || n::text), 1, 12),
+        users.id
+    FROM generate_series(:start, :stop) AS i
+    JOIN users ON users.email = 'bench_' || i || '@example.com'
+    CROSS JOIN generate_series(1, :tiles) AS n
+    WHERE NOT EXISTS (SELECT 1 FROM tiles WHERE tiles.user_id = users.id)
+    ON CONFLICT DO NOTHING
+""")
+
+
+def benchmark_username(i: int) -> str:
+    """Username of the ``i``-th seeded user (1-based), matching `INSERT_USERS`."""
+    return f"bench_{hashlib.md5(str(i).encode()).hexdigest()[:8]}_{i}"
+
+
+def benchmark_email(i: int) -> str:
+    return f"bench_{i}@example.com"
+
+
+async def seed_users(count: int, tiles: int = 0, batch_size: int = 50_000) -> float:
+    """Insert ``count`` synthetic users with ``tiles`` tiles each in batches
+    and return the elapsed seconds. Seeding is idempotent.
+    Every user shares the same password, so it is hashed only once.
+    """
+    hashed_password = get_password_hash(BENCHMARK_PASSWORD)
+    started = time.perf_counter()
+    for start in range(1, count + 1, batch_size):
+        stop = min(start + batch_size - 1, count)
+        async with get_async_engine().begin() as conn:
+            await conn.execute(INSERT_USERS, {"start": start, "stop": stop, "hashed_password": hashed_password})
+            if tiles:
+                await conn.execute(INSERT_TILES, {"start": start, "stop": stop, "tiles": tiles})
+    async with get_async_engine().begin() as conn:
+        await conn.execute(text("ANALYZE users"))
+        await conn.execute(text("ANALYZE tiles"))
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--tiles", type=int, default=5, help="Tiles per user")
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    get_async_engine().echo = False
+    elapsed = asyncio.run(seed_users(args.users, tiles=args.tiles, batch_size=args.batch_size))
+    print(f"Seeded {args.users} users with {args.tiles} tiles each in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Profile the startup of a worker: the import time of `app.main` with its slowest
+modules, the startup events (warmup included) and the latency of the first requests.
+Every run happens in a fresh interpreter.
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --path /api/v1/profiles/<username>
+
+With `--budget-ms` the command exits with 1 when the median import time is over
+the budget, so CI can keep the import graph lean:
+
+    python -m benchmarks.startup --budget-ms 1000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.postgres import ROOT_DIR
+
+IMPORT_BUDGET_MS = 1000
+
+
+def _child(path: str) -> None:
+    started = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter()
+
+    import logging
+
+    import httpx
+
+    logging.disable(logging.WARNING)
+
+    async def serve() -> dict:
+        startup_started = time.perf_counter()
+        await app.router.startup()
+        startup_ms = (time.perf_counter() - startup_started) * 1000
+        latencies = []
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://startup") as client:
+            for _ in range(2):
+                request_started = time.perf_counter()
+                await client.get(path)
+                latencies.append((time.perf_counter() - request_started) * 1000)
+        await app.router.shutdown()
+        return {"startup_ms": startup_ms, "first_request_ms": latencies[0], "second_request_ms": latencies[1]}
+
+    result = {"import_ms": (imported - started) * 1000, **asyncio.run(serve())}
+    # The engine may log to stdout, the result is the last line
+    print("\n" + json.dumps(result))
+
+
+def _parse_importtime(stderr: str, top: int) -> list[dict]:
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Skip the header line
+        if not self_us.strip().isdigit():
+            continue
+        modules.append({"module": name.strip(), "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    app_modules = [module for module in modules if module["module"].startswith("app")]
+    return sorted(app_modules, key=lambda module: module["self_ms"], reverse=True)[:top]
+
+
+def profile(runs: int, path: str, top: int) -> dict:
+    samples = []
+    slowest = []
+    for run in range(runs):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-m", "benchmarks.startup", "--child", "--path", path],
+            cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        )
+        samples.append(json.loads(process.stdout.strip().splitlines()[-1]))
+        if run == 0:
+            slowest = _parse_importtime(process.stderr, top)
+    return {
+        "runs": runs,
+        "path": path,
+        **{key: statistics.median(sample[key] for sample in samples) for key in samples[0]},
+        "slowest_app_modules": slowest,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--path", default="/health", help="Path of the first requests")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest app modules to list")
+    parser.add_argument("--budget-ms", type=float, nargs="?", const=IMPORT_BUDGET_MS, help="Import time budget")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return _child(args.path)
+
+    result = profile(args.runs, args.path, args.top)
+    print(json.dumps(result, indent=2))
+    if args.budget_ms is not None and result["import_ms"] > args.budget_ms:
+        print(f"Import time {result['import_ms']:.0f} ms is over the budget of {args.budget_ms:.0f} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
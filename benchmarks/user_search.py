@@ -0,0 +1,71 @@
+"""
+Measure the user search modes against the legacy ILIKE filter.
+
+    python -m benchmarks.seed --users 1000000
+    python -m benchmarks.user_search --iterations 200 --output user_search.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Awaitable, Callable
+
+from app import crud
+from app.constants import UserSearchModeEnum
+from app.db.session import async_session, get_async_engine
+
+QUERIES = {
+    UserSearchModeEnum.EXACT: "bench_1000@example.com",
+    UserSearchModeEnum.PREFIX: "bench_c4ca",
+    UserSearchModeEnum.SEARCH: "kowal",
+}
+
+
+async def _measure(run: Callable[[], Awaitable], iterations: int) -> dict:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await run()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+        "max_ms": timings[-1],
+    }
+
+
+async def run_benchmark(iterations: int, page_size: int) -> dict:
+    results = {}
+    async with async_session() as db:
+        for mode, query in QUERIES.items():
+            results[mode.value] = await _measure(
+                lambda: crud.user.search(db, query=query, mode=mode, limit=page_size), iterations
+            )
+
+        # Baseline: the generic `_apply_filters` substring match
+        stmt, params = crud.user._filtered_statement(username=QUERIES[UserSearchModeEnum.SEARCH])
+        stmt = stmt.limit(page_size)
+        results["legacy_ilike"] = await _measure(lambda: db.execute(stmt, params), iterations)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    get_async_engine().echo = False
+    results = asyncio.run(run_benchmark(args.iterations, args.page_size))
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+#!/usr/bin/bash
+
+if [ ! -f server.pid ]; then
+  echo "The server is not running."
+  exit 1
+fi
+
+# Rolling restart, every worker is replaced only once its successor is ready
+kill -HUP "$(cat server.pid)"
+
+echo "The server is being reloaded."
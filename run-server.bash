@@ -17,6 +17,6 @@ source "$venv_dir/$venv_name/bin/activate"
 
 echo "The $venv_name virtual environment has been activated."
 
-screen -dmS api_yoocard uvicorn app.main:app --host localhost --port 9000
+screen -dmS api_yoocard python -m app.server --host localhost --port 9000 --pid-file server.pid
 
 echo "The server has been successfully launched."
\ No newline at end of file
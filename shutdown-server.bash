@@ -1,5 +1,14 @@
 #!/usr/bin/bash
 
+# Draining the workers, in-flight requests are finished before the server exits
+if [ -f server.pid ]; then
+  pid=$(cat server.pid)
+  kill -TERM "$pid"
+  while kill -0 "$pid" 2> /dev/null; do
+    sleep 1
+  done
+fi
+
 screen -X -S api_yoocard quit
 
-echo "The server has been successfully shut down."
\ No newline at end of file
+echo "The server has been successfully shut down."
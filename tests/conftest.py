@@ -0,0 +1,51 @@
+"""
+The tests run against the database configured for the app, with its migrations applied.
+They are skipped when it cannot be reached.
+"""
+import uuid
+
+import pytest
+from sqlalchemy import delete, text
+
+from app.constants import UserRoleEnum
+from app.db.session import async_session, get_async_engine
+from app.models import OutboxEvent, Tile, User
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def engine():
+    engine = get_async_engine()
+    try:
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+    except Exception as e:
+        pytest.skip(f"Database unavailable: {e!r}")
+    yield engine
+    # The connections belong to the event loop of the test
+    await engine.dispose()
+
+
+@pytest.fixture
+async def user(engine) -> User:
+    name = f"test{uuid.uuid4().hex[:12]}"
+    async with async_session() as db:
+        db_user = User(
+            username=name,
+            email=f"{name}@example.com",
+            first_name="Test",
+            last_name="User",
+            hashed_password="-",
+            role=UserRoleEnum.USER,
+        )
+        db.add(db_user)
+        await db.commit()
+    yield db_user
+    async with engine.begin() as connection:
+        await connection.execute(delete(Tile).where(Tile.user_id == db_user.id))
+        await connection.execute(delete(OutboxEvent).where(OutboxEvent.payload["user_id"].astext == str(db_user.id)))
+        await connection.execute(delete(User).where(User.id == db_user.id))
@@ -0,0 +1,32 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.api_v1.api import router
+from app.core.config import settings
+from app.core.security import create_access_token
+
+pytestmark = pytest.mark.anyio
+
+
+def _api() -> FastAPI:
+    # Without the middlewares, the rate limits would turn the burst away
+    api = FastAPI()
+    api.include_router(router, prefix=settings.API_V1_STR)
+    return api
+
+
+async def test_more_authenticated_requests_than_connections(user):
+    """Coalesced loads never wait for a connection while their request holds one,
+    so a burst larger than the pool is served instead of timing out."""
+    requests = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW + 5
+    cookies = {"access_token": create_access_token(user)}
+    async with httpx.AsyncClient(app=_api(), base_url="http://test", cookies=cookies) as client:
+        # With only some fields the user is loaded, with the tiles the profile is loaded too
+        responses = await asyncio.gather(*(
+            client.get(f"{settings.API_V1_STR}/profiles" + ("?fields=first_name" if index % 2 else ""))
+            for index in range(requests)
+        ))
+    assert [response.status_code for response in responses] == [200] * requests
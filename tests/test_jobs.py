@@ -0,0 +1,122 @@
+import asyncio
+import time
+from datetime import timedelta
+from enum import Enum
+
+import pytest
+from sqlalchemy import delete, func, insert, select
+
+from app.constants import JobStatusEnum
+from app.core.jobs import JobRunner
+from app.db.session import async_session
+from app.models import Job
+
+pytestmark = pytest.mark.anyio
+
+EXECUTORS = ("async", "thread", "process")
+
+
+class SampleJobTypeEnum(str, Enum):
+    ASYNC = "tests.async"
+    THREAD = "tests.thread"
+    PROCESS = "tests.process"
+
+
+# Module-level, the process jobs are run in spawned interpreters importing them
+
+def count(payload: dict) -> int:
+    return len(payload["items"])
+
+
+def sleep(payload: dict) -> None:
+    time.sleep(payload["seconds"])
+
+
+async def count_async(payload: dict) -> int:
+    return count(payload)
+
+
+async def sleep_async(payload: dict) -> None:
+    await asyncio.sleep(payload["seconds"])
+
+
+@pytest.fixture
+async def runner(engine):
+    runner = JobRunner(
+        poll_interval=60,
+        lease=60,
+        thread_workers=1,
+        process_workers=1,
+        retention=timedelta(hours=1),
+        shutdown_timeout=1,
+    )
+    yield runner
+    await runner.stop()
+    async with engine.begin() as connection:
+        await connection.execute(delete(Job).where(Job.type.in_([type.value for type in SampleJobTypeEnum])))
+
+
+def _register(runner: JobRunner, executor: str, fn, **options) -> SampleJobTypeEnum:
+    type = SampleJobTypeEnum[executor.upper()]
+    if executor == "async":
+        fn = {count: count_async, sleep: sleep_async}[fn]
+    runner.job(type, executor=executor, **options)(fn)
+    return type
+
+
+async def _enqueue(type: SampleJobTypeEnum, payload: dict) -> int:
+    async with async_session() as db:
+        job = JobRunner.enqueue(db, type, payload)
+        await db.commit()
+    return job.id
+
+
+async def _run_claimed(runner: JobRunner, type: SampleJobTypeEnum) -> None:
+    await runner._claim(runner.specs[type.value])
+    await asyncio.gather(*(task for _, task in list(runner._running.values())))
+
+
+async def _get(job_id: int) -> Job:
+    async with async_session() as db:
+        return await db.scalar(select(Job).where(Job.id == job_id))
+
+
+@pytest.mark.parametrize("executor", EXECUTORS)
+async def test_job_succeeds(runner, executor):
+    type = _register(runner, executor, count)
+    job_id = await _enqueue(type, {"items": [1, 2, 3]})
+    await _run_claimed(runner, type)
+    job = await _get(job_id)
+    assert (job.status, job.result, job.attempts) == (JobStatusEnum.SUCCEEDED, 3, 1)
+
+
+@pytest.mark.parametrize("executor", EXECUTORS)
+async def test_timed_out_job(runner, executor):
+    type = _register(runner, executor, sleep, timeout=0.2)
+    job_id = await _enqueue(type, {"seconds": 2})
+    await _run_claimed(runner, type)
+    job = await _get(job_id)
+    if executor == "async":
+        # Cancelled, it is retried later
+        assert job.status == JobStatusEnum.QUEUED and "TimeoutError" in job.last_error
+    else:
+        # Still running, it is not handed to another worker before its lease expired
+        assert job.status == JobStatusEnum.RUNNING and job.locked_until is not None
+        await runner._claim(runner.specs[type.value])
+        assert not runner._running
+
+
+@pytest.mark.parametrize("executor", EXECUTORS)
+async def test_expired_lease_on_last_attempt_fails(runner, executor, engine):
+    type = _register(runner, executor, count, max_attempts=2)
+    async with engine.begin() as connection:
+        job_id = await connection.scalar(
+            insert(Job)
+            .values(type=type.value, payload={"items": []}, status=JobStatusEnum.RUNNING, attempts=2,
+                    locked_until=func.now() - timedelta(minutes=1))
+            .returning(Job.id)
+        )
+    await runner._claim(runner.specs[type.value])
+    job = await _get(job_id)
+    assert job.status == JobStatusEnum.FAILED and not runner._running
+    assert runner.failed[type.value] == 1
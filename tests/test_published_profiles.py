@@ -0,0 +1,34 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.db.session import async_session
+from app.models import OutboxEvent, PublishedProfile, User
+
+pytestmark = pytest.mark.anyio
+
+
+async def _published_state(user: User) -> tuple:
+    async with async_session() as db:
+        updated_at = await db.scalar(select(PublishedProfile.updated_at).where(PublishedProfile.user_id == user.id))
+        events = await db.scalar(
+            select(func.count()).select_from(OutboxEvent).where(OutboxEvent.payload["user_id"].astext == str(user.id))
+        )
+    return updated_at, events
+
+
+async def test_no_op_flush_does_not_republish(user):
+    before = await _published_state(user)
+    async with async_session() as db:
+        db_user = await db.get(User, user.id)
+        db_user.first_name = db_user.first_name
+        await db.commit()
+    assert await _published_state(user) == before
+
+
+async def test_change_republishes(user):
+    updated_at, _ = await _published_state(user)
+    async with async_session() as db:
+        db_user = await db.get(User, user.id)
+        db_user.first_name = "Changed"
+        await db.commit()
+    assert (await _published_state(user))[0] > updated_at
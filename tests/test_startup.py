@@ -0,0 +1,6 @@
+from benchmarks.startup import IMPORT_BUDGET_MS, profile
+
+
+def test_import_time_within_budget():
+    result = profile(runs=3, path="/health", top=10)
+    assert result["import_ms"] <= IMPORT_BUDGET_MS, result["slowest_app_modules"]